@@ -0,0 +1,142 @@
+"""Агрегатные функции select: count, sum, min, max, avg и group by.
+
+HashAggregator принимает строки по одной и держит в памяти только
+аккумуляторы — по одному на группу и функцию, — поэтому список строк
+выборки не собирается. Пустые (None) значения, как в SQL, пропускаются
+всеми функциями, кроме count(*).
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable
+from typing import Any
+
+from .constants import AGGREGATE_FUNCTIONS
+
+# Функции, которые имеют смысл только для чисел
+_NUMERIC_FUNCTIONS = ("sum", "avg")
+
+
+def aggregate_column_name(function: str, column: str) -> str:
+    """Заголовок колонки результата: count(*), sum(age)."""
+    return f"{function}({column})"
+
+
+def check_aggregates(aggregates: Iterable[tuple[str, str]],
+                     columns: dict[str, str], group_by: str | None) -> None:
+    """Проверяет функции и колонки по схеме таблицы."""
+    if group_by is not None and group_by not in columns:
+        raise ValueError(f"Колонки {group_by!r} для group by нет в таблице")
+    for function, column in aggregates:
+        if function not in AGGREGATE_FUNCTIONS:
+            raise ValueError(f"Неизвестная агрегатная функция {function!r}")
+        if column == "*":
+            continue
+        if column not in columns:
+            raise ValueError(f"Колонки {column!r} нет в таблице")
+        if function in _NUMERIC_FUNCTIONS and columns[column] != "int":
+            raise ValueError(f"{function} применима только к int-колонкам, "
+                             f"а {column!r} имеет тип {columns[column]}")
+
+
+class _Accumulator:
+    """Состояние одной функции в одной группе."""
+
+    __slots__ = ("count", "high", "low", "total")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0
+        self.low: Any = None
+        self.high: Any = None
+
+    def add(self, value: Any) -> None:
+        self.count += 1
+        if isinstance(value, int):
+            self.total += value
+        if self.low is None or value < self.low:
+            self.low = value
+        if self.high is None or value > self.high:
+            self.high = value
+
+    def merge(self, other: _Accumulator) -> None:
+        """Добавляет состояние, посчитанное по другой части строк."""
+        self.count += other.count
+        self.total += other.total
+        if other.low is not None and (self.low is None or other.low < self.low):
+            self.low = other.low
+        if other.high is not None and (self.high is None
+                                       or other.high > self.high):
+            self.high = other.high
+
+    def result(self, function: str) -> object:
+        if function == "count":
+            return self.count
+        if not self.count:
+            return None
+        if function == "sum":
+            return self.total
+        if function == "avg":
+            return self.total / self.count
+        return self.low if function == "min" else self.high
+
+
+class HashAggregator:
+    """Потоковая хэш-агрегация: группа -> аккумуляторы функций."""
+
+    def __init__(self, aggregates: list[tuple[str, str]],
+                 group_by: str | None = None) -> None:
+        self.aggregates = aggregates
+        self.group_by = group_by
+        self._groups: dict[object, list[_Accumulator]] = {}
+        if group_by is None:
+            # Без group by результат — одна строка даже для пустой выборки
+            self._groups[None] = self._new_accumulators()
+
+    @property
+    def column_names(self) -> list[str]:
+        names = [aggregate_column_name(function, column)
+                 for function, column in self.aggregates]
+        return names if self.group_by is None else [self.group_by, *names]
+
+    def _new_accumulators(self) -> list[_Accumulator]:
+        return [_Accumulator() for _ in self.aggregates]
+
+    def add(self, row: dict[str, Any]) -> None:
+        """Учитывает одну строку."""
+        key = None if self.group_by is None else row.get(self.group_by)
+        accumulators = self._groups.get(key)
+        if accumulators is None:
+            accumulators = self._groups[key] = self._new_accumulators()
+        for accumulator, (_, column) in zip(accumulators, self.aggregates):
+            if column == "*":
+                accumulator.count += 1
+                continue
+            value = row.get(column)
+            if value is not None:
+                accumulator.add(value)
+
+    def add_rows(self, rows: Iterable[dict[str, Any]]) -> None:
+        for row in rows:
+            self.add(row)
+
+    def merge(self, other: HashAggregator) -> None:
+        """Объединяет частичные агрегаты (например, посчитанные по сегментам)."""
+        for key, accumulators in other._groups.items():
+            own = self._groups.get(key)
+            if own is None:
+                self._groups[key] = accumulators
+                continue
+            for accumulator, partial in zip(own, accumulators):
+                accumulator.merge(partial)
+
+    def results(self) -> list[tuple[object, ...]]:
+        """Строки результата; группы упорядочены по значению (NULL первым)."""
+        functions = [function for function, _ in self.aggregates]
+        keys = sorted(self._groups, key=lambda key: (key is not None, key))
+        results = []
+        for key in keys:
+            values = tuple(accumulator.result(function) for accumulator, function
+                           in zip(self._groups[key], functions))
+            results.append(values if self.group_by is None else (key, *values))
+        return results
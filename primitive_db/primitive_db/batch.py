@@ -0,0 +1,111 @@
+"""Пакетный режим: файл или строка команд без вопросов и лишнего вывода.
+
+project -f script.db и project -c "..." выполняют команды подряд, как
+если бы их вводили в консоли, но не спрашивают подтверждений delete/drop
+и не печатают время и сообщения о ходе команд («Строка добавлена...»):
+в stdout попадают только данные и ошибки. В конце в stderr выводится
+сводка: сколько команд выполнено, с какой скоростью и какова задержка
+одной команды.
+
+Файл (-f) выполняется по команде на строку, как ввод в консоли, поэтому
+';' внутри значения (insert notes text=a;b) остаётся частью значения.
+Только строка -c делится на команды ещё и по ';'. Если скрипт кончился
+при открытой транзакции, она отменяется с тем же предупреждением, что и
+при exit.
+"""
+
+from __future__ import annotations
+
+import time
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+
+from .decorators import set_confirmations, set_quiet
+from .engine import get_meta_cache_stats
+from .main import abandon_transaction, execute_line
+from .utils import percentile
+
+# Разделитель команд в одной строке (project -c "create ...; insert ...")
+STATEMENT_SEPARATOR = ";"
+# Строки скрипта, начинающиеся с этого символа, — комментарии
+COMMENT_PREFIX = "#"
+
+
+def split_statements(text: str,
+                     separator: str | None = STATEMENT_SEPARATOR,
+                     ) -> Iterator[str]:
+    """Делит текст скрипта на команды: по строкам и по separator.
+
+    separator None — каждая строка одна команда (файл -f). Пустые
+    команды и строки-комментарии пропускаются.
+    """
+    for line in text.splitlines():
+        if line.lstrip().startswith(COMMENT_PREFIX):
+            continue
+        statements = [line] if separator is None else line.split(separator)
+        for statement in statements:
+            statement = statement.strip()
+            if statement:
+                yield statement
+
+
+@dataclass
+class BatchReport:
+    """Итог пакетного выполнения: задержки команд и общее время."""
+
+    latencies: list[float] = field(default_factory=list)
+    total_seconds: float = 0.0
+    meta_loads: int = 0
+    meta_cache_hits: int = 0
+
+    def percentile(self, fraction: float) -> float:
+        """Задержка, которую не превышает доля fraction команд."""
+        return percentile(self.latencies, fraction)
+
+    def format(self) -> str:
+        count = len(self.latencies)
+        if not count:
+            return "Выполнено команд: 0."
+        rate = count / self.total_seconds if self.total_seconds else float("inf")
+        average = sum(self.latencies) / count
+        return (
+            f"Выполнено команд: {count} за {self.total_seconds:.3f} с "
+            f"({rate:.1f} команд/с).\n"
+            f"Задержка команды, мс: среднее {average * 1000:.3f}, "
+            f"p50 {self.percentile(0.5) * 1000:.3f}, "
+            f"p95 {self.percentile(0.95) * 1000:.3f}, "
+            f"p99 {self.percentile(0.99) * 1000:.3f}, "
+            f"макс {max(self.latencies) * 1000:.3f}.\n"
+            f"Метаданные: прочитаны с диска {self.meta_loads} раз, "
+            f"взяты из кэша {self.meta_cache_hits} раз."
+        )
+
+
+def run_batch(statements: Iterable[str]) -> BatchReport:
+    """Выполняет команды по очереди и возвращает сводку.
+
+    Выполнение останавливается на команде exit. Ошибки отдельных команд
+    печатаются, как в консоли, и не прерывают скрипт. Незафиксированная
+    транзакция в конце отменяется с предупреждением.
+    """
+    report = BatchReport()
+    meta_stats = get_meta_cache_stats()
+    set_confirmations(False)
+    set_quiet(True)
+    started = time.perf_counter()
+    try:
+        for statement in statements:
+            statement_started = time.perf_counter()
+            keep_going = execute_line(statement)
+            report.latencies.append(time.perf_counter() - statement_started)
+            if not keep_going:
+                break
+    finally:
+        report.total_seconds = time.perf_counter() - started
+        set_confirmations(True)
+        set_quiet(False)
+        abandon_transaction()
+    final_stats = get_meta_cache_stats()
+    report.meta_loads = final_stats["misses"] - meta_stats["misses"]
+    report.meta_cache_hits = final_stats["hits"] - meta_stats["hits"]
+    return report
@@ -0,0 +1,244 @@
+"""Бенчмарк основных операций: python -m primitive_db.bench (make bench).
+
+Для каждого размера таблицы генерируется синтетический CSV (name, age,
+city) с фиксированным зерном, таблица загружается командой load и на ней
+замеряются операции:
+
+    bulk_load           — load_table_from_file всего файла;
+    select_cached_miss  — select_rows_cached после очистки кэша;
+    select_cached_hit   — повторный select_rows_cached;
+    select_where        — select_rows_matching по диапазону age (без кэша);
+    insert_row, update_row_by_id, delete_row_by_id — точечные изменения.
+
+По каждой операции считаются пропускная способность (строк или операций
+в секунду), задержки p50/p99 и число замеров. Каждый размер выполняется в
+отдельном процессе во временной папке, поэтому пиковый RSS (ru_maxrss)
+относится только к нему. Результат печатается в stdout как JSON и может
+быть сохранён в файл (--output) для сравнения прогонов.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+from collections.abc import Callable, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
+from pathlib import Path
+from typing import Any
+
+from . import core
+from .constants import DEFAULT_STORAGE
+from .engine import list_storage_engines
+from .expressions import parse_where
+from .segments import shutdown_scan_pool
+from .utils import percentile
+
+# Размеры таблиц по умолчанию (больше — через --sizes, вплоть до 10M)
+BENCH_SIZES = (1_000, 10_000, 100_000)
+# Число замеров точечных операций и границы для операций с полным
+# просмотром: замеров столько, чтобы прочитать ~BENCH_SCAN_BUDGET строк
+BENCH_SAMPLES = 200
+BENCH_MIN_SAMPLES = 5
+BENCH_SCAN_BUDGET = 2_000_000
+# Зерно генератора данных: прогоны с одинаковыми параметрами сравнимы
+BENCH_SEED = 2601
+
+_TABLE = "bench"
+_COLUMNS = {"name": "str", "age": "int", "city": "str"}
+_CITIES = ("Moscow", "Kazan", "Omsk", "Tver", "Perm", "Sochi", "Ufa", "Orel")
+_MAX_AGE = 100
+
+
+@dataclass
+class OperationResult:
+    """Замеры одной операции: задержки и число обработанных единиц."""
+
+    name: str
+    latencies: list[float] = field(default_factory=list)
+    items: int = 0  # строк (bulk_load) или операций
+
+    def measure(self, func: Callable[[], object], items: int = 1) -> None:
+        started = time.perf_counter()
+        func()
+        self.latencies.append(time.perf_counter() - started)
+        self.items += items
+
+    def to_dict(self) -> dict[str, Any]:
+        total = sum(self.latencies)
+        return {
+            "samples": len(self.latencies),
+            "throughput": self.items / total if total else None,
+            "p50_ms": percentile(self.latencies, 0.5) * 1000,
+            "p99_ms": percentile(self.latencies, 0.99) * 1000,
+            "total_s": total,
+        }
+
+
+def write_synthetic_csv(path: Path, rows: int, rng: random.Random) -> None:
+    """Пишет CSV с заголовком и rows случайными строками."""
+    with path.open("w", encoding="utf-8", newline="") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(_COLUMNS)
+        for number in range(rows):
+            writer.writerow((f"user{number}", rng.randint(0, _MAX_AGE),
+                             rng.choice(_CITIES)))
+
+
+def scan_samples(rows: int) -> int:
+    """Число замеров операции, которая просматривает всю таблицу."""
+    return max(BENCH_MIN_SAMPLES,
+               min(BENCH_SAMPLES, BENCH_SCAN_BUDGET // max(rows, 1)))
+
+
+def benchmark_table(rows: int, storage: str = DEFAULT_STORAGE,
+                    samples: int = BENCH_SAMPLES,
+                    seed: int = BENCH_SEED) -> dict[str, dict[str, Any]]:
+    """Замеряет операции на таблице из rows строк в текущей папке."""
+    rng = random.Random(seed)
+    source = Path(f"{_TABLE}.csv")
+    write_synthetic_csv(source, rows, rng)
+    core.create_table(_TABLE, dict(_COLUMNS), storage=storage)
+
+    results: list[OperationResult] = []
+    bulk_load = OperationResult("bulk_load")
+    bulk_load.measure(lambda: core.load_table_from_file(_TABLE, source),
+                      items=rows)
+    source.unlink()
+    results.append(bulk_load)
+
+    scans = min(samples, scan_samples(rows))
+    miss = OperationResult("select_cached_miss")
+    hit = OperationResult("select_cached_hit")
+    for _ in range(scans):
+        core.clear_query_cache()
+        miss.measure(lambda: core.select_rows_cached(_TABLE), items=rows)
+        hit.measure(lambda: core.select_rows_cached(_TABLE), items=rows)
+    results += [miss, hit]
+
+    where = OperationResult("select_where")
+    for _ in range(scans):
+        low = rng.randint(0, _MAX_AGE - 10)
+        condition = parse_where(f"age>={low} and age<{low + 10}")
+        core.clear_query_cache()
+        where.measure(partial(core.select_rows_matching, _TABLE, condition),
+                      items=rows)
+    results.append(where)
+
+    insert = OperationResult("insert_row")
+    for number in range(samples):
+        values = {"name": f"new{number}", "age": str(rng.randint(0, _MAX_AGE)),
+                  "city": rng.choice(_CITIES)}
+        insert.measure(partial(core.insert_row, _TABLE, values))
+    results.append(insert)
+
+    row_ids = rng.sample(range(1, rows + 1), min(samples, rows))
+    update = OperationResult("update_row_by_id")
+    for row_id in row_ids:
+        values = {"age": str(rng.randint(0, _MAX_AGE))}
+        update.measure(partial(core.update_row_by_id, _TABLE, row_id, values))
+    results.append(update)
+
+    delete = OperationResult("delete_row_by_id")
+    for row_id in row_ids:
+        delete.measure(partial(core.delete_row_by_id, _TABLE, row_id))
+    results.append(delete)
+
+    return {result.name: result.to_dict() for result in results}
+
+
+def peak_rss_bytes() -> int:
+    """Пиковый RSS текущего процесса (ru_maxrss: в Linux — КБ, в macOS — байты)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _run_size(rows: int, storage: str, samples: int,
+              seed: int) -> dict[str, Any]:
+    """Прогон одного размера во временной папке (в отдельном процессе)."""
+    old_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="primitive_db_bench_") as tmp_dir:
+        os.chdir(tmp_dir)
+        try:
+            started = time.perf_counter()
+            operations = benchmark_table(rows, storage, samples, seed)
+            elapsed = time.perf_counter() - started
+        finally:
+            # Процессы пула просмотра сегментов нужно остановить явно:
+            # иначе выход рабочего процесса бенчмарка ждёт их вечно
+            shutdown_scan_pool()
+            os.chdir(old_cwd)
+    return {"rows": rows, "elapsed_s": elapsed,
+            "peak_rss_bytes": peak_rss_bytes(), "operations": operations}
+
+
+def run_benchmarks(sizes: Sequence[int], storage: str = DEFAULT_STORAGE,
+                   samples: int = BENCH_SAMPLES,
+                   seed: int = BENCH_SEED) -> dict[str, Any]:
+    """Прогоняет бенчмарк по всем размерам, каждый в новом процессе."""
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for rows in sizes:
+        print(f"Бенчмарк: {rows} строк ({storage})...", file=sys.stderr)
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            results.append(
+                pool.submit(_run_size, rows, storage, samples, seed).result())
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "storage": storage,
+        "samples": samples,
+        "seed": seed,
+        "results": results,
+    }
+
+
+def _parse_sizes(text: str) -> list[int]:
+    try:
+        sizes = [int(size.replace("_", "")) for size in text.split(",")]
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"Размеры — целые числа через запятую, а не {text!r}") from None
+    if any(size < 1 for size in sizes):
+        raise argparse.ArgumentTypeError("Размер таблицы должен быть больше 0")
+    return sizes
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    arg_parser = argparse.ArgumentParser(
+        prog="python -m primitive_db.bench",
+        description="Бенчмарк операций primitive_db на синтетических таблицах.")
+    arg_parser.add_argument(
+        "--sizes", type=_parse_sizes, default=list(BENCH_SIZES),
+        help="размеры таблиц через запятую (по умолчанию "
+             f"{','.join(map(str, BENCH_SIZES))})")
+    arg_parser.add_argument("--storage", choices=list_storage_engines(),
+                            default=DEFAULT_STORAGE,
+                            help=f"формат хранения (по умолчанию {DEFAULT_STORAGE})")
+    arg_parser.add_argument("--samples", type=int, default=BENCH_SAMPLES,
+                            help="число замеров точечных операций")
+    arg_parser.add_argument("--seed", type=int, default=BENCH_SEED,
+                            help="зерно генератора данных")
+    arg_parser.add_argument("--output", metavar="FILE",
+                            help="сохранить JSON с результатами в файл")
+    args = arg_parser.parse_args(argv)
+
+    report = run_benchmarks(args.sizes, args.storage, args.samples, args.seed)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    print(text)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
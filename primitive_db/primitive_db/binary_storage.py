@@ -0,0 +1,400 @@
+"""Бинарный формат таблиц с полями фиксированной ширины.
+
+Файл <table>.bin состоит из заголовка со схемой и записей одинаковой
+длины: байт флагов (удалена ли строка), битовая маска NULL и по 8 байт
+на колонку. int хранится как знаковое 8-байтовое число, str — как
+смещение и длина в отдельном файле-куче <table>.heap. Чтение идёт через
+mmap без разбора JSON, строка по id ищется двоичным поиском (id растут
+в порядке добавления), а int-поля и ссылки на строки обновляются на месте.
+
+Удалённая запись остаётся в файле с флагом, а старое значение изменённой
+строки — в куче. Заголовок считает такие мёртвые записи и байты кучи
+(read_binary_garbage), чтобы таблицу можно было переписать заново.
+"""
+
+from __future__ import annotations
+
+import mmap
+import os
+import struct
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import cached_property
+from pathlib import Path
+from typing import Any
+
+from .constants import ID_COLUMN_NAME
+
+_MAGIC = b"PDBT"
+_VERSION = 2
+# magic, версия, число колонок, размер заголовка, число записей,
+# число удалённых записей, мёртвые байты кучи
+_PREAMBLE = struct.Struct("<4sHHIQQQ")
+_ROW_COUNT_OFFSET = 12
+_DEAD_ROWS_OFFSET = 20
+_DEAD_HEAP_OFFSET = 28
+_COUNTER = struct.Struct("<Q")
+_COLUMN_NAME_LENGTH = struct.Struct("<H")
+_INT_SLOT = struct.Struct("<q")
+_STR_SLOT = struct.Struct("<II")
+_SLOT_SIZE = 8
+_DELETED_FLAG = 1
+
+_TYPE_CODES = {"int": 0, "str": 1}
+_TYPE_NAMES = {code: name for name, code in _TYPE_CODES.items()}
+
+
+@dataclass
+class BinaryLayout:
+    """Схема бинарного файла: колонки, размер заголовка и длина записи."""
+
+    columns: dict[str, str]
+    header_size: int
+
+    @property
+    def null_map_size(self) -> int:
+        return (len(self.columns) + 7) // 8
+
+    @property
+    def row_size(self) -> int:
+        return 1 + self.null_map_size + _SLOT_SIZE * len(self.columns)
+
+    def row_offset(self, position: int) -> int:
+        return self.header_size + position * self.row_size
+
+    def slot_offset(self, position: int, column_number: int) -> int:
+        return (self.row_offset(position) + 1 + self.null_map_size
+                + _SLOT_SIZE * column_number)
+
+    @property
+    def id_column_number(self) -> int:
+        return list(self.columns).index(ID_COLUMN_NAME)
+
+    @cached_property
+    def row_struct(self) -> struct.Struct:
+        """Формат всей записи, чтобы разбирать её одним unpack_from."""
+        slots = "".join("q" if column_type == "int" else "II"
+                        for column_type in self.columns.values())
+        return struct.Struct(f"<B{self.null_map_size}s{slots}")
+
+
+def _encode_header(columns: dict[str, str]) -> bytes:
+    descriptors = b""
+    for name, column_type in columns.items():
+        if column_type not in _TYPE_CODES:
+            raise ValueError(f"Тип {column_type!r} не поддерживается "
+                             "бинарным форматом")
+        encoded_name = name.encode("utf-8")
+        descriptors += (bytes([_TYPE_CODES[column_type]])
+                        + _COLUMN_NAME_LENGTH.pack(len(encoded_name))
+                        + encoded_name)
+    header_size = _PREAMBLE.size + len(descriptors)
+    return (_PREAMBLE.pack(_MAGIC, _VERSION, len(columns), header_size, 0, 0, 0)
+            + descriptors)
+
+
+def _decode_header(data: bytes | mmap.mmap) -> tuple[BinaryLayout, int]:
+    """Разбирает заголовок, возвращает схему и число записей."""
+    magic, version, column_count, header_size, row_count, _, _ = (
+        _PREAMBLE.unpack_from(data, 0))
+    if magic != _MAGIC or version != _VERSION:
+        raise ValueError("Файл не является бинарной таблицей primitive_db")
+    columns: dict[str, str] = {}
+    offset = _PREAMBLE.size
+    for _ in range(column_count):
+        type_code = data[offset]
+        (name_length,) = _COLUMN_NAME_LENGTH.unpack_from(data, offset + 1)
+        name_start = offset + 1 + _COLUMN_NAME_LENGTH.size
+        name = bytes(data[name_start:name_start + name_length]).decode("utf-8")
+        columns[name] = _TYPE_NAMES[type_code]
+        offset = name_start + name_length
+    return BinaryLayout(columns, header_size), row_count
+
+
+@contextmanager
+def _open_maps(table_path: Path, heap_path: Path,
+               writable: bool = False) -> Iterator[tuple[mmap.mmap, bytes | mmap.mmap]]:
+    """Открывает файл таблицы и кучу через mmap."""
+    mode = "r+b" if writable else "rb"
+    access = mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ
+    with table_path.open(mode) as table_file, heap_path.open("rb") as heap_file:
+        table_map = mmap.mmap(table_file.fileno(), 0, access=access)
+        heap_size = os.fstat(heap_file.fileno()).st_size
+        heap_map: bytes | mmap.mmap = (
+            mmap.mmap(heap_file.fileno(), 0, access=mmap.ACCESS_READ)
+            if heap_size else b""
+        )
+        try:
+            yield table_map, heap_map
+        finally:
+            table_map.close()
+            if isinstance(heap_map, mmap.mmap):
+                heap_map.close()
+
+
+class _HeapWriter:
+    """Дописывает строки в кучу и возвращает их смещение и длину."""
+
+    def __init__(self, heap_file: Any, start: int) -> None:
+        self._file = heap_file
+        self._offset = start
+
+    def add(self, text: str) -> tuple[int, int]:
+        data = text.encode("utf-8")
+        offset = self._offset
+        if offset + len(data) > 0xFFFFFFFF:
+            raise ValueError("Куча бинарной таблицы превысила 4 ГБ")
+        self._file.write(data)
+        self._offset += len(data)
+        return offset, len(data)
+
+
+def _encode_row(layout: BinaryLayout, row: dict[str, Any],
+                heap: _HeapWriter) -> bytes:
+    null_map = bytearray(layout.null_map_size)
+    slots = bytearray()
+    for number, (name, column_type) in enumerate(layout.columns.items()):
+        value = row.get(name)
+        if value is None:
+            null_map[number >> 3] |= 1 << (number & 7)
+            slots += bytes(_SLOT_SIZE)
+        elif column_type == "int":
+            try:
+                slots += _INT_SLOT.pack(int(value))
+            except struct.error as exc:
+                raise ValueError(f"Значение {value!r} колонки {name!r} "
+                                 "не помещается в 8 байт") from exc
+        else:
+            slots += _STR_SLOT.pack(*heap.add(str(value)))
+    return b"\x00" + bytes(null_map) + bytes(slots)
+
+
+def _decode_row(layout: BinaryLayout, data: bytes | mmap.mmap,
+                heap: bytes | mmap.mmap, position: int) -> dict[str, Any] | None:
+    fields = layout.row_struct.unpack_from(data, layout.row_offset(position))
+    if fields[0] & _DELETED_FLAG:
+        return None
+    null_map = fields[1]
+    row: dict[str, Any] = {}
+    field_number = 2
+    for number, (name, column_type) in enumerate(layout.columns.items()):
+        is_null = null_map[number >> 3] & (1 << (number & 7))
+        if column_type == "int":
+            row[name] = None if is_null else fields[field_number]
+            field_number += 1
+            continue
+        if is_null:
+            row[name] = None
+        else:
+            heap_offset = fields[field_number]
+            length = fields[field_number + 1]
+            row[name] = bytes(heap[heap_offset:heap_offset + length]).decode("utf-8")
+        field_number += 2
+    return row
+
+
+def read_binary_columns(table_path: Path) -> dict[str, str]:
+    """Возвращает схему колонок из заголовка бинарной таблицы."""
+    with table_path.open("rb") as table_file:
+        data = table_file.read(_PREAMBLE.size)
+        header_size = _PREAMBLE.unpack(data)[3]
+        data += table_file.read(header_size - _PREAMBLE.size)
+    layout, _ = _decode_header(data)
+    return layout.columns
+
+
+@dataclass
+class BinaryGarbage:
+    """Живые и мёртвые записи и байты кучи бинарной таблицы."""
+
+    live_rows: int
+    dead_rows: int
+    live_heap_bytes: int
+    dead_heap_bytes: int
+
+
+def read_binary_garbage(table_path: Path, heap_path: Path) -> BinaryGarbage:
+    """Читает из заголовка, сколько места занимают удалённые данные."""
+    with table_path.open("rb") as table_file:
+        fields = _PREAMBLE.unpack(table_file.read(_PREAMBLE.size))
+    row_count, dead_rows, dead_heap_bytes = fields[4:]
+    heap_size = heap_path.stat().st_size
+    return BinaryGarbage(row_count - dead_rows, dead_rows,
+                         heap_size - dead_heap_bytes, dead_heap_bytes)
+
+
+def _add_counter(data: mmap.mmap, offset: int, amount: int) -> None:
+    (value,) = _COUNTER.unpack_from(data, offset)
+    _COUNTER.pack_into(data, offset, value + amount)
+
+
+def _heap_bytes(layout: BinaryLayout, data: mmap.mmap, position: int,
+                column_number: int) -> int:
+    """Длина в куче строкового значения записи (0 — значение NULL)."""
+    null_byte = layout.row_offset(position) + 1 + (column_number >> 3)
+    if data[null_byte] & (1 << (column_number & 7)):
+        return 0
+    return _STR_SLOT.unpack_from(
+        data, layout.slot_offset(position, column_number))[1]
+
+
+def write_binary_table(table_path: Path, heap_path: Path,
+                       columns: dict[str, str],
+                       rows: Iterable[dict[str, Any]]) -> None:
+    """Полностью переписывает бинарную таблицу (строки сортируются по id)."""
+    header = _encode_header(columns)
+    layout, _ = _decode_header(header)
+    tmp_table = table_path.with_name(table_path.name + ".tmp")
+    tmp_heap = heap_path.with_name(heap_path.name + ".tmp")
+    row_count = 0
+    with tmp_table.open("wb") as table_file, tmp_heap.open("wb") as heap_file:
+        heap = _HeapWriter(heap_file, 0)
+        table_file.write(header)
+        for row in sorted(rows, key=lambda row: row[ID_COLUMN_NAME]):
+            table_file.write(_encode_row(layout, row, heap))
+            row_count += 1
+        table_file.seek(_ROW_COUNT_OFFSET)
+        table_file.write(struct.pack("<Q", row_count))
+        for written_file in (table_file, heap_file):
+            written_file.flush()
+            os.fsync(written_file.fileno())
+    os.replace(tmp_heap, heap_path)
+    os.replace(tmp_table, table_path)
+
+
+def iter_binary_rows(table_path: Path,
+                     heap_path: Path) -> Iterator[dict[str, Any]]:
+    """Последовательно читает живые строки бинарной таблицы."""
+    with _open_maps(table_path, heap_path) as (data, heap):
+        layout, row_count = _decode_header(data)
+        for position in range(row_count):
+            row = _decode_row(layout, data, heap, position)
+            if row is not None:
+                yield row
+
+
+def _find_position(layout: BinaryLayout, data: mmap.mmap, row_count: int,
+                   row_id: int) -> int | None:
+    """Двоичный поиск записи по id (id в файле возрастают)."""
+    id_number = layout.id_column_number
+    low, high = 0, row_count - 1
+    while low <= high:
+        middle = (low + high) // 2
+        (current,) = _INT_SLOT.unpack_from(data, layout.slot_offset(middle, id_number))
+        if current == row_id:
+            return middle
+        if current < row_id:
+            low = middle + 1
+        else:
+            high = middle - 1
+    return None
+
+
+def get_binary_row(table_path: Path, heap_path: Path,
+                   row_id: int) -> dict[str, Any] | None:
+    """Читает одну строку по id без просмотра всей таблицы."""
+    with _open_maps(table_path, heap_path) as (data, heap):
+        layout, row_count = _decode_header(data)
+        position = _find_position(layout, data, row_count, row_id)
+        if position is None:
+            return None
+        return _decode_row(layout, data, heap, position)
+
+
+def append_binary_rows(table_path: Path, heap_path: Path,
+                       rows: Iterable[dict[str, Any]]) -> int:
+    """Дописывает строки в конец таблицы и возвращает их число.
+
+    id новых строк должны быть больше уже записанных. При ошибке файл
+    обрезается до исходного размера.
+    """
+    columns = read_binary_columns(table_path)
+    layout, _ = _decode_header(_encode_header(columns))
+    count = 0
+    with table_path.open("r+b") as table_file, heap_path.open("ab") as heap_file:
+        (row_count,) = struct.unpack("<Q", os.pread(table_file.fileno(), 8,
+                                                    _ROW_COUNT_OFFSET))
+        table_file.seek(layout.row_offset(row_count))
+        heap_start = heap_file.seek(0, os.SEEK_END)
+        heap = _HeapWriter(heap_file, heap_start)
+        try:
+            for row in rows:
+                table_file.write(_encode_row(layout, row, heap))
+                count += 1
+        except BaseException:
+            table_file.truncate(layout.row_offset(row_count))
+            heap_file.truncate(heap_start)
+            raise
+        table_file.seek(_ROW_COUNT_OFFSET)
+        table_file.write(struct.pack("<Q", row_count + count))
+    return count
+
+
+def update_binary_row(table_path: Path, heap_path: Path,
+                      row: dict[str, Any]) -> bool:
+    """Обновляет поля строки на месте; возвращает False, если строки нет.
+
+    int-поля и флаги NULL перезаписываются в самой записи. Изменившиеся
+    строковые значения дописываются в кучу, а в запись кладётся ссылка
+    на них; неизменённые поля не трогаются. Байты прежних значений
+    учитываются в заголовке как мёртвые.
+    """
+    with _open_maps(table_path, heap_path, writable=True) as (data, heap_map), \
+            heap_path.open("ab") as heap_file:
+        layout, row_count = _decode_header(data)
+        position = _find_position(layout, data, row_count, row[ID_COLUMN_NAME])
+        if position is None:
+            return False
+        current = _decode_row(layout, data, heap_map, position)
+        if current is None:
+            return False
+
+        heap = _HeapWriter(heap_file, heap_file.seek(0, os.SEEK_END))
+        null_map_offset = layout.row_offset(position) + 1
+        dead_heap_bytes = 0
+        for number, (name, column_type) in enumerate(layout.columns.items()):
+            value = row.get(name)
+            if value == current.get(name):
+                continue
+            if column_type == "str":
+                dead_heap_bytes += _heap_bytes(layout, data, position, number)
+            null_byte = null_map_offset + (number >> 3)
+            if value is None:
+                data[null_byte] |= 1 << (number & 7)
+                continue
+            data[null_byte] &= ~(1 << (number & 7)) & 0xFF
+            slot_offset = layout.slot_offset(position, number)
+            if column_type == "int":
+                _INT_SLOT.pack_into(data, slot_offset, int(value))
+            else:
+                _STR_SLOT.pack_into(data, slot_offset, *heap.add(str(value)))
+        if dead_heap_bytes:
+            _add_counter(data, _DEAD_HEAP_OFFSET, dead_heap_bytes)
+        data.flush()
+    return True
+
+
+def delete_binary_row(table_path: Path, row_id: int) -> bool:
+    """Помечает строку удалённой; возвращает False, если строки нет.
+
+    Запись и её строковые значения в куче учитываются как мёртвые.
+    """
+    with table_path.open("r+b") as table_file:
+        data = mmap.mmap(table_file.fileno(), 0, access=mmap.ACCESS_WRITE)
+        try:
+            layout, row_count = _decode_header(data)
+            position = _find_position(layout, data, row_count, row_id)
+            if (position is None
+                    or data[layout.row_offset(position)] & _DELETED_FLAG):
+                return False
+            data[layout.row_offset(position)] |= _DELETED_FLAG
+            _add_counter(data, _DEAD_ROWS_OFFSET, 1)
+            _add_counter(data, _DEAD_HEAP_OFFSET, sum(
+                _heap_bytes(layout, data, position, number)
+                for number, column_type in enumerate(layout.columns.values())
+                if column_type == "str"))
+            data.flush()
+        finally:
+            data.close()
+    return True
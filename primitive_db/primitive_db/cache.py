@@ -0,0 +1,170 @@
+"""Ограниченный LRU-кэш результатов select."""
+
+from __future__ import annotations
+
+import sys
+import threading
+from collections import OrderedDict
+from collections.abc import Hashable
+from dataclasses import dataclass
+
+from .columnar import ColumnarTable
+from .constants import QUERY_CACHE_MAX_BYTES, QUERY_CACHE_MAX_ROWS
+
+Rows = list[dict[str, object]]
+# Результат выборки: колоночная таблица или (для совместимости) список строк
+Result = ColumnarTable | Rows
+
+
+def estimate_rows_size(rows: Rows) -> int:
+    """Оценивает, сколько байт памяти занимают строки результата.
+
+    Учитываются список, словари строк и значения; строки-ключи колонок
+    общие для всех строк и не считаются.
+    """
+    size = sys.getsizeof(rows)
+    for row in rows:
+        size += sys.getsizeof(row)
+        for value in row.values():
+            size += sys.getsizeof(value)
+    return size
+
+
+def estimate_result_size(result: Result) -> int:
+    """Оценивает память, занятую результатом выборки."""
+    if isinstance(result, ColumnarTable):
+        return result.nbytes
+    return estimate_rows_size(result)
+
+
+@dataclass
+class _CacheEntry:
+    rows: Result
+    size: int
+
+
+class QueryCache:
+    """LRU-кэш результатов выборок с бюджетом по памяти и числу строк.
+
+    Ключ записи — (таблица, предикат). Для каждой таблицы ведётся номер
+    поколения: запись таблицы увеличивает его и выбрасывает её результаты,
+    а результат, посчитанный до записи, в кэш уже не попадёт. Изменения
+    из других процессов отслеживаются по поколению таблицы на диске
+    (см. sync_generation). Кэш общий для потоков сервера, поэтому все
+    операции идут под блокировкой.
+    """
+
+    def __init__(self, max_bytes: int = QUERY_CACHE_MAX_BYTES,
+                 max_rows: int = QUERY_CACHE_MAX_ROWS) -> None:
+        self.max_bytes = max_bytes
+        self.max_rows = max_rows
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple[str, Hashable], _CacheEntry] = OrderedDict()
+        self._generations: dict[str, int] = {}
+        self._disk_generations: dict[str, int] = {}
+        self._bytes = 0
+        self._rows = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.remote_invalidations = 0
+
+    def generation(self, table_name: str) -> int:
+        """Возвращает текущее поколение таблицы."""
+        with self._lock:
+            return self._generations.get(table_name, 0)
+
+    def sync_generation(self, table_name: str, disk_generation: int) -> None:
+        """Сверяет поколение таблицы на диске с тем, что видел кэш.
+
+        Если таблицу изменил другой процесс, её результаты сбрасываются.
+        Вызывается перед каждым обращением к кэшу за этой таблицей.
+        """
+        with self._lock:
+            known = self._disk_generations.get(table_name)
+            if known == disk_generation:
+                return
+            if known is not None:
+                self._drop_table(table_name)
+                self.remote_invalidations += 1
+            self._disk_generations[table_name] = disk_generation
+
+    def get(self, table_name: str, predicate: Hashable) -> Result | None:
+        """Возвращает закэшированный результат или None."""
+        with self._lock:
+            entry = self._entries.get((table_name, predicate))
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((table_name, predicate))
+            self.hits += 1
+            return entry.rows
+
+    def put(self, table_name: str, predicate: Hashable, rows: Result,
+            generation: int) -> None:
+        """Кладёт результат в кэш, если он посчитан для текущего поколения.
+
+        Результаты, которые сами не помещаются в бюджет, не кэшируются.
+        """
+        size = estimate_result_size(rows)
+        if size > self.max_bytes or len(rows) > self.max_rows:
+            return
+
+        with self._lock:
+            if generation != self._generations.get(table_name, 0):
+                return
+            self._remove((table_name, predicate))
+            self._entries[(table_name, predicate)] = _CacheEntry(rows, size)
+            self._bytes += size
+            self._rows += len(rows)
+            while self._bytes > self.max_bytes or self._rows > self.max_rows:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+    def invalidate(self, table_name: str,
+                   disk_generation: int | None = None) -> None:
+        """Сбрасывает результаты таблицы и увеличивает её поколение.
+
+        disk_generation — поколение таблицы на диске после собственной
+        записи процесса, чтобы она не считалась записью другого процесса.
+        """
+        with self._lock:
+            self._drop_table(table_name)
+            if disk_generation is not None:
+                self._disk_generations[table_name] = disk_generation
+
+    def clear(self) -> None:
+        """Полностью очищает кэш (счётчики сохраняются)."""
+        with self._lock:
+            for table_name in {key[0] for key in self._entries}:
+                self._drop_table(table_name)
+
+    def stats(self) -> dict[str, float]:
+        """Возвращает статистику кэша."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "rows": self._rows,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "max_rows": self.max_rows,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "remote_invalidations": self.remote_invalidations,
+            }
+
+    def _drop_table(self, table_name: str) -> None:
+        """Убирает результаты таблицы и увеличивает её поколение (под _lock)."""
+        self._generations[table_name] = self._generations.get(table_name, 0) + 1
+        for key in [key for key in self._entries if key[0] == table_name]:
+            self._remove(key)
+
+    def _remove(self, key: tuple[str, Hashable]) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+            self._rows -= len(entry.rows)
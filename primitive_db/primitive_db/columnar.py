@@ -0,0 +1,271 @@
+"""Колоночное представление таблицы в памяти.
+
+Вместо списка словарей каждая колонка хранится отдельно: int-колонки —
+в array('q') с битовой маской NULL, str-колонки — кодами словаря
+(dictionary encoding). Условия проверяются по колонке целиком: каждое
+сравнение проходит по массиву значений (у str-колонки — один раз по
+словарю, затем по кодам), and/or/not объединяют множества позиций, а
+строки собираются в словари только для подошедших позиций при выводе.
+"""
+
+from __future__ import annotations
+
+import sys
+from array import array
+from collections.abc import Iterable, Iterator
+from typing import Any
+
+from .expressions import (
+    And,
+    Expression,
+    Not,
+    Or,
+    ValueTest,
+    compile_value_test,
+)
+
+# Код NULL в str-колонке
+_NULL_CODE = -1
+
+
+class _IntColumn:
+    """int-колонка: значения в array('q') и битовая маска NULL."""
+
+    def __init__(self) -> None:
+        self.values = array("q")
+        self.nulls = bytearray()
+        self.size = 0
+
+    def append(self, value: Any) -> None:
+        if self.size % 8 == 0:
+            self.nulls.append(0)
+        if value is None:
+            self.values.append(0)
+            self.nulls[self.size >> 3] |= 1 << (self.size & 7)
+        else:
+            self.values.append(int(value))
+        self.size += 1
+
+    def is_null(self, position: int) -> bool:
+        return bool(self.nulls[position >> 3] & (1 << (position & 7)))
+
+    def get(self, position: int) -> object:
+        return None if self.is_null(position) else self.values[position]
+
+    def find_equal(self, expected: object) -> list[int]:
+        """Позиции, где значение равно числу expected (NULL не равен ничему)."""
+        if not isinstance(expected, int):
+            return []
+        values = self.values
+        return [
+            position for position, value in enumerate(values)
+            if value == expected and not self.is_null(position)
+        ]
+
+    def find(self, test: ValueTest, null_matches: bool) -> list[int]:
+        """Позиции, где test(значение) истинен; у NULL — null_matches."""
+        if not any(self.nulls):
+            return [position for position, value in enumerate(self.values)
+                    if test(value)]
+        is_null = self.is_null
+        return [
+            position for position, value in enumerate(self.values)
+            if (null_matches if is_null(position) else test(value))
+        ]
+
+    @property
+    def nbytes(self) -> int:
+        return self.values.itemsize * len(self.values) + len(self.nulls)
+
+
+class _StrColumn:
+    """str-колонка со словарным кодированием: коды в array('l')."""
+
+    def __init__(self) -> None:
+        self.codes = array("l")
+        self.dictionary: list[str] = []
+        self._code_by_value: dict[str, int] = {}
+
+    def append(self, value: Any) -> None:
+        if value is None:
+            self.codes.append(_NULL_CODE)
+            return
+        text = str(value)
+        code = self._code_by_value.get(text)
+        if code is None:
+            code = len(self.dictionary)
+            self.dictionary.append(text)
+            self._code_by_value[text] = code
+        self.codes.append(code)
+
+    def get(self, position: int) -> object:
+        code = self.codes[position]
+        return None if code == _NULL_CODE else self.dictionary[code]
+
+    def find_equal(self, expected: object) -> list[int]:
+        """Позиции, где значение равно строке expected: сравниваются только коды."""
+        code = (self._code_by_value.get(expected)
+                if isinstance(expected, str) else None)
+        if code is None:
+            return []
+        return [position for position, value in enumerate(self.codes)
+                if value == code]
+
+    def find(self, test: ValueTest, null_matches: bool) -> list[int]:
+        """Позиции, где test(значение) истинен; у NULL — null_matches.
+
+        test вызывается один раз на значение словаря, строки проверяются
+        по кодам; последний флаг отвечает коду NULL (-1).
+        """
+        flags = [test(text) for text in self.dictionary]
+        flags.append(null_matches)
+        return [position for position, code in enumerate(self.codes)
+                if flags[code]]
+
+    @property
+    def nbytes(self) -> int:
+        return (self.codes.itemsize * len(self.codes)
+                + sum(sys.getsizeof(text) for text in self.dictionary))
+
+
+class _ObjectColumn:
+    """Запасной вариант для значений, не влезающих в 64-битный int."""
+
+    def __init__(self, values: Iterable[object] = ()) -> None:
+        self.values: list[object] = list(values)
+
+    def append(self, value: Any) -> None:
+        self.values.append(value)
+
+    def get(self, position: int) -> object:
+        return self.values[position]
+
+    def find_equal(self, expected: object) -> list[int]:
+        return [position for position, value in enumerate(self.values)
+                if value is not None and value == expected]
+
+    def find(self, test: ValueTest, null_matches: bool) -> list[int]:
+        return [
+            position for position, value in enumerate(self.values)
+            if (null_matches if value is None else test(value))
+        ]
+
+    @property
+    def nbytes(self) -> int:
+        return sys.getsizeof(self.values) + sum(
+            sys.getsizeof(value) for value in self.values)
+
+
+_Column = _IntColumn | _StrColumn | _ObjectColumn
+
+
+class ColumnarTable:
+    """Таблица в памяти, хранящая данные по колонкам.
+
+    Итерация по таблице возвращает строки-словари, поэтому её можно
+    использовать там, где раньше был список строк.
+    """
+
+    def __init__(self, columns: dict[str, str]) -> None:
+        self.column_types = dict(columns)
+        self._columns: dict[str, _Column] = {
+            name: _IntColumn() if column_type == "int" else _StrColumn()
+            for name, column_type in columns.items()
+        }
+        self._size = 0
+
+    @classmethod
+    def from_rows(cls, columns: dict[str, str],
+                  rows: Iterable[dict[str, Any]]) -> ColumnarTable:
+        """Строит колоночную таблицу из строк-словарей."""
+        table = cls(columns)
+        for row in rows:
+            table.append(row)
+        return table
+
+    @property
+    def column_names(self) -> list[str]:
+        return list(self._columns)
+
+    def append(self, row: dict[str, Any]) -> None:
+        """Добавляет строку в конец таблицы."""
+        for name, column in self._columns.items():
+            value = row.get(name)
+            try:
+                column.append(value)
+            except OverflowError:
+                # Значение не помещается в int64 — колонка хранится списком
+                assert isinstance(column, _IntColumn)
+                fallback = _ObjectColumn(column.get(position)
+                                         for position in range(self._size))
+                fallback.append(value)
+                self._columns[name] = fallback
+        self._size += 1
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[dict[str, object]]:
+        return self.iter_rows()
+
+    def iter_rows(self, positions: Iterable[int] | None = None,
+                  ) -> Iterator[dict[str, object]]:
+        """Собирает строки-словари (все или по списку позиций)."""
+        names = self.column_names
+        for values in self.iter_tuples(positions):
+            yield dict(zip(names, values))
+
+    def iter_tuples(self, positions: Iterable[int] | None = None,
+                    ) -> Iterator[tuple[object, ...]]:
+        """Возвращает значения строк кортежами в порядке column_names."""
+        if positions is None:
+            positions = range(self._size)
+        getters = [column.get for column in self._columns.values()]
+        for position in positions:
+            yield tuple(get(position) for get in getters)
+
+    def find_equal(self, column_name: str, expected: object) -> list[int]:
+        """Позиции строк, у которых колонка равна expected.
+
+        expected уже приведён к типу колонки (expressions.equality_literal),
+        а пустые значения не равны ничему — как в условии поле=значение.
+        """
+        column = self._columns.get(column_name)
+        if column is None:
+            return []
+        return column.find_equal(expected)
+
+    def find_where(self, expression: Expression) -> list[int]:
+        """Позиции строк, подходящих под условие where, по возрастанию.
+
+        Результат совпадает с compile_predicate(expression) над строками,
+        но словари строк не собираются: сравнения проверяются по колонкам.
+        """
+        return sorted(self._positions_where(expression))
+
+    def _positions_where(self, expression: Expression) -> set[int]:
+        if isinstance(expression, And):
+            left = self._positions_where(expression.left)
+            if not left:
+                return left
+            return left & self._positions_where(expression.right)
+        if isinstance(expression, Or):
+            return (self._positions_where(expression.left)
+                    | self._positions_where(expression.right))
+        if isinstance(expression, Not):
+            return (set(range(self._size))
+                    - self._positions_where(expression.operand))
+        test, null_matches = compile_value_test(expression,
+                                                self.column_types)
+        return set(self._columns[expression.column].find(test, null_matches))
+
+    def take(self, positions: Iterable[int]) -> ColumnarTable:
+        """Возвращает новую таблицу из строк с указанными позициями."""
+        return ColumnarTable.from_rows(self.column_types,
+                                       self.iter_rows(positions))
+
+    @property
+    def nbytes(self) -> int:
+        """Оценка памяти, занятой данными колонок."""
+        return sys.getsizeof(self) + sum(
+            column.nbytes for column in self._columns.values())
@@ -9,5 +9,94 @@ DB_META_FILE: Path = DATA_DIR / "db_meta.json"
 # Имя колонки с авто‑инкрементным ID
 ID_COLUMN_NAME = "id"
 
+# id новых строк выдаются из памяти блоками по ID_BLOCK_SIZE: next_id в
+# схеме таблицы сохраняется один раз на блок (см. ids.py)
+ID_BLOCK_SIZE = 1000
+
 # Поддерживаемые типы колонок
 SUPPORTED_COLUMN_TYPES: tuple[str, ...] = ("int", "str")
+
+# Агрегатные функции select (count(*), sum(col), ...)
+AGGREGATE_FUNCTIONS: tuple[str, ...] = ("count", "sum", "min", "max", "avg")
+
+# Форматы хранения таблиц:
+#   json   — весь список строк одним JSON-файлом (исходный формат);
+#   jsonl  — журнал записей по одной на строку (вставка дописывает одну строку);
+#   binary — записи фиксированной ширины, чтение через mmap;
+#   segmented — сегменты по диапазонам id, просмотр параллельно в процессах.
+# Реализации форматов — классы StorageEngine в engine.py (там же
+# register_storage_engine для новых форматов).
+JSON_STORAGE = "json"
+LOG_STORAGE = "jsonl"
+BINARY_STORAGE = "binary"
+SEGMENTED_STORAGE = "segmented"
+DEFAULT_STORAGE = LOG_STORAGE
+
+# Сегментированные таблицы: строк (id) в одном сегменте, число процессов
+# параллельного просмотра (None — по числу ядер) и с какого числа
+# сегментов просмотр распределяется по процессам
+SEGMENT_ROWS = 10_000
+SCAN_WORKERS: int | None = None
+PARALLEL_SCAN_MIN_SEGMENTS = 2
+
+# Сжатие сегментов (каждый сегмент — независимо сжатый блок)
+NO_COMPRESSION = "none"
+SEGMENT_COMPRESSIONS: tuple[str, ...] = (NO_COMPRESSION, "zlib", "lzma")
+
+# Первичный индекс jsonl-таблиц (id -> смещение записи в журнале)
+# сбрасывается на диск после стольких новых записей журнала
+PK_INDEX_FLUSH_RECORDS = 1000
+
+# Журнал уплотняется, когда мёртвых записей больше, чем живых строк
+# (и больше этого порога)
+LOG_COMPACT_MIN_DEAD_RECORDS = 1000
+
+# Бинарная таблица переписывается, когда удалённых записей больше, чем
+# живых (и больше первого порога), или мёртвых байт кучи больше, чем
+# живых (и больше второго)
+BINARY_COMPACT_MIN_DEAD_ROWS = 1000
+BINARY_COMPACT_MIN_DEAD_HEAP_BYTES = 64 * 1024
+
+# Вторичные (пользовательские) индексы сбрасываются на диск после
+# стольких учтённых изменений строк
+COLUMN_INDEX_FLUSH_RECORDS = 1000
+
+# Бюджет кэша результатов select: по оценке занимаемой памяти и по числу строк
+QUERY_CACHE_MAX_BYTES = 64 * 1024 * 1024
+QUERY_CACHE_MAX_ROWS = 500_000
+
+# Вывод select порциями: размер порции (и выборки для ширины колонок)
+# и предельная ширина колонки (длинные значения переносятся)
+RENDER_CHUNK_ROWS = 200
+RENDER_MAX_COLUMN_WIDTH = 60
+
+# Планировщик запросов: стоимость чтения одной строки по id относительно
+# строки полного просмотра и доли подходящих строк, когда для колонки нет
+# статистики analyze (для равенства и для сравнений <, <=, >, >=)
+PLANNER_LOOKUP_COST = 4.0
+PLANNER_EQUALITY_SELECTIVITY = 0.1
+PLANNER_RANGE_SELECTIVITY = 1 / 3
+# json-таблица отдаёт строки по id за один разбор файла: он стоит такую
+# долю полного просмотра, а каждая выбранная строка — ещё 1
+PLANNER_JSON_PARSE_COST = 0.5
+
+# Метрики (команда stats): границы гистограмм задержек в секундах и
+# префикс имён при выгрузке в формате Prometheus
+METRICS_LATENCY_BUCKETS: tuple[float, ...] = (
+    0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0,
+)
+METRICS_PREFIX = "primitive_db_"
+
+# Журнал упреждающей записи (WAL): каждое изменение сначала дописывается
+# сюда и сбрасывается на диск. Контрольная точка очищает журнал, когда он
+# вырастает больше WAL_CHECKPOINT_BYTES, а фоновый поток проверяет это
+# раз в WAL_CHECKPOINT_INTERVAL секунд.
+WAL_FILE: Path = DATA_DIR / "wal.log"
+WAL_CHECKPOINT_BYTES = 4 * 1024 * 1024
+WAL_CHECKPOINT_INTERVAL = 5.0
+
+# Сетевой режим (project serve): адрес по умолчанию и число потоков,
+# в которых выполняются команды клиентов
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 7433
+SERVER_WORKERS = 8
@@ -1,25 +1,367 @@
 from __future__ import annotations
 
-from collections.abc import Callable
+import copy
+import csv
+import json
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import wraps
+from itertools import islice
+from pathlib import Path
 from typing import Any
 
-from .constants import ID_COLUMN_NAME, SUPPORTED_COLUMN_TYPES
+from .constants import (
+    DEFAULT_STORAGE,
+    ID_COLUMN_NAME,
+    NO_COMPRESSION,
+    SEGMENTED_STORAGE,
+    SUPPORTED_COLUMN_TYPES,
+)
 from .engine import (
+    aggregate_table_rows,
+    append_table_row,
+    append_table_rows,
+    change_table_rows,
+    count_scanned_segments,
+    count_table_rows,
+    delete_table_data,
+    delete_table_row,
+    get_meta_cache_stats,
+    get_storage_engine,
+    get_table_row,
+    get_table_rows,
+    get_table_storage,
+    iter_table_rows,
     load_db_meta,
     save_db_meta,
     load_table_data,
+    read_table_generation,
+    replace_table_row,
     save_table_data,
+    scan_table_rows,
+)
+from .aggregates import HashAggregator, check_aggregates
+from .cache import QueryCache
+from .columnar import ColumnarTable
+from .expressions import (
+    Comparison,
+    Expression,
+    Predicate,
+    as_simple_equality,
+    compile_predicate,
+    equality_literal,
+)
+from .ids import (
+    allocate_id,
+    new_table_uid,
+    release_id_block,
+    tables_with_id_blocks,
+    take_id,
+    unused_ids,
+)
+from .indexes import (
+    build_column_index,
+    drop_column_indexes,
+    get_column_index,
+    refresh_column_indexes,
+    update_column_indexes,
 )
+from .locks import write_lock
+from .metrics import measure
+from .planner import (
+    ACCESS_FULL_SCAN,
+    ACCESS_INDEX_LOOKUP,
+    ACCESS_PK_LOOKUP,
+    ACCESS_RANGE_SCAN,
+    QueryPlan,
+    plan_query,
+)
+from .wal import (
+    create_record,
+    delete_record,
+    drop_record,
+    meta_record,
+    put_record,
+    wal_group,
+)
+
+# Кэш результатов select: LRU с бюджетом по памяти и поколениями таблиц
+_QUERY_CACHE = QueryCache()
+
+def _to_int(value: object) -> int:
+    """Значение int-колонки: целое число или строка с ним.
+
+    float и bool не принимаются, чтобы 3.7 не превращалось в 3, а true — в 1.
+    """
+    if type(value) is int:
+        return value
+    if isinstance(value, str):
+        try:
+            return int(value)
+        except ValueError:
+            pass
+    raise ValueError(f"ожидалось целое число, получено {value!r}")
+
+
+# Преобразователи значений по типу колонки
+_COLUMN_CONVERTERS: dict[str, Callable[[Any], object]] = {
+    "int": _to_int,
+    "str": str,
+}
+
+
+def clear_query_cache() -> None:
+    """Очищает кэш select всех таблиц (холодные замеры, тесты)."""
+    _QUERY_CACHE.clear()
+
+
+def _invalidate_cache(table_name: str) -> None:
+    """Сбрасывает кэш select таблицы после её изменения этим процессом."""
+    _QUERY_CACHE.invalidate(table_name, read_table_generation(table_name))
+
+
+@dataclass
+class Transaction:
+    """Открытая транзакция: изменения копятся в памяти до commit.
+
+    Таблица читается целиком при первой записи в неё, дальше все
+    insert/update/delete меняют только копию в памяти. При commit каждая
+    изменённая таблица и метаданные записываются один раз, а записи WAL
+    всех изменений — одной группой с одним fsync.
+
+    При begin запоминаются поколения всех таблиц и снимок их схем
+    (snapshot). meta — рабочая копия схем, которую меняет транзакция
+    (например, next_id при вставке).
+    """
+
+    meta: dict[str, Any]
+    snapshot: dict[str, Any] = field(default_factory=dict)
+    generations: dict[str, int] = field(default_factory=dict)
+    tables: dict[str, dict[int, dict[str, Any]]] = field(default_factory=dict)
+    dirty: set[str] = field(default_factory=set)
+    records: list[dict[str, Any]] = field(default_factory=list)
+
+    def rows(self, table_name: str) -> dict[int, dict[str, Any]]:
+        """Возвращает строки таблицы в транзакции (id -> строка)."""
+        rows = self.tables.get(table_name)
+        if rows is None:
+            rows = {row[ID_COLUMN_NAME]: row
+                    for row in load_table_data(table_name)}
+            self.tables[table_name] = rows
+        return rows
+
+    def conflicts(self, table_name: str, meta: dict[str, Any]) -> bool:
+        """Меняли ли таблицу после begin: её строки или схему (с next_id).
+
+        meta — метаданные, прочитанные под блокировкой записи.
+        """
+        return (read_table_generation(table_name)
+                != self.generations.get(table_name)
+                or meta.get(table_name) != self.snapshot.get(table_name))
+
+
+# Текущая транзакция (None — каждая команда пишется сразу). Хранится в
+# контекстной переменной: у каждого соединения сервера транзакция своя
+_TRANSACTION: ContextVar[Transaction | None] = ContextVar("transaction",
+                                                         default=None)
+
+
+def in_transaction(table_name: str | None = None) -> bool:
+    """Проверяет, открыта ли транзакция (и менялась ли в ней таблица)."""
+    if table_name is None:
+        return _TRANSACTION.get() is not None
+    return _transaction_rows(table_name) is not None
+
+
+def begin_transaction() -> None:
+    """Открывает транзакцию."""
+    if _TRANSACTION.get() is not None:
+        raise ValueError("Транзакция уже открыта")
+    # Поколения читаются раньше схем: запись между ними заметит commit
+    generations = {table_name: read_table_generation(table_name)
+                   for table_name in load_db_meta()}
+    meta = load_db_meta()
+    _TRANSACTION.set(Transaction(meta=meta, snapshot=copy.deepcopy(meta),
+                                 generations=generations))
+
+
+def commit_transaction() -> list[str]:
+    """Записывает изменения транзакции и возвращает изменённые таблицы.
+
+    Все изменения сначала попадают в WAL одной группой, затем
+    сохраняются метаданные и таблицы — каждая одним файлом через
+    временный файл и атомарную подмену. Если процесс упадёт посередине,
+    недописанное повторит wal.recover(). Если изменённую таблицу с
+    начала транзакции менял кто-то ещё (строки или схему, в том числе
+    next_id), транзакция отменяется: иначе её копия затёрла бы чужие
+    изменения.
+    """
+    transaction = _TRANSACTION.get()
+    if transaction is None:
+        raise ValueError("Нет открытой транзакции")
+    _TRANSACTION.set(None)
+
+    touched = [name for name in transaction.tables if name in transaction.dirty]
+    if not touched:
+        return []
+
+    with write_lock(*touched), wal_group() as group:
+        # Схемы остальных таблиц могли измениться после begin
+        meta = load_db_meta()
+        for table_name in touched:
+            if transaction.conflicts(table_name, meta):
+                raise ValueError(f"Таблицу {table_name!r} изменил другой "
+                                 "процесс, транзакция отменена")
+        for table_name in touched:
+            meta[table_name] = transaction.meta[table_name]
+        for record in transaction.records:
+            group.add(record)
+        group.commit()
+        save_db_meta(meta)
+        for table_name in touched:
+            save_table_data(table_name,
+                            list(transaction.tables[table_name].values()),
+                            columns=transaction.meta[table_name]["columns"])
+    for table_name in touched:
+        schema = transaction.meta[table_name]
+        refresh_column_indexes(table_name, schema.get("indexes", []))
+        _invalidate_cache(table_name)
+    return touched
+
+
+def rollback_transaction() -> None:
+    """Отменяет транзакцию: накопленные изменения отбрасываются."""
+    if _TRANSACTION.get() is None:
+        raise ValueError("Нет открытой транзакции")
+    _TRANSACTION.set(None)
+
+
+def _load_meta() -> dict[str, Any]:
+    """Метаданные с учётом открытой транзакции."""
+    transaction = _TRANSACTION.get()
+    if transaction is not None:
+        return transaction.meta
+    return load_db_meta()
+
+
+def _save_meta(meta: dict[str, Any]) -> None:
+    """Сохраняет метаданные (в транзакции они уже изменены в памяти)."""
+    if _TRANSACTION.get() is None:
+        save_db_meta(meta)
+
+
+@contextmanager
+def _logged(*records: dict[str, Any]) -> Iterator[None]:
+    """Надёжно записывает изменение в WAL, а затем даёт применить его.
+
+    В транзакции записи только копятся и попадают в журнал при commit.
+    """
+    transaction = _TRANSACTION.get()
+    if transaction is not None:
+        transaction.records.extend(records)
+        yield
+        return
+    with wal_group() as group:
+        for record in records:
+            group.add(record)
+        group.commit()
+        yield
+
+
+def _write_operation(func: Callable[..., Any]) -> Callable[..., Any]:
+    """Выполняет изменение таблицы (1-й аргумент) под блокировкой записи.
+
+    Чтение метаданных, проверка и запись идут под одной блокировкой,
+    поэтому параллельные сессии не теряют изменения друг друга. В
+    транзакции изменения идут в память и блокировка берётся при commit.
+    """
+
+    @wraps(func)
+    def wrapper(table_name: str, *args: Any, **kwargs: Any) -> Any:
+        if _TRANSACTION.get() is not None:
+            return func(table_name, *args, **kwargs)
+        with write_lock(table_name):
+            return func(table_name, *args, **kwargs)
+
+    return wrapper
+
+
+def _reject_in_transaction(action: str) -> None:
+    if _TRANSACTION.get() is not None:
+        raise ValueError(f"{action} нельзя выполнять внутри транзакции")
+
+
+def _transaction_rows(table_name: str) -> list[dict[str, Any]] | None:
+    """Строки таблицы из транзакции, если она в ней менялась."""
+    transaction = _TRANSACTION.get()
+    if transaction is None or table_name not in transaction.tables:
+        return None
+    return list(transaction.tables[table_name].values())
+
+
+def _get_row(table_name: str, row_id: int) -> dict[str, Any] | None:
+    transaction = _TRANSACTION.get()
+    if transaction is not None:
+        row = transaction.rows(table_name).get(row_id)
+        return dict(row) if row is not None else None
+    return get_table_row(table_name, row_id)
+
+
+def _write_row(table_name: str, row: dict[str, Any]) -> None:
+    """Добавляет или заменяет строку (в транзакции — только в памяти)."""
+    transaction = _TRANSACTION.get()
+    if transaction is not None:
+        transaction.rows(table_name)[row[ID_COLUMN_NAME]] = row
+        transaction.dirty.add(table_name)
+    else:
+        replace_table_row(table_name, row)
+
+
+def _after_write(table_name: str, schema: dict[str, Any],
+                 changed: dict[int, dict[str, Any] | None] | None = None,
+                 ) -> None:
+    """Обновляет индексы и кэш после записи вне транзакции.
+
+    changed — записанные строки (None — удалённая строка): по ним индексы
+    правятся точечно. Без changed индексы догоняют таблицу целиком.
+    """
+    if _TRANSACTION.get() is not None:
+        return
+    columns = schema.get("indexes", [])
+    if changed is None:
+        refresh_column_indexes(table_name, columns)
+    else:
+        update_column_indexes(table_name, columns, changed)
+    _invalidate_cache(table_name)
+
+
+def _check_storage(storage: str, compression: str | None) -> None:
+    compressions = get_storage_engine(storage).compressions
+    if compression is None:
+        return
+    if not compressions:
+        raise ValueError(f"Формат хранения {storage!r} не поддерживает сжатие")
+    if compression not in compressions:
+        raise ValueError(f"Способ сжатия {compression!r} не поддерживается")
 
-_SELECT_CACHE: dict[str, list[dict[str, object]]] = {}
 
+@_write_operation
+def create_table(table_name: str, columns: dict[str, str],
+                 storage: str = DEFAULT_STORAGE,
+                 compression: str | None = None) -> None:
+    """Создаёт таблицу с указанными колонками и форматом хранения.
 
-def create_table(table_name: str, columns: dict[str, str]) -> None:
-    """Создаёт таблицу с указанными колонками."""
+    compression (zlib, lzma) — сжатие сегментов сегментированной таблицы.
+    """
+    _reject_in_transaction("create")
     meta = load_db_meta()
     if table_name in meta:
         raise ValueError(f"Таблица {table_name!r} уже существует")
 
+    _check_storage(storage, compression)
+
     for column_name, column_type in columns.items():
         if column_type not in SUPPORTED_COLUMN_TYPES:
             raise ValueError(
@@ -30,66 +372,707 @@ def create_table(table_name: str, columns: dict[str, str]) -> None:
     schema: dict[str, Any] = {
         "columns": {ID_COLUMN_NAME: "int", **columns},
         "next_id": 1,
+        "uid": new_table_uid(),
+        "storage": storage,
     }
+    if compression is not None and compression != NO_COMPRESSION:
+        schema["compression"] = compression
     meta[table_name] = schema
-    save_db_meta(meta)
+    with _logged(create_record(table_name, schema)):
+        save_db_meta(meta)
+
+        # Убираем файлы, оставшиеся от таблицы с тем же именем
+        delete_table_data(table_name)
+        save_table_data(table_name, [], storage=storage,
+                        columns=schema["columns"], compression=compression)
+    _invalidate_cache(table_name)
+
+
+@_write_operation
+def convert_table(table_name: str, storage: str,
+                  compression: str | None = None) -> int:
+    """Переводит таблицу в другой формат хранения и возвращает число строк.
+
+    Так же меняется сжатие сегментированной таблицы. Строки переписываются
+    в новом формате, затем файлы старого удаляются; изменение схемы идёт
+    через WAL, поэтому после сбоя восстановление допишет конвертацию.
+    """
+    _reject_in_transaction("convert")
+    meta = load_db_meta()
+    if table_name not in meta:
+        raise ValueError(f"Таблица {table_name!r} не существует")
+    _check_storage(storage, compression)
+    if compression is None and get_storage_engine(storage).compressions:
+        # Без compression= таблица конвертируется без сжатия
+        compression = NO_COMPRESSION
 
-    save_table_data(table_name, [])
+    schema = meta[table_name]
+    schema["storage"] = storage
+    schema.pop("compression", None)
+    if compression is not None and compression != NO_COMPRESSION:
+        schema["compression"] = compression
+    rows = load_table_data(table_name)
+    with _logged(meta_record(table_name, schema)):
+        save_table_data(table_name, rows, storage=storage,
+                        columns=schema["columns"], compression=compression)
+        save_db_meta(meta)
+    _after_write(table_name, schema)
+    return len(rows)
 
 
 def list_tables() -> dict[str, dict[str, Any]]:
     """Возвращает словарь с описанием всех таблиц."""
-    return load_db_meta()
+    return _load_meta()
+
+
+@_write_operation
+def create_index(table_name: str, column: str) -> None:
+    """Создаёт хэш-индекс по колонке таблицы."""
+    _reject_in_transaction("create index")
+    meta = load_db_meta()
+    if table_name not in meta:
+        raise ValueError(f"Таблица {table_name!r} не существует")
+
+    schema = meta[table_name]
+    if column not in schema["columns"]:
+        raise ValueError(f"Колонки {column!r} нет в таблице {table_name!r}")
+    if column == ID_COLUMN_NAME:
+        raise ValueError(f"Колонка {ID_COLUMN_NAME!r} уже индексирована "
+                         "первичным индексом")
+
+    indexes: list[str] = schema.setdefault("indexes", [])
+    if column in indexes:
+        raise ValueError(f"Индекс по колонке {column!r} уже существует")
+
+    indexes.append(column)
+    with _logged(meta_record(table_name, schema)):
+        build_column_index(table_name, column)
+        save_db_meta(meta)
+
+
+@_write_operation
+def analyze_table(table_name: str) -> dict[str, Any]:
+    """Собирает статистику таблицы для планировщика и сохраняет её.
+
+    В схеме таблицы появляется раздел stats: число строк,
+    next_id на момент сбора и по каждой колонке число различных значений
+    (для int-колонок ещё min и max).
+    """
+    _reject_in_transaction("analyze")
+    meta = load_db_meta()
+    if table_name not in meta:
+        raise ValueError(f"Таблица {table_name!r} не существует")
+    schema = meta[table_name]
+    columns: dict[str, str] = schema["columns"]
+
+    row_count = 0
+    distinct: dict[str, set[object]] = {name: set() for name in columns}
+    for row in iter_table_rows(table_name):
+        row_count += 1
+        for name, values in distinct.items():
+            value = row.get(name)
+            if value is not None:
+                values.add(value)
+
+    column_stats: dict[str, dict[str, Any]] = {}
+    for name, values in distinct.items():
+        column_stats[name] = {"distinct": len(values)}
+        if columns[name] == "int" and values:
+            int_values = [value for value in values if isinstance(value, int)]
+            if int_values:
+                column_stats[name]["min"] = min(int_values)
+                column_stats[name]["max"] = max(int_values)
+
+    schema["stats"] = {"rows": row_count, "next_id": schema["next_id"],
+                       "columns": column_stats}
+    with _logged(meta_record(table_name, schema)):
+        save_db_meta(meta)
+    return schema["stats"]
 
 
 def make_select_with_cache(
-    select_func: Callable[[str], list[dict[str, object]]],
-) -> Callable[[str], tuple[list[dict[str, object]], bool]]:
+    select_func: Callable[[str], ColumnarTable],
+) -> Callable[[str], tuple[ColumnarTable, bool]]:
     """Создаёт функцию select с кэшем (возвращает данные и флаг из кэша)."""
 
-    def wrapped(table_name: str) -> tuple[list[dict[str, object]], bool]:
-        if table_name in _SELECT_CACHE:
-            return _SELECT_CACHE[table_name], True
+    def wrapped(table_name: str) -> tuple[ColumnarTable, bool]:
+        if _transaction_rows(table_name) is not None:
+            # Незафиксированные изменения в общий кэш не попадают
+            return select_func(table_name), False
+        _QUERY_CACHE.sync_generation(table_name, read_table_generation(table_name))
+        cached_rows = _QUERY_CACHE.get(table_name, None)
+        if isinstance(cached_rows, ColumnarTable):
+            return cached_rows, True
 
+        generation = _QUERY_CACHE.generation(table_name)
         rows = select_func(table_name)
-        _SELECT_CACHE[table_name] = rows
+        _QUERY_CACHE.put(table_name, None, rows, generation)
         return rows, False
 
     return wrapped
 
 
-def select_rows(table_name: str) -> list[dict[str, object]]:
-    """Возвращает все строки таблицы без фильтрации."""
-    meta = load_db_meta()
+def select_rows(table_name: str) -> ColumnarTable:
+    """Возвращает все строки таблицы без фильтрации (в колоночном виде)."""
+    meta = _load_meta()
     if table_name not in meta:
         raise ValueError(f"Таблица {table_name!r} не существует")
 
-    return load_table_data(table_name)
+    rows = _transaction_rows(table_name)
+    if rows is None:
+        rows = load_table_data(table_name)
+    return ColumnarTable.from_rows(meta[table_name]["columns"], rows)
 
 # Создаём версию select с кэшем
 select_rows_cached = make_select_with_cache(select_rows)
 
 
-def update_row_by_id(table_name: str, row_id: int, 
-                     new_values: dict[str, object]) -> None:
-    """Обновляет одну строку таблицы по ID."""
-    meta = load_db_meta()
+def select_rows_where(table_name: str, field_name: str,
+                      expected_value: object) -> tuple[ColumnarTable, str]:
+    """Возвращает строки, у которых поле равно значению.
+
+    Значение приводится к типу колонки так же, как в where-выражениях
+    (age=030 ищет 30). Результат кэшируется по ключу (таблица, условие).
+    При промахе по id строка ищется через первичный индекс, по колонке с
+    индексом — через хэш-индекс; иначе фильтруется полная (кэшированная)
+    выборка. Вторым элементом возвращается источник: "index", "cache",
+    "disk" или "transaction" (таблица менялась в открытой транзакции).
+    """
+    meta = _load_meta()
     if table_name not in meta:
         raise ValueError(f"Таблица {table_name!r} не существует")
+    schema = meta[table_name]
+    literal = _equality_literal(schema, table_name, field_name, expected_value)
+
+    if _transaction_rows(table_name) is not None:
+        all_rows = select_rows(table_name)
+        with measure("filter"):
+            positions = all_rows.find_equal(field_name, literal)
+        return all_rows.take(positions), "transaction"
+    if literal is None:
+        return ColumnarTable(schema["columns"]), "index"
+
+    predicate = (field_name, literal)
+    _QUERY_CACHE.sync_generation(table_name, read_table_generation(table_name))
+    cached_rows = _QUERY_CACHE.get(table_name, predicate)
+    if isinstance(cached_rows, ColumnarTable):
+        return cached_rows, "cache"
+
+    generation = _QUERY_CACHE.generation(table_name)
+    rows, source = _find_rows_where(schema, table_name, field_name, literal)
+    _QUERY_CACHE.put(table_name, predicate, rows, generation)
+    return rows, source
+
+
+def _equality_literal(schema: dict[str, Any], table_name: str,
+                      field_name: str, value: object) -> object | None:
+    """Значение поле=значение, приведённое к типу колонки (см. equality_literal)."""
+    try:
+        return equality_literal(field_name, str(value), schema["columns"])
+    except ValueError as exc:
+        raise ValueError(f"Таблица {table_name!r}: {exc}") from exc
+
+
+def _find_rows_where(schema: dict[str, Any], table_name: str, field_name: str,
+                     literal: object) -> tuple[ColumnarTable, str]:
+    """Ищет строки по равенству поля без участия кэша select.
+
+    literal уже приведён к типу колонки. Читать ли строки по id, через
+    индекс или просмотром, решает планировщик.
+    """
+    found = _indexed_rows_where(schema, table_name, field_name, literal)
+    if found is not None:
+        return ColumnarTable.from_rows(schema["columns"], found), "index"
+
+    # Условие проверяется по одной колонке, строки собираются только совпавшие
+    all_rows, from_cache = select_rows_cached(table_name)
+    with measure("filter"):
+        positions = all_rows.find_equal(field_name, literal)
+    return all_rows.take(positions), "cache" if from_cache else "disk"
 
+
+def _plan(table_name: str, schema: dict[str, Any],
+          condition: Expression | None) -> QueryPlan:
+    storage = schema.get("storage") or get_table_storage(table_name)
+    # Оценки идут от next_id, а он опережает последний выданный id на
+    # остаток блока id процесса
+    schema = {**schema,
+              "next_id": schema["next_id"] - unused_ids(table_name, schema)}
+    if storage != SEGMENTED_STORAGE or condition is None:
+        return plan_query(table_name, schema, storage, condition)
+    read, total = count_scanned_segments(table_name, schema["columns"],
+                                         condition)
+    plan = plan_query(table_name, schema, storage, condition,
+                      scan_fraction=read / total if total else 1.0)
+    plan.segments = (read, total)
+    return plan
+
+
+def plan_select(table_name: str,
+                condition: Expression | None = None) -> QueryPlan:
+    """План выполнения select с условием (для explain)."""
+    meta = _load_meta()
+    if table_name not in meta:
+        raise ValueError(f"Таблица {table_name!r} не существует")
     schema = meta[table_name]
+    if condition is not None:
+        # Ошибки в условии (нет колонки, не тот тип) — сразу, как при select
+        _compile_condition(schema, table_name, condition)
+    return _plan(table_name, schema, condition)
+
+
+def _plan_rows(table_name: str, schema: dict[str, Any],
+               plan: QueryPlan) -> Iterator[dict[str, Any]]:
+    """Строки-кандидаты по плану (условие по ним ещё нужно проверить)."""
+    if plan.access == ACCESS_FULL_SCAN:
+        yield from iter_table_rows(table_name)
+        return
+
+    if plan.access == ACCESS_RANGE_SCAN:
+        assert plan.low is not None and plan.high is not None
+        row_ids: Iterable[int] = range(plan.low, plan.high + 1)
+    elif plan.access == ACCESS_PK_LOOKUP:
+        row_ids = sorted({int(key) for key in plan.keys if _is_int(key)})
+    else:
+        assert plan.column is not None
+        index = get_column_index(table_name, plan.column)
+        converter = _COLUMN_CONVERTERS[schema["columns"][plan.column]]
+        found: set[int] = set()
+        for key in plan.keys:
+            try:
+                found |= index.lookup(converter(key))
+            except ValueError:
+                continue
+        row_ids = sorted(found)
+
+    yield from get_table_rows(table_name, row_ids)
+
+
+def _is_segmented(table_name: str) -> bool:
+    return get_table_storage(table_name) == SEGMENTED_STORAGE
+
+
+def _is_int(text: str) -> bool:
+    try:
+        int(text)
+    except ValueError:
+        return False
+    return True
+
+
+def _compile_condition(schema: dict[str, Any], table_name: str,
+                       condition: Expression) -> Predicate:
+    """Компилирует условие в предикат под схему таблицы."""
     columns: dict[str, str] = schema["columns"]
+    try:
+        return compile_predicate(condition, columns)
+    except ValueError as exc:
+        raise ValueError(f"Таблица {table_name!r}: {exc}") from exc
 
-    rows = load_table_data(table_name)
-    if not rows:
-        raise ValueError(f"В таблице {table_name!r} нет строк")
 
-    target_row: dict[str, object] | None = None
+def select_rows_matching(table_name: str,
+                         condition: Expression) -> tuple[ColumnarTable, str]:
+    """Возвращает строки, удовлетворяющие where-выражению.
+
+    Одно равенство поле=значение выполняется через select_rows_where (с
+    индексами). Остальные выражения проверяются по колонкам колоночной
+    (кэшированной) выборки (ColumnarTable.find_where), а результат
+    кэшируется с самим выражением в качестве ключа. Сегментированная
+    таблица вместо этого просматривается параллельно по сегментам.
+    """
+    simple = as_simple_equality(condition)
+    if simple is not None:
+        return select_rows_where(table_name, *simple)
+
+    meta = _load_meta()
+    if table_name not in meta:
+        raise ValueError(f"Таблица {table_name!r} не существует")
+    predicate = _compile_condition(meta[table_name], table_name, condition)
+
+    if _transaction_rows(table_name) is not None:
+        all_rows = select_rows(table_name)
+        with measure("filter"):
+            positions = all_rows.find_where(condition)
+        return all_rows.take(positions), "transaction"
+
+    _QUERY_CACHE.sync_generation(table_name, read_table_generation(table_name))
+    cached_rows = _QUERY_CACHE.get(table_name, condition)
+    if isinstance(cached_rows, ColumnarTable):
+        return cached_rows, "cache"
+
+    generation = _QUERY_CACHE.generation(table_name)
+    plan = _plan(table_name, meta[table_name], condition)
+    if plan.access == ACCESS_FULL_SCAN and _is_segmented(table_name):
+        # Сегменты читаются и фильтруются вместе, в процессах пула
+        with measure("filter"):
+            rows = ColumnarTable.from_rows(
+                meta[table_name]["columns"],
+                scan_table_rows(table_name, meta[table_name]["columns"],
+                                condition))
+        source = "parallel"
+    elif plan.access == ACCESS_FULL_SCAN:
+        all_rows, from_cache = select_rows_cached(table_name)
+        with measure("filter"):
+            positions = all_rows.find_where(condition)
+        rows = all_rows.take(positions)
+        source = "cache" if from_cache else "disk"
+    else:
+        with measure("filter"):
+            rows = ColumnarTable.from_rows(
+                meta[table_name]["columns"],
+                filter(predicate,
+                       _plan_rows(table_name, meta[table_name], plan)))
+        source = "index"
+    _QUERY_CACHE.put(table_name, condition, rows, generation)
+    return rows, source
+
+
+def iter_select_rows(
+    table_name: str,
+    where: dict[str, Any] | None = None,
+    limit: int | None = None,
+    offset: int = 0,
+    condition: Expression | None = None,
+) -> tuple[list[str], Iterator[dict[str, object]], str]:
+    """Возвращает имена колонок и ленивый итератор строк выборки.
+
+    Условие задаётся словарём where (одно равенство) или выражением
+    condition. Если результат уже есть в кэше select, строки берутся
+    оттуда. Иначе таблица читается потоком и чтение останавливается, как
+    только набрано offset + limit строк. Третьим элементом возвращается
+    источник: "cache", "index", "stream" или "transaction".
+    """
+    meta = _load_meta()
+    if table_name not in meta:
+        raise ValueError(f"Таблица {table_name!r} не существует")
+    schema = meta[table_name]
+
+    if not where and condition is not None:
+        simple = as_simple_equality(condition)
+        if simple is not None:
+            where = dict([simple])
+        else:
+            return _iter_rows_matching(schema, table_name, condition,
+                                       limit, offset)
+
+    predicate = None
+    if where:
+        field_name, expected_value = next(iter(where.items()))
+        literal = _equality_literal(schema, table_name, field_name,
+                                    expected_value)
+        predicate = (field_name, literal)
+
+    transaction_rows = _transaction_rows(table_name)
+    _QUERY_CACHE.sync_generation(table_name, read_table_generation(table_name))
+    cached_rows = (None if transaction_rows is not None
+                   else _QUERY_CACHE.get(table_name, predicate))
+    rows: Iterator[dict[str, object]]
+    if transaction_rows is not None:
+        rows, source = iter(transaction_rows), "transaction"
+        if predicate is not None:
+            field_name, literal = predicate
+            rows = (row for row in rows if _row_equals(row, field_name, literal))
+    elif isinstance(cached_rows, ColumnarTable):
+        rows, source = cached_rows.iter_rows(), "cache"
+    elif predicate is None:
+        rows, source = iter_table_rows(table_name), "stream"
+    else:
+        field_name, literal = predicate
+        found = _indexed_rows_where(schema, table_name, field_name, literal)
+        if found is not None:
+            rows, source = found, "index"
+        else:
+            rows = (row for row in iter_table_rows(table_name)
+                    if _row_equals(row, field_name, literal))
+            source = "stream"
+
+    stop = None if limit is None else offset + limit
+    return list(schema["columns"]), islice(rows, offset, stop), source
+
+
+def _row_equals(row: dict[str, Any], field_name: str, literal: object) -> bool:
+    """Равно ли поле строки значению (пустое значение не равно ничему)."""
+    value = row.get(field_name)
+    return value is not None and value == literal
+
+
+def _indexed_rows_where(schema: dict[str, Any], table_name: str,
+                        field_name: str, literal: object,
+                        ) -> Iterator[dict[str, Any]] | None:
+    """Строки с поле=значение через первичный или хэш-индекс.
+
+    literal уже приведён к типу колонки. None — планировщик выбрал
+    полный просмотр, его вызывающий делает сам.
+    """
+    if literal is None:
+        return iter(())
+    plan = _plan(table_name, schema,
+                 Comparison(field_name, "=", str(literal)))
+    if plan.access == ACCESS_PK_LOOKUP:
+        row_ids: list[int] = [literal] if isinstance(literal, int) else []
+    elif plan.access == ACCESS_INDEX_LOOKUP:
+        row_ids = sorted(
+            get_column_index(table_name, field_name).lookup(literal))
+    else:
+        return None
+    # Пустое значение и строка "None" в хэш-индексе дают один ключ
+    return (row for row in get_table_rows(table_name, row_ids)
+            if _row_equals(row, field_name, literal))
+
+
+def _iter_rows_matching(
+    schema: dict[str, Any],
+    table_name: str,
+    condition: Expression,
+    limit: int | None,
+    offset: int,
+) -> tuple[list[str], Iterator[dict[str, object]], str]:
+    """Потоковая выборка по where-выражению (см. iter_select_rows)."""
+    predicate = _compile_condition(schema, table_name, condition)
+    transaction_rows = _transaction_rows(table_name)
+    _QUERY_CACHE.sync_generation(table_name, read_table_generation(table_name))
+    cached_rows = (None if transaction_rows is not None
+                   else _QUERY_CACHE.get(table_name, condition))
+    rows: Iterator[dict[str, object]]
+    if transaction_rows is not None:
+        rows = filter(predicate, transaction_rows)
+        source = "transaction"
+    elif isinstance(cached_rows, ColumnarTable):
+        rows, source = cached_rows.iter_rows(), "cache"
+    else:
+        plan = _plan(table_name, schema, condition)
+        if plan.access == ACCESS_FULL_SCAN:
+            # С limit сегменты читаются по очереди, чтобы остановиться раньше
+            parallel = limit is None and _is_segmented(table_name)
+            rows = scan_table_rows(table_name, schema["columns"], condition,
+                                   parallel=parallel)
+            source = "parallel" if parallel else "stream"
+        else:
+            rows = filter(predicate, _plan_rows(table_name, schema, plan))
+            source = "index"
+
+    stop = None if limit is None else offset + limit
+    return list(schema["columns"]), islice(rows, offset, stop), source
+
+
+def aggregate_rows(
+    table_name: str,
+    aggregates: list[tuple[str, str]],
+    condition: Expression | None = None,
+    group_by: str | None = None,
+) -> tuple[list[str], list[tuple[object, ...]], str]:
+    """Считает count/sum/min/max/avg (с group by) за один проход.
+
+    Строки читаются потоком и сразу попадают в хэш-агрегацию, список
+    строк не собирается. count(*) без условия берётся у формата хранения
+    (первичный индекс jsonl, зоны сегментов), а count(*) по равенству или
+    группировке по индексированной колонке — из хэш-индекса, без чтения
+    строк. Сегментированная таблица при полном просмотре агрегируется
+    параллельно: процессы считают частичные агрегаты своих сегментов.
+    Возвращает имена колонок, строки результата и источник: "storage",
+    "index", "cache", "parallel", "stream" или "transaction".
+    """
+    meta = _load_meta()
+    if table_name not in meta:
+        raise ValueError(f"Таблица {table_name!r} не существует")
+    schema = meta[table_name]
+    try:
+        check_aggregates(aggregates, schema["columns"], group_by)
+    except ValueError as exc:
+        raise ValueError(f"Таблица {table_name!r}: {exc}") from exc
+
+    aggregator = HashAggregator(aggregates, group_by)
+    transaction_rows = _transaction_rows(table_name)
+    if transaction_rows is None and all(
+        aggregate == ("count", "*") for aggregate in aggregates
+    ):
+        counted = _count_without_rows(table_name, schema, condition, group_by)
+        if counted is not None:
+            source, results = counted
+            return aggregator.column_names, [
+                (*key, *[count] * len(aggregates)) for key, count in results
+            ], source
+
+    if transaction_rows is None and _is_segmented(table_name) and (
+        condition is None
+        or _plan(table_name, schema, condition).access == ACCESS_FULL_SCAN
+    ):
+        if condition is not None:
+            _compile_condition(schema, table_name, condition)  # проверка схемы
+        with measure("aggregate"):
+            aggregator = aggregate_table_rows(table_name, schema["columns"],
+                                              condition, aggregates, group_by)
+        return aggregator.column_names, aggregator.results(), "parallel"
+
+    rows: Iterator[dict[str, object]]
+    if condition is not None:
+        _, rows, source = _iter_rows_matching(schema, table_name, condition,
+                                              None, 0)
+    elif transaction_rows is not None:
+        rows, source = iter(transaction_rows), "transaction"
+    else:
+        rows, source = iter_table_rows(table_name), "stream"
+    with measure("aggregate"):
+        aggregator.add_rows(rows)
+    return aggregator.column_names, aggregator.results(), source
+
+
+def _count_without_rows(
+    table_name: str,
+    schema: dict[str, Any],
+    condition: Expression | None,
+    group_by: str | None,
+) -> tuple[str, list[tuple[tuple[object, ...], int]]] | None:
+    """count(*) по формату хранения или индексу; None — нужно читать строки.
+
+    Возвращает источник и пары (значение группы или (), число строк).
+    """
+    indexes = schema.get("indexes", [])
+    if condition is None and group_by is None:
+        row_count = count_table_rows(table_name)
+        if row_count is None:
+            return None
+        return "storage", [((), row_count)]
+
+    if condition is None and group_by is not None and group_by in indexes:
+        column_type = schema["columns"][group_by]
+        groups = get_column_index(table_name, group_by).ids_by_key
+        if "None" in groups and column_type == "str":
+            return None  # пустое значение и строка "None" в индексе не различимы
+        counts: list[tuple[tuple[object, ...], int]] = []
+        for key, ids in groups.items():
+            value = None if key == "None" else _COLUMN_CONVERTERS[column_type](key)
+            counts.append(((value,), len(ids)))
+        counts.sort(key=lambda item: (item[0][0] is not None, item[0][0]))
+        return "index", counts
+
+    simple = None if condition is None else as_simple_equality(condition)
+    if group_by is None and simple is not None and simple[0] in indexes:
+        column, value = simple
+        literal = _equality_literal(schema, table_name, column, value)
+        if literal is None:
+            return "index", [((), 0)]
+        if literal == "None":
+            return None  # пустое значение и строка "None" в индексе не различимы
+        return "index", [((), len(get_column_index(table_name,
+                                                   column).lookup(literal)))]
+    return None
+
+
+def _convert_values(table_name: str, columns: dict[str, str],
+                    new_values: dict[str, object]) -> dict[str, object]:
+    """Приводит значения из set к типам колонок."""
+    converted: dict[str, object] = {}
+    for field_name, field_value in new_values.items():
+        if field_name not in columns or field_name == ID_COLUMN_NAME:
+            raise ValueError(f"Поле {field_name!r} "
+                             f"не существует в таблице {table_name!r}")
+        column_type = columns[field_name]
+        if column_type not in _COLUMN_CONVERTERS:
+            raise ValueError(f"Неподдерживаемый тип колонки {column_type!r}")
+        converted[field_name] = _COLUMN_CONVERTERS[column_type](field_value)
+    return converted
+
+
+def _matching_rows(table_name: str, schema: dict[str, Any],
+                   condition: Expression) -> list[dict[str, Any]]:
+    """Строки таблицы (с учётом транзакции), подходящие под условие."""
+    predicate = _compile_condition(schema, table_name, condition)
+    transaction = _TRANSACTION.get()
+    if transaction is not None:
+        rows: Iterable[dict[str, Any]] = transaction.rows(table_name).values()
+    else:
+        plan = _plan(table_name, schema, condition)
+        if plan.access == ACCESS_FULL_SCAN:
+            # Условие проверяется при просмотре (для сегментов — в процессах)
+            with measure("filter"):
+                return [dict(row) for row in scan_table_rows(
+                    table_name, schema["columns"], condition)]
+        rows = _plan_rows(table_name, schema, plan)
+    with measure("filter"):
+        return [dict(row) for row in rows if predicate(row)]
+
+
+def _rewrite_rows(table_name: str, changed: dict[int, dict[str, Any] | None],
+                  ) -> None:
+    """Применяет изменения строк вне транзакции (None — удаление).
+
+    Формат хранения сам решает, как записать изменения: json-таблица
+    переписывается один раз на всю команду, а не на каждую строку.
+    """
+    change_table_rows(table_name, changed)
+
+
+@_write_operation
+def update_rows_where(table_name: str, condition: Expression,
+                      new_values: dict[str, object]) -> int:
+    """Обновляет все строки, удовлетворяющие условию; возвращает их число.
+
+    Все изменения пишутся в WAL одной группой.
+    """
+    meta = _load_meta()
+    if table_name not in meta:
+        raise ValueError(f"Таблица {table_name!r} не существует")
+    schema = meta[table_name]
+
+    values = _convert_values(table_name, schema["columns"], new_values)
+    rows = _matching_rows(table_name, schema, condition)
     for row in rows:
-        if row.get(ID_COLUMN_NAME) == row_id:
-            target_row = row
-            break
+        row.update(values)
+    if not rows:
+        return 0
+
+    changed: dict[int, dict[str, Any] | None] = {
+        row[ID_COLUMN_NAME]: row for row in rows}
+    with _logged(*(put_record(table_name, row) for row in rows)):
+        transaction = _TRANSACTION.get()
+        if transaction is not None:
+            for row in rows:
+                _write_row(table_name, row)
+        else:
+            _rewrite_rows(table_name, changed)
+    _after_write(table_name, schema, changed)
+    return len(rows)
+
+
+@_write_operation
+def delete_rows_where(table_name: str, condition: Expression) -> int:
+    """Удаляет все строки, удовлетворяющие условию; возвращает их число."""
+    meta = _load_meta()
+    if table_name not in meta:
+        raise ValueError(f"Таблица {table_name!r} не существует")
+    schema = meta[table_name]
+
+    row_ids = [row[ID_COLUMN_NAME]
+               for row in _matching_rows(table_name, schema, condition)]
+    if not row_ids:
+        return 0
+
+    with _logged(*(delete_record(table_name, row_id) for row_id in row_ids)):
+        transaction = _TRANSACTION.get()
+        if transaction is not None:
+            table_rows = transaction.rows(table_name)
+            for row_id in row_ids:
+                del table_rows[row_id]
+            transaction.dirty.add(table_name)
+        else:
+            _rewrite_rows(table_name, dict.fromkeys(row_ids))
+    _after_write(table_name, schema, dict.fromkeys(row_ids))
+    return len(row_ids)
 
+
+@_write_operation
+def update_row_by_id(table_name: str, row_id: int, 
+                     new_values: dict[str, object]) -> None:
+    """Обновляет одну строку таблицы по ID."""
+    meta = _load_meta()
+    if table_name not in meta:
+        raise ValueError(f"Таблица {table_name!r} не существует")
+
+    schema = meta[table_name]
+    columns: dict[str, str] = schema["columns"]
+
+    target_row = _get_row(table_name, row_id)
     if target_row is None:
         raise ValueError(f"Строка с id={row_id} в таблице "
                          "{table_name!r} не найдена")
@@ -101,50 +1084,65 @@ def update_row_by_id(table_name: str, row_id: int,
 
         column_type = columns[field_name]
         if column_type == "int":
-            raw_value: Any = field_value
-            target_row[field_name] = int(raw_value)
+            target_row[field_name] = _to_int(field_value)
         elif column_type == "str":
             target_row[field_name] = str(field_value)
         else:
             raise ValueError(f"Неподдерживаемый тип колонки {column_type!r}")
 
-    save_table_data(table_name, rows)
-    _SELECT_CACHE.pop(table_name, None)
+    with _logged(put_record(table_name, target_row)):
+        _write_row(table_name, target_row)
+    _after_write(table_name, schema, {row_id: target_row})
     
 
+@_write_operation
 def delete_row_by_id(table_name: str, row_id: int) -> None:
     """Удаляет одну строку таблицы по ID."""
-    meta = load_db_meta()
+    meta = _load_meta()
     if table_name not in meta:
         raise ValueError(f"Таблица {table_name!r} не существует")
 
-    rows = load_table_data(table_name)
-    new_rows = [row for row in rows if row.get(ID_COLUMN_NAME) != row_id]
-
-    if len(new_rows) == len(rows):
+    if _get_row(table_name, row_id) is None:
         raise ValueError(f"Строка с id={row_id} "
                          "в таблице {table_name!r} не найдена")
 
-    save_table_data(table_name, new_rows)
-    _SELECT_CACHE.pop(table_name, None)
+    with _logged(delete_record(table_name, row_id)):
+        transaction = _TRANSACTION.get()
+        if transaction is not None:
+            del transaction.rows(table_name)[row_id]
+            transaction.dirty.add(table_name)
+        else:
+            delete_table_row(table_name, row_id)
+    _after_write(table_name, meta[table_name], {row_id: None})
 
 
+@_write_operation
 def drop_table(table_name: str) -> None:
     """Удаляет таблицу и её данные."""
+    _reject_in_transaction("drop")
     meta = load_db_meta()
     if table_name not in meta:
         raise ValueError(f"Таблица {table_name!r} не существует")
 
+    indexes = meta[table_name].get("indexes", [])
     del meta[table_name]
-    save_db_meta(meta)
-
-    save_table_data(table_name, [])
-    _SELECT_CACHE.pop(table_name, None)
+    with _logged(drop_record(table_name)):
+        save_db_meta(meta)
+        drop_column_indexes(table_name, indexes)
+        delete_table_data(table_name)
+    _invalidate_cache(table_name)
 
 
+@_write_operation
 def insert_row(table_name: str, values: dict[str, object]) -> None:
-    """Добавляет новую строку в таблицу с авто‑ID."""
-    meta = load_db_meta()
+    """Добавляет новую строку в таблицу с авто‑ID.
+
+    id берётся из блока, зарезервированного процессом (ids.py), поэтому
+    схема таблицы сохраняется только при резервировании нового блока. В
+    транзакции, когда блок кончился, id выдаются по next_id её копии
+    метаданных.
+    """
+    meta = _load_meta()
     if table_name not in meta:
         raise ValueError(f"Таблица {table_name!r} не существует")
 
@@ -152,14 +1150,13 @@ def insert_row(table_name: str, values: dict[str, object]) -> None:
     columns: dict[str, str] = schema["columns"]
 
     # Проверяем, что все переданные поля есть в схеме (кроме id)
-    for field in values:
-        if field not in columns or field == ID_COLUMN_NAME:
-            raise ValueError(f"Поле {field!r} "
+    for field_name in values:
+        if field_name not in columns or field_name == ID_COLUMN_NAME:
+            raise ValueError(f"Поле {field_name!r} "
                              "не существует в таблице {table_name!r}")
 
     # Готовим новую строку
     row: dict[str, object] = {}
-    row[ID_COLUMN_NAME] = schema["next_id"]
 
     for column_name, column_type in columns.items():
         if column_name == ID_COLUMN_NAME:
@@ -171,8 +1168,7 @@ def insert_row(table_name: str, values: dict[str, object]) -> None:
             continue
 
         if column_type == "int":
-            raw_value: Any = value
-            row[column_name] = int(raw_value)
+            row[column_name] = _to_int(value)
         elif column_type == "str":
             row[column_name] = str(value)
         else:
@@ -180,13 +1176,177 @@ def insert_row(table_name: str, values: dict[str, object]) -> None:
                              колонки {column_type!r}")
 
 
-    # Загружаем текущие строки, добавляем новую и сохраняем
-    rows = load_table_data(table_name)
-    rows.append(row)
-    save_table_data(table_name, rows)
-    _SELECT_CACHE.pop(table_name, None)
+    if _TRANSACTION.get() is not None:
+        # Новый блок в транзакции не резервируется: её копия метаданных
+        # сохранится только при commit
+        block_id = take_id(table_name, schema)
+        if block_id is not None:
+            row_id, reserved = block_id, False
+        else:
+            row_id, reserved = schema["next_id"], True
+            schema["next_id"] += 1
+    else:
+        row_id, reserved = allocate_id(table_name, schema)
+    row = {ID_COLUMN_NAME: row_id, **row}
 
-    # Увеличиваем next_id
-    schema["next_id"] += 1
-    meta[table_name] = schema
-    save_db_meta(meta)
+    # Новый блок id попадает в WAL той же группой, что и строка
+    records = (meta_record(table_name, schema),) if reserved else ()
+    with _logged(put_record(table_name, row), *records):
+        # Для jsonl-таблиц дописывается одна строка журнала
+        if _TRANSACTION.get() is not None:
+            _write_row(table_name, row)
+        else:
+            append_table_row(table_name, row)
+        if reserved:
+            _save_meta(meta)
+    _after_write(table_name, schema, {row_id: row})
+
+
+def release_id_blocks() -> None:
+    """Возвращает таблицам неиспользованные остатки блоков id процесса.
+
+    Вызывается при выходе: иначе каждый запуск оставлял бы в нумерации
+    пропуск до конца своего блока.
+    """
+    for table_name in tables_with_id_blocks():
+        with write_lock(table_name):
+            meta = load_db_meta()
+            schema = meta.get(table_name)
+            if not release_id_block(table_name, schema):
+                continue
+            assert schema is not None
+            with _logged(meta_record(table_name, schema)):
+                save_db_meta(meta)
+
+
+def get_cache_stats() -> dict[str, float]:
+    """Возвращает статистику кэша select и кэша метаданных."""
+    stats = _QUERY_CACHE.stats()
+    meta_stats = get_meta_cache_stats()
+    stats["meta_hits"] = meta_stats["hits"]
+    stats["meta_misses"] = meta_stats["misses"]
+    return stats
+
+
+@_write_operation
+def insert_many(table_name: str, rows: Iterable[dict[str, object]]) -> int:
+    """Добавляет много строк за один проход и возвращает их число.
+
+    Типы колонок разбираются один раз на всю вставку, строки пишутся в
+    таблицу потоком, а next_id в метаданных обновляется одной записью
+    в конце. При ошибке в любой строке таблица не меняется.
+    """
+    meta = _load_meta()
+    if table_name not in meta:
+        raise ValueError(f"Таблица {table_name!r} не существует")
+
+    schema = meta[table_name]
+    columns: dict[str, str] = schema["columns"]
+    converters: list[tuple[str, Callable[[Any], object]]] = []
+    for column_name, column_type in columns.items():
+        if column_name == ID_COLUMN_NAME:
+            continue
+        if column_type not in _COLUMN_CONVERTERS:
+            raise ValueError(f"Неподдерживаемый тип колонки {column_type!r}")
+        converters.append((column_name, _COLUMN_CONVERTERS[column_type]))
+    known_fields = {name for name, _ in converters}
+    if _TRANSACTION.get() is None and release_id_block(table_name, schema):
+        # Нумерация продолжается с остатка блока id процесса. next_id
+        # возвращается к нему до загрузки: если она оборвётся, recover()
+        # уберёт её строки по next_id
+        with _logged(meta_record(table_name, schema)):
+            save_db_meta(meta)
+    first_id: int = schema["next_id"]
+
+    def prepared_rows() -> Iterator[dict[str, object]]:
+        row_id = first_id
+        for number, values in enumerate(rows, start=1):
+            unknown = values.keys() - known_fields
+            if unknown:
+                raise ValueError(f"Строка {number}: поле {min(unknown)!r} "
+                                 f"не существует в таблице {table_name!r}")
+            row: dict[str, object] = {ID_COLUMN_NAME: row_id}
+            for column_name, convert in converters:
+                value = values.get(column_name)
+                try:
+                    row[column_name] = None if value is None else convert(value)
+                except ValueError as exc:
+                    raise ValueError(f"Строка {number}, поле "
+                                     f"{column_name!r}: {exc}") from exc
+            yield row
+            row_id += 1
+
+    if _TRANSACTION.get() is not None:
+        # Строки сначала проверяются целиком, чтобы ошибка не оставила
+        # в транзакции половину загрузки
+        new_rows = list(prepared_rows())
+        schema["next_id"] = first_id + len(new_rows)
+        with _logged(*(put_record(table_name, row) for row in new_rows),
+                     meta_record(table_name, schema)):
+            for row in new_rows:
+                _write_row(table_name, row)
+        return len(new_rows)
+
+    # Строки попадают в WAL и в таблицу одним потоком; если процесс
+    # упадёт до commit группы, recover() уберёт строки с id >= next_id
+    with wal_group() as group:
+        def logged_rows() -> Iterator[dict[str, object]]:
+            for row in prepared_rows():
+                group.add(put_record(table_name, row))
+                yield row
+
+        count = append_table_rows(table_name, logged_rows())
+        schema["next_id"] = first_id + count
+        group.add(meta_record(table_name, schema))
+        group.commit()
+        save_db_meta(meta)
+    _after_write(table_name, schema)
+    return count
+
+
+def iter_file_rows(file_path: str | Path) -> Iterator[dict[str, object]]:
+    """Потоково читает строки для загрузки из CSV- или JSONL-файла.
+
+    В CSV первая строка — имена колонок, пустые ячейки считаются
+    отсутствующими значениями. В JSONL каждая строка — JSON-объект.
+    Ошибки формата сообщаются с номером строки файла.
+    """
+    path = Path(file_path)
+    if not path.exists():
+        raise ValueError(f"Файл {str(path)!r} не найден")
+
+    suffix = path.suffix.lower()
+    if suffix == ".csv":
+        with path.open("r", encoding="utf-8", newline="") as csv_file:
+            reader = csv.DictReader(csv_file)
+            for record in reader:
+                if None in record:
+                    raise ValueError(f"Строка {reader.line_num} файла "
+                                     f"{str(path)!r}: полей больше, чем "
+                                     "колонок в заголовке")
+                yield {key: value for key, value in record.items() if value != ""}
+    elif suffix in (".jsonl", ".ndjson"):
+        with path.open("r", encoding="utf-8") as jsonl_file:
+            for line_number, line in enumerate(jsonl_file, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError as exc:
+                    raise ValueError(f"Строка {line_number} файла "
+                                     f"{str(path)!r}: {exc}") from exc
+                if isinstance(record, dict):
+                    yield record
+                    continue
+                # Обработчик команд ждёт ValueError, как и для других
+                # ошибок формата
+                raise ValueError(f"Строка {line_number} файла "
+                                 f"{str(path)!r}: ожидался JSON-объект")
+    else:
+        raise ValueError(f"Неизвестный формат файла {str(path)!r} "
+                         "(ожидался .csv или .jsonl)")
+
+
+def load_table_from_file(table_name: str, file_path: str | Path) -> int:
+    """Загружает строки из CSV/JSONL-файла в таблицу одним проходом."""
+    return insert_many(table_name, iter_file_rows(file_path))
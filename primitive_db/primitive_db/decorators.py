@@ -2,8 +2,39 @@ from collections.abc import Callable
 from functools import wraps
 import time
 
+from .metrics import increment, observe_ns
+
 FunctionType = Callable[..., object]
 
+# Спрашивать ли подтверждение опасных действий (в сетевом режиме
+# спросить некого, поэтому там подтверждения отключены)
+_CONFIRMATIONS_ENABLED = True
+
+
+# Тихий (пакетный) режим: не печатаются время выполнения команд и
+# сообщения об их ходе — в stdout остаются только данные и ошибки, а
+# итоговая статистика выводится один раз в конце
+_QUIET = False
+
+
+def set_confirmations(enabled: bool) -> None:
+    """Включает или отключает вопросы confirm_action."""
+    global _CONFIRMATIONS_ENABLED
+    _CONFIRMATIONS_ENABLED = enabled
+
+
+def set_quiet(quiet: bool) -> None:
+    """Включает или отключает тихий режим (вывод log_time и notify)."""
+    global _QUIET
+    _QUIET = quiet
+
+
+def notify(message: str) -> None:
+    """Печатает сообщение о ходе команды, если режим не тихий."""
+    if not _QUIET:
+        print(message)
+
+
 def handle_db_errors(func: FunctionType) -> FunctionType:
     """Декоратор для перехвата ошибок БД и вывода понятного сообщения."""
 
@@ -12,8 +43,10 @@ def handle_db_errors(func: FunctionType) -> FunctionType:
         try:
             return func(*args, **kwargs)
         except ValueError as exc:
+            increment("errors")
             print(f"Ошибка: {exc}")
         except Exception as exc:  # на всякий случай
+            increment("errors")
             print(f"Неожиданная ошибка: {exc}")
         return None
 
@@ -26,6 +59,8 @@ def confirm_action(message: str = "Вы уверены? (y/n): ") -> Callable[[F
     def decorator(func: FunctionType) -> FunctionType:
         @wraps(func)
         def wrapper(*args, **kwargs):
+            if not _CONFIRMATIONS_ENABLED:
+                return func(*args, **kwargs)
             answer = input(message).strip().lower()
             if answer not in ("y", "yes", "д", "да"):
                 print("Действие отменено.")
@@ -38,14 +73,23 @@ def confirm_action(message: str = "Вы уверены? (y/n): ") -> Callable[[F
 
 
 def log_time(func: FunctionType) -> FunctionType:
-    """Декоратор для логирования времени выполнения функции."""
+    """Декоратор для логирования времени выполнения функции.
+
+    Время всегда попадает в гистограмму handler.<имя функции> (см.
+    metrics.py), а печатается, только если режим не тихий.
+    """
+    metric_name = f"handler.{func.__name__}"
 
     @wraps(func)
     def wrapper(*args, **kwargs):
-        start = time.time()
-        result = func(*args, **kwargs)
-        duration = time.time() - start
-        print(f"{func.__name__} выполнена за {duration:.4f} с")
+        start = time.perf_counter_ns()
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            duration_ns = time.perf_counter_ns() - start
+            observe_ns(metric_name, duration_ns)
+        if not _QUIET:
+            print(f"{func.__name__} выполнена за {duration_ns / 1e9:.4f} с")
         return result
 
     return wrapper  # type: ignore[return-value]
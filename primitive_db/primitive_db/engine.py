@@ -1,10 +1,90 @@
 from __future__ import annotations
 
+import copy
 import json
+import os
+import shutil
+import threading
+from abc import ABC, abstractmethod
+from collections.abc import Callable, Iterable, Iterator
+from dataclasses import dataclass, field
+from functools import wraps
 from pathlib import Path
-from typing import Any
+from typing import Any, ParamSpec, TypeVar
 
-from .constants import DATA_DIR, DB_META_FILE
+from .aggregates import HashAggregator
+from .binary_storage import (
+    append_binary_rows,
+    delete_binary_row,
+    get_binary_row,
+    iter_binary_rows,
+    read_binary_columns,
+    read_binary_garbage,
+    update_binary_row,
+    write_binary_table,
+)
+from .constants import (
+    BINARY_COMPACT_MIN_DEAD_HEAP_BYTES,
+    BINARY_COMPACT_MIN_DEAD_ROWS,
+    BINARY_STORAGE,
+    DATA_DIR,
+    DB_META_FILE,
+    DEFAULT_STORAGE,
+    ID_COLUMN_NAME,
+    JSON_STORAGE,
+    LOG_COMPACT_MIN_DEAD_RECORDS,
+    LOG_STORAGE,
+    PK_INDEX_FLUSH_RECORDS,
+    SEGMENT_COMPRESSIONS,
+    SEGMENTED_STORAGE,
+)
+from .expressions import Expression, compile_predicate
+from .locks import table_lock
+from .metrics import timed
+from .segments import (
+    aggregate_segmented_rows,
+    append_segment_rows,
+    change_segment_rows,
+    count_segmented_rows,
+    delete_segment_row,
+    get_segment_row,
+    iter_matching_segment_rows,
+    iter_segmented_rows,
+    load_segmented_rows,
+    replace_segment_row,
+    scan_segmented_rows,
+    select_segment_paths,
+    write_segmented_table,
+)
+
+_P = ParamSpec("_P")
+_R = TypeVar("_R")
+
+# Типы записей журнала jsonl-таблицы
+LOG_OP_PUT = "put"
+LOG_OP_DELETE = "del"
+
+
+def _reads_table(func: Callable[_P, _R]) -> Callable[_P, _R]:
+    """Выполняет функцию под разделяемой блокировкой таблицы (1-й аргумент)."""
+
+    @wraps(func)
+    def wrapper(*args: _P.args, **kwargs: _P.kwargs) -> _R:
+        with table_lock(str(args[0])).shared():
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+def _writes_table(func: Callable[_P, _R]) -> Callable[_P, _R]:
+    """Выполняет функцию под исключительной блокировкой таблицы."""
+
+    @wraps(func)
+    def wrapper(*args: _P.args, **kwargs: _P.kwargs) -> _R:
+        with table_lock(str(args[0])).exclusive():
+            return func(*args, **kwargs)
+
+    return wrapper
 
 
 def ensure_data_dir_exists() -> None:
@@ -12,20 +92,202 @@ def ensure_data_dir_exists() -> None:
     DATA_DIR.mkdir(exist_ok=True)
 
 
+def sync_path(path: Path) -> None:
+    """Сбрасывает на диск содержимое файла (или каталога), если он есть."""
+    flags = os.O_RDONLY
+    if path.is_dir():
+        flags |= getattr(os, "O_DIRECTORY", 0)
+    try:
+        fd = os.open(path, flags)
+    except (FileNotFoundError, PermissionError):
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        # Некоторые платформы не умеют fsync каталога
+        pass
+    finally:
+        os.close(fd)
+
+
+def _sync_file_object(file: Any) -> None:
+    file.flush()
+    os.fsync(file.fileno())
+
+
+@dataclass
+class _MetaCacheEntry:
+    """Разобранные метаданные и отпечатки файлов, из которых они прочитаны.
+
+    signatures — (mtime_ns, размер) каталога и файлов схем таблиц,
+    inline — таблицы, чья схема ещё записана прямо в каталоге.
+    """
+
+    meta: dict[str, Any]
+    signatures: dict[Path, tuple[int, int] | None]
+    inline: set[str]
+    generation: int
+
+
+_META_CACHE: _MetaCacheEntry | None = None
+# Номер поколения метаданных, увеличивается при каждой записи из процесса
+_META_GENERATION = 0
+_META_CACHE_STATS: dict[str, int] = {"hits": 0, "misses": 0}
+
+
+def get_table_meta_path(table_name: str) -> Path:
+    """Возвращает путь к файлу схемы таблицы."""
+    return DATA_DIR / f"{table_name}.meta.json"
+
+
+def _file_signature(path: Path) -> tuple[int, int] | None:
+    try:
+        file_stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return file_stat.st_mtime_ns, file_stat.st_size
+
+
+def _read_json_file(path: Path) -> Any:
+    with path.open("r", encoding="utf-8") as json_file:
+        return json.load(json_file)
+
+
+def _write_meta_file(path: Path, payload: Any) -> tuple[int, int] | None:
+    """Атомарно записывает файл метаданных и возвращает его отпечаток."""
+    tmp_path = path.with_name(
+        f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with tmp_path.open("w", encoding="utf-8") as meta_file:
+        json.dump(payload, meta_file, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    return _file_signature(path)
+
+
+def _cache_is_fresh(entry: _MetaCacheEntry) -> bool:
+    return entry.generation == _META_GENERATION and all(
+        _file_signature(path) == signature
+        for path, signature in entry.signatures.items()
+    )
+
+
+@timed("meta_load")
 def load_db_meta() -> dict[str, Any]:
-    """Загружает метаданные базы данных из файла JSON."""
-    ensure_data_dir_exists()
+    """Загружает метаданные базы данных: схемы таблиц по именам.
+
+    db_meta.json — каталог таблиц, а схема каждой таблицы (колонки,
+    next_id, индексы, статистика) лежит в своём файле <table>.meta.json.
+    Схема из каталога старого формата читается как есть и переезжает в
+    свой файл при следующем сохранении.
+
+    Разобранные метаданные кэшируются в памяти процесса и переиспользуются,
+    пока не изменились время изменения и размер файлов (например, после
+    записи из другого процесса) или поколение метаданных в этом процессе;
+    при промахе заново читаются только изменившиеся файлы схем.
+    Вызывающий получает копию и может свободно её менять.
+    """
+    return copy.deepcopy(_cached_db_meta())
+
+
+def _cached_db_meta() -> dict[str, Any]:
+    """Метаданные из кэша процесса без копии: только для чтения."""
+    global _META_CACHE
     if not DB_META_FILE.exists():
+        _META_CACHE = None
         return {}
-    with DB_META_FILE.open("r", encoding="utf-8") as meta_file:
-        return json.load(meta_file)
+
+    entry = _META_CACHE
+    if entry is not None and _cache_is_fresh(entry):
+        _META_CACHE_STATS["hits"] += 1
+        return entry.meta
+
+    _META_CACHE_STATS["misses"] += 1
+    if entry is not None and entry.generation != _META_GENERATION:
+        entry = None
+    signatures: dict[Path, tuple[int, int] | None] = {
+        DB_META_FILE: _file_signature(DB_META_FILE)}
+    catalog = _read_json_file(DB_META_FILE)
+    meta: dict[str, Any] = {}
+    inline: set[str] = set()
+    for table_name, catalog_entry in catalog.items():
+        if "columns" in catalog_entry:
+            meta[table_name] = catalog_entry
+            inline.add(table_name)
+            continue
+        schema_path = DATA_DIR / catalog_entry["schema_file"]
+        # Отпечаток снимается до чтения: запись между ними будет замечена
+        signature = _file_signature(schema_path)
+        if signature is None:
+            raise ValueError(f"Нет файла схемы таблицы {table_name!r}: "
+                             f"{schema_path}")
+        signatures[schema_path] = signature
+        if (entry is not None and table_name in entry.meta
+                and table_name not in entry.inline
+                and entry.signatures.get(schema_path) == signature):
+            meta[table_name] = entry.meta[table_name]
+        else:
+            meta[table_name] = _read_json_file(schema_path)
+    _META_CACHE = _MetaCacheEntry(meta, signatures, inline, _META_GENERATION)
+    return meta
 
 
+@timed("meta_save")
 def save_db_meta(meta: dict[str, Any]) -> None:
-    """Сохраняет метаданные базы данных в файл JSON."""
+    """Сохраняет метаданные базы данных и обновляет кэш.
+
+    Переписываются только файлы схем изменившихся таблиц, а каталог —
+    только когда таблицы появились или исчезли. Поэтому запись в одну
+    таблицу не трогает схемы остальных и не теряет их изменения из других
+    процессов. Каждый файл пишется рядом и атомарно подменяет старый, так
+    что прерванная запись не оставляет наполовину записанных метаданных.
+    """
+    global _META_CACHE, _META_GENERATION
     ensure_data_dir_exists()
-    with DB_META_FILE.open("w", encoding="utf-8") as meta_file:
-        json.dump(meta, meta_file, indent=2, ensure_ascii=False)
+    if _META_CACHE is None or _META_CACHE.generation != _META_GENERATION:
+        try:
+            load_db_meta()
+        except ValueError:
+            _META_CACHE = None
+    previous = _META_CACHE
+    old_meta = previous.meta if previous is not None else {}
+    inline = previous.inline if previous is not None else set()
+    _META_GENERATION += 1
+    _META_CACHE = None
+
+    signatures: dict[Path, tuple[int, int] | None] = {}
+    for table_name, schema in meta.items():
+        schema_path = get_table_meta_path(table_name)
+        if (previous is None or table_name in inline
+                or old_meta.get(table_name) != schema):
+            signatures[schema_path] = _write_meta_file(schema_path, schema)
+        else:
+            signatures[schema_path] = previous.signatures.get(schema_path)
+
+    dropped = old_meta.keys() - meta.keys()
+    if previous is None or inline or dropped or meta.keys() - old_meta.keys():
+        try:
+            catalog = _read_json_file(DB_META_FILE)
+        except (FileNotFoundError, ValueError):
+            catalog = {}
+        for table_name in dropped:
+            catalog.pop(table_name, None)
+        for table_name in meta:
+            catalog[table_name] = {
+                "schema_file": get_table_meta_path(table_name).name}
+        signatures[DB_META_FILE] = _write_meta_file(DB_META_FILE, catalog)
+        for table_name in dropped:
+            get_table_meta_path(table_name).unlink(missing_ok=True)
+        if catalog.keys() != meta.keys():
+            return  # в каталоге есть таблицы другого процесса: кэш не полон
+    else:
+        assert previous is not None
+        signatures[DB_META_FILE] = previous.signatures[DB_META_FILE]
+    _META_CACHE = _MetaCacheEntry(copy.deepcopy(meta), signatures, set(),
+                                  _META_GENERATION)
+
+
+def get_meta_cache_stats() -> dict[str, int]:
+    """Возвращает счётчики попаданий и промахов кэша метаданных."""
+    return dict(_META_CACHE_STATS)
 
 
 def get_table_file_path(table_name: str) -> Path:
@@ -34,17 +296,916 @@ def get_table_file_path(table_name: str) -> Path:
     return DATA_DIR / f"{table_name}.json"
 
 
+def get_table_log_path(table_name: str) -> Path:
+    """Возвращает путь к журналу (jsonl) таблицы."""
+    ensure_data_dir_exists()
+    return DATA_DIR / f"{table_name}.jsonl"
+
+
+def get_table_generation_path(table_name: str) -> Path:
+    """Возвращает путь к файлу с номером поколения таблицы."""
+    ensure_data_dir_exists()
+    return DATA_DIR / f"{table_name}.gen"
+
+
+def read_table_generation(table_name: str) -> int:
+    """Возвращает номер поколения таблицы, записанный на диске.
+
+    Номер увеличивается при каждом изменении данных таблицы любым
+    процессом, поэтому по нему можно дёшево проверить, не устарели ли
+    закэшированные результаты.
+    """
+    try:
+        return int(get_table_generation_path(table_name).read_text(encoding="ascii"))
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def _bump_table_generation(table_name: str) -> None:
+    """Увеличивает номер поколения таблицы на диске."""
+    generation_path = get_table_generation_path(table_name)
+    tmp_path = generation_path.with_name(generation_path.name + ".tmp")
+    tmp_path.write_text(str(read_table_generation(table_name) + 1), encoding="ascii")
+    os.replace(tmp_path, generation_path)
+
+
+def get_table_binary_paths(table_name: str) -> tuple[Path, Path]:
+    """Возвращает пути к бинарному файлу таблицы и к её куче строк."""
+    ensure_data_dir_exists()
+    return DATA_DIR / f"{table_name}.bin", DATA_DIR / f"{table_name}.heap"
+
+
+def get_table_segments_dir(table_name: str) -> Path:
+    """Возвращает каталог с сегментами таблицы."""
+    ensure_data_dir_exists()
+    return DATA_DIR / f"{table_name}.segments"
+
+
+@dataclass
+class PrimaryKeyIndex:
+    """Первичный индекс jsonl-таблицы.
+
+    Хранит для каждого id смещение последней версии строки в журнале
+    и «водяную отметку» — сколько байт журнала уже учтено в индексе.
+    """
+
+    positions: dict[int, int] = field(default_factory=dict)
+    log_inode: int = 0
+    log_size: int = 0
+    records: int = 0
+    unflushed: int = 0
+
+
+_PK_INDEXES: dict[str, PrimaryKeyIndex] = {}
+# Читатели в разных потоках могут одновременно догонять один индекс
+_PK_INDEX_MUTEX = threading.RLock()
+
+
+def get_pk_index_path(table_name: str) -> Path:
+    """Возвращает путь к файлу первичного индекса таблицы."""
+    ensure_data_dir_exists()
+    return DATA_DIR / f"{table_name}.pk.json"
+
+
+def write_json_atomic(path: Path, payload: Any) -> None:
+    """Записывает JSON во временный файл и атомарно подменяет им исходный.
+
+    Индексы дописывают читатели, которых может быть несколько сразу,
+    поэтому имя временного файла у каждого процесса и потока своё.
+    """
+    tmp_path = path.with_name(
+        f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with tmp_path.open("w", encoding="utf-8") as tmp_file:
+        json.dump(payload, tmp_file, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+def _save_pk_index_file(table_name: str, index: PrimaryKeyIndex) -> None:
+    """Сохраняет первичный индекс рядом с журналом таблицы."""
+    write_json_atomic(
+        get_pk_index_path(table_name),
+        {
+            "log_inode": index.log_inode,
+            "log_size": index.log_size,
+            "records": index.records,
+            "positions": index.positions,
+        },
+    )
+    index.unflushed = 0
+
+
+def _load_pk_index_file(table_name: str, log_inode: int) -> PrimaryKeyIndex | None:
+    """Читает сохранённый индекс, если он относится к текущему журналу."""
+    index_path = get_pk_index_path(table_name)
+    if not index_path.exists():
+        return None
+    try:
+        with index_path.open("r", encoding="utf-8") as index_file:
+            data = json.load(index_file)
+    except json.JSONDecodeError:
+        return None
+    if data.get("log_inode") != log_inode:
+        return None
+    return PrimaryKeyIndex(
+        positions={int(key): value for key, value in data["positions"].items()},
+        log_inode=log_inode,
+        log_size=data["log_size"],
+        records=data["records"],
+    )
+
+
+def _encode_log_record(record: dict[str, Any]) -> bytes:
+    """Сериализует запись журнала в одну строку."""
+    line = json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+    return line.encode("utf-8")
+
+
+def iter_log_lines(
+    table_name: str,
+    start: int = 0,
+) -> Iterator[tuple[int, int, dict[str, Any]]]:
+    """Читает записи журнала начиная со смещения start.
+
+    Возвращает тройки (смещение записи, смещение после неё, запись).
+    Незавершённая последняя строка (например, после сбоя во время
+    записи) пропускается.
+    """
+    log_path = get_table_log_path(table_name)
+    if not log_path.exists():
+        return
+    with log_path.open("rb") as log_file:
+        log_file.seek(start)
+        offset = start
+        for line in log_file:
+            if not line.endswith(b"\n"):
+                break
+            next_offset = offset + len(line)
+            if line.strip():
+                yield offset, next_offset, json.loads(line)
+            offset = next_offset
+
+
+@_writes_table
+def repair_table_log(table_name: str) -> bool:
+    """Обрезает журнал таблицы по первой повреждённой записи.
+
+    После сбоя хвост журнала может быть недописан или заполнен мусором.
+    Всё, что дописано после последней контрольной точки, есть в WAL и
+    будет повторено при восстановлении. Возвращает True, если журнал
+    пришлось обрезать.
+    """
+    log_path = get_table_log_path(table_name)
+    if not log_path.exists():
+        return False
+    valid_size = 0
+    with log_path.open("rb") as log_file:
+        for line in log_file:
+            if not line.endswith(b"\n"):
+                break
+            if line.strip():
+                try:
+                    json.loads(line)
+                except ValueError:
+                    break
+            valid_size += len(line)
+        damaged = log_file.seek(0, os.SEEK_END) != valid_size
+    if damaged:
+        with log_path.open("r+b") as log_file:
+            log_file.truncate(valid_size)
+        _PK_INDEXES.pop(table_name, None)
+        get_pk_index_path(table_name).unlink(missing_ok=True)
+    return damaged
+
+
+def iter_log_records(table_name: str) -> Iterator[dict[str, Any]]:
+    """Последовательно читает записи журнала таблицы."""
+    for _, _, record in iter_log_lines(table_name):
+        yield record
+
+
+def _apply_log_record(index: PrimaryKeyIndex, record: dict[str, Any],
+                      offset: int) -> None:
+    """Учитывает одну запись журнала в первичном индексе."""
+    if record["op"] == LOG_OP_PUT:
+        index.positions[record["row"][ID_COLUMN_NAME]] = offset
+    elif record["op"] == LOG_OP_DELETE:
+        index.positions.pop(record["id"], None)
+    index.records += 1
+    index.unflushed += 1
+
+
+def _maybe_flush_pk_index(table_name: str, index: PrimaryKeyIndex) -> None:
+    """Сбрасывает индекс на диск, если накопилось много новых записей."""
+    if index.unflushed >= PK_INDEX_FLUSH_RECORDS:
+        _save_pk_index_file(table_name, index)
+
+
+def get_pk_index(table_name: str) -> PrimaryKeyIndex:
+    """Возвращает актуальный первичный индекс jsonl-таблицы.
+
+    Индекс берётся из памяти процесса или из файла <table>.pk.json и
+    догоняет журнал, читая только записи после водяной отметки. Если
+    журнал был переписан (уплотнён), индекс строится заново.
+    """
+    with _PK_INDEX_MUTEX:
+        try:
+            log_stat = get_table_log_path(table_name).stat()
+        except FileNotFoundError:
+            _PK_INDEXES.pop(table_name, None)
+            return PrimaryKeyIndex()
+
+        index = _PK_INDEXES.get(table_name)
+        if (
+            index is None
+            or index.log_inode != log_stat.st_ino
+            or index.log_size > log_stat.st_size
+        ):
+            index = _load_pk_index_file(table_name, log_stat.st_ino)
+            if index is None or index.log_size > log_stat.st_size:
+                index = PrimaryKeyIndex(log_inode=log_stat.st_ino)
+            _PK_INDEXES[table_name] = index
+
+        if index.log_size < log_stat.st_size:
+            for offset, next_offset, record in iter_log_lines(table_name,
+                                                               index.log_size):
+                _apply_log_record(index, record, offset)
+                index.log_size = next_offset
+            _maybe_flush_pk_index(table_name, index)
+        return index
+
+
+def _append_log_record(table_name: str, record: dict[str, Any]) -> None:
+    """Дописывает одну запись в конец журнала и обновляет индекс."""
+    index = get_pk_index(table_name)
+    data = _encode_log_record(record)
+    with get_table_log_path(table_name).open("ab") as log_file:
+        offset = log_file.seek(0, os.SEEK_END)
+        log_file.write(data)
+
+    if offset == index.log_size:
+        _apply_log_record(index, record, offset)
+        index.log_size = offset + len(data)
+        _maybe_flush_pk_index(table_name, index)
+    else:
+        # Журнал дописывал кто-то ещё — догоняем его целиком
+        index = get_pk_index(table_name)
+
+    dead_records = index.records - len(index.positions)
+    if (
+        dead_records > len(index.positions)
+        and dead_records > LOG_COMPACT_MIN_DEAD_RECORDS
+    ):
+        save_table_data(table_name, _replay_log(table_name))
+
+
+def _replay_log(table_name: str) -> list[dict[str, Any]]:
+    """Восстанавливает актуальные строки таблицы, проигрывая журнал."""
+    rows_by_id: dict[Any, dict[str, Any]] = {}
+    for record in iter_log_records(table_name):
+        if record["op"] == LOG_OP_PUT:
+            row = record["row"]
+            rows_by_id[row[ID_COLUMN_NAME]] = row
+        elif record["op"] == LOG_OP_DELETE:
+            rows_by_id.pop(record["id"], None)
+    return list(rows_by_id.values())
+
+
+class StorageEngine(ABC):
+    """Формат хранения таблицы: как строки лежат на диске.
+
+    Базовая реализация держит таблицу одним списком строк: любое
+    изменение — это load_rows, правка списка и write_rows. Форматам
+    достаточно переопределить paths, load_rows и write_rows, а точечные
+    операции (get_row, put_row, delete_row, append_rows), потоковое
+    чтение и просмотр с условием — по мере того, что они умеют делать
+    быстрее. Методы вызываются функциями модуля под блокировкой таблицы;
+    номер поколения таблицы увеличивают тоже они.
+    """
+
+    name = ""
+    # Способы сжатия, которые формат понимает (пусто — без сжатия)
+    compressions: tuple[str, ...] = ()
+
+    @abstractmethod
+    def paths(self, table_name: str) -> list[Path]:
+        """Файлы (и каталоги) таблицы в этом формате."""
+
+    def exists(self, table_name: str) -> bool:
+        """Хранится ли таблица в этом формате (есть ли её файлы)."""
+        return self.paths(table_name)[0].exists()
+
+    @abstractmethod
+    def load_rows(self, table_name: str) -> list[dict[str, Any]]:
+        """Все строки таблицы списком."""
+
+    @abstractmethod
+    def write_rows(self, table_name: str, rows: list[dict[str, Any]],
+                   columns: dict[str, str] | None,
+                   compression: str | None) -> None:
+        """Массовая запись: заменяет все строки таблицы."""
+
+    def iter_rows(self, table_name: str) -> Iterator[dict[str, Any]]:
+        yield from self.load_rows(table_name)
+
+    def get_row(self, table_name: str, row_id: int) -> dict[str, Any] | None:
+        for row in self.iter_rows(table_name):
+            if row.get(ID_COLUMN_NAME) == row_id:
+                return row
+        return None
+
+    def get_rows(self, table_name: str,
+                 row_ids: Iterable[int]) -> Iterator[dict[str, Any]]:
+        """Строки по id в порядке row_ids (отсутствующие пропускаются)."""
+        for row_id in row_ids:
+            row = self.get_row(table_name, row_id)
+            if row is not None:
+                yield row
+
+    def append_rows(self, table_name: str,
+                    rows: Iterable[dict[str, Any]]) -> int:
+        all_rows = self.load_rows(table_name)
+        rows_before = len(all_rows)
+        all_rows.extend(rows)
+        self.write_rows(table_name, all_rows, None, None)
+        return len(all_rows) - rows_before
+
+    def count_rows(self, table_name: str) -> int | None:
+        """Число строк без их чтения; None — формат так не умеет."""
+        return None
+
+    def put_row(self, table_name: str, row: dict[str, Any]) -> None:
+        """Заменяет строку с тем же id новой версией."""
+        self.change_rows(table_name, {row[ID_COLUMN_NAME]: row})
+
+    def delete_row(self, table_name: str, row_id: int) -> None:
+        self.change_rows(table_name, {row_id: None})
+
+    def change_rows(self, table_name: str,
+                    changed: dict[int, dict[str, Any] | None]) -> None:
+        """Заменяет или удаляет (None) строки за одну перезапись таблицы."""
+        rows = []
+        for existing in self.load_rows(table_name):
+            row_id = existing[ID_COLUMN_NAME]
+            if row_id not in changed:
+                rows.append(existing)
+            elif changed[row_id] is not None:
+                rows.append(changed[row_id])  # type: ignore[arg-type]
+        self.write_rows(table_name, rows, None, None)
+
+    def scan_rows(self, table_name: str, columns: dict[str, str],
+                  condition: Expression | None,
+                  parallel: bool) -> Iterator[dict[str, Any]]:
+        """Полный просмотр с фильтром (parallel — можно ли читать в процессах)."""
+        rows = self.iter_rows(table_name)
+        if condition is not None:
+            rows = filter(compile_predicate(condition, columns), rows)
+        yield from rows
+
+    def aggregate(self, table_name: str, columns: dict[str, str],
+                  condition: Expression | None,
+                  aggregates: list[tuple[str, str]],
+                  group_by: str | None) -> HashAggregator:
+        aggregator = HashAggregator(aggregates, group_by)
+        aggregator.add_rows(self.scan_rows(table_name, columns, condition,
+                                           parallel=True))
+        return aggregator
+
+    def delete_files(self, table_name: str) -> None:
+        for path in self.paths(table_name):
+            if path.is_dir():
+                shutil.rmtree(path)
+            else:
+                path.unlink(missing_ok=True)
+
+
+class JsonStorage(StorageEngine):
+    """Весь список строк одним JSON-файлом <table>.json."""
+
+    name = JSON_STORAGE
+
+    def paths(self, table_name: str) -> list[Path]:
+        return [get_table_file_path(table_name)]
+
+    def load_rows(self, table_name: str) -> list[dict[str, Any]]:
+        table_path = get_table_file_path(table_name)
+        if not table_path.exists():
+            return []
+        with table_path.open("r", encoding="utf-8") as table_file:
+            return json.load(table_file)
+
+    def get_rows(self, table_name: str,
+                 row_ids: Iterable[int]) -> Iterator[dict[str, Any]]:
+        # Файл разбирается один раз на весь список id
+        rows_by_id = {row[ID_COLUMN_NAME]: row
+                      for row in self.load_rows(table_name)}
+        for row_id in row_ids:
+            row = rows_by_id.get(row_id)
+            if row is not None:
+                yield row
+
+    def write_rows(self, table_name: str, rows: list[dict[str, Any]],
+                   columns: dict[str, str] | None,
+                   compression: str | None) -> None:
+        table_path = get_table_file_path(table_name)
+        tmp_path = table_path.with_name(table_path.name + ".tmp")
+        with tmp_path.open("w", encoding="utf-8") as table_file:
+            json.dump(rows, table_file, indent=2, ensure_ascii=False)
+            _sync_file_object(table_file)
+        os.replace(tmp_path, table_path)
+
+
+class LogStorage(StorageEngine):
+    """Журнал записей <table>.jsonl с первичным индексом id -> смещение.
+
+    Вставка, замена и удаление дописывают одну запись; строка по id
+    читается по смещению из индекса.
+    """
+
+    name = LOG_STORAGE
+
+    def paths(self, table_name: str) -> list[Path]:
+        return [get_table_log_path(table_name), get_pk_index_path(table_name)]
+
+    def load_rows(self, table_name: str) -> list[dict[str, Any]]:
+        return _replay_log(table_name)
+
+    def write_rows(self, table_name: str, rows: list[dict[str, Any]],
+                   columns: dict[str, str] | None,
+                   compression: str | None) -> None:
+        # Пишем новый журнал рядом и подменяем старый, попутно строя индекс
+        log_path = get_table_log_path(table_name)
+        tmp_path = log_path.with_name(log_path.name + ".tmp")
+        index = PrimaryKeyIndex(records=len(rows))
+        with tmp_path.open("wb") as log_file:
+            for row in rows:
+                index.positions[row[ID_COLUMN_NAME]] = log_file.tell()
+                log_file.write(_encode_log_record({"op": LOG_OP_PUT, "row": row}))
+            index.log_size = log_file.tell()
+            _sync_file_object(log_file)
+        os.replace(tmp_path, log_path)
+        index.log_inode = log_path.stat().st_ino
+        _PK_INDEXES[table_name] = index
+        _save_pk_index_file(table_name, index)
+
+    def iter_rows(self, table_name: str) -> Iterator[dict[str, Any]]:
+        positions = list(get_pk_index(table_name).positions.values())
+        with get_table_log_path(table_name).open("rb") as log_file:
+            for offset in positions:
+                log_file.seek(offset)
+                yield json.loads(log_file.readline())["row"]
+
+    def get_row(self, table_name: str, row_id: int) -> dict[str, Any] | None:
+        offset = get_pk_index(table_name).positions.get(row_id)
+        if offset is None:
+            return None
+        with get_table_log_path(table_name).open("rb") as log_file:
+            log_file.seek(offset)
+            return json.loads(log_file.readline())["row"]
+
+    def append_rows(self, table_name: str,
+                    rows: Iterable[dict[str, Any]]) -> int:
+        index = get_pk_index(table_name)
+        count = 0
+        with get_table_log_path(table_name).open("ab") as log_file:
+            start = log_file.seek(0, os.SEEK_END)
+            in_sync = start == index.log_size
+            offset = start
+            try:
+                for row in rows:
+                    record = {"op": LOG_OP_PUT, "row": row}
+                    data = _encode_log_record(record)
+                    log_file.write(data)
+                    if in_sync:
+                        _apply_log_record(index, record, offset)
+                    offset += len(data)
+                    count += 1
+            except BaseException:
+                log_file.truncate(start)
+                _PK_INDEXES.pop(table_name, None)
+                raise
+
+        if in_sync:
+            index.log_size = offset
+            _maybe_flush_pk_index(table_name, index)
+        else:
+            get_pk_index(table_name)
+        return count
+
+    def count_rows(self, table_name: str) -> int | None:
+        return len(get_pk_index(table_name).positions)
+
+    def put_row(self, table_name: str, row: dict[str, Any]) -> None:
+        _append_log_record(table_name, {"op": LOG_OP_PUT, "row": row})
+
+    def delete_row(self, table_name: str, row_id: int) -> None:
+        _append_log_record(table_name, {"op": LOG_OP_DELETE, "id": row_id})
+
+    def change_rows(self, table_name: str,
+                    changed: dict[int, dict[str, Any] | None]) -> None:
+        for row_id, row in changed.items():
+            if row is None:
+                self.delete_row(table_name, row_id)
+            else:
+                self.put_row(table_name, row)
+
+    def delete_files(self, table_name: str) -> None:
+        _PK_INDEXES.pop(table_name, None)
+        super().delete_files(table_name)
+
+
+class BinaryStorage(StorageEngine):
+    """Записи фиксированной ширины <table>.bin и куча строк <table>.heap."""
+
+    name = BINARY_STORAGE
+
+    def paths(self, table_name: str) -> list[Path]:
+        return list(get_table_binary_paths(table_name))
+
+    def load_rows(self, table_name: str) -> list[dict[str, Any]]:
+        return list(self.iter_rows(table_name))
+
+    def write_rows(self, table_name: str, rows: list[dict[str, Any]],
+                   columns: dict[str, str] | None,
+                   compression: str | None) -> None:
+        table_path, heap_path = get_table_binary_paths(table_name)
+        if columns is None:
+            if not table_path.exists():
+                raise ValueError("Для бинарной таблицы нужна схема колонок")
+            columns = read_binary_columns(table_path)
+        write_binary_table(table_path, heap_path, columns, rows)
+
+    def iter_rows(self, table_name: str) -> Iterator[dict[str, Any]]:
+        yield from iter_binary_rows(*get_table_binary_paths(table_name))
+
+    def get_row(self, table_name: str, row_id: int) -> dict[str, Any] | None:
+        return get_binary_row(*get_table_binary_paths(table_name), row_id)
+
+    def append_rows(self, table_name: str,
+                    rows: Iterable[dict[str, Any]]) -> int:
+        return append_binary_rows(*get_table_binary_paths(table_name), rows)
+
+    def put_row(self, table_name: str, row: dict[str, Any]) -> None:
+        update_binary_row(*get_table_binary_paths(table_name), row)
+        self._maybe_compact(table_name)
+
+    def delete_row(self, table_name: str, row_id: int) -> None:
+        delete_binary_row(get_table_binary_paths(table_name)[0], row_id)
+        self._maybe_compact(table_name)
+
+    def change_rows(self, table_name: str,
+                    changed: dict[int, dict[str, Any] | None]) -> None:
+        # Поля меняются на месте, перезапись файла не нужна
+        table_path, heap_path = get_table_binary_paths(table_name)
+        for row_id, row in changed.items():
+            if row is None:
+                delete_binary_row(table_path, row_id)
+            else:
+                update_binary_row(table_path, heap_path, row)
+        self._maybe_compact(table_name)
+
+    def _maybe_compact(self, table_name: str) -> None:
+        """Переписывает таблицу, если удалённые данные перевесили живые."""
+        garbage = read_binary_garbage(*get_table_binary_paths(table_name))
+        if (
+            garbage.dead_rows > garbage.live_rows
+            and garbage.dead_rows > BINARY_COMPACT_MIN_DEAD_ROWS
+        ) or (
+            garbage.dead_heap_bytes > garbage.live_heap_bytes
+            and garbage.dead_heap_bytes > BINARY_COMPACT_MIN_DEAD_HEAP_BYTES
+        ):
+            self.write_rows(table_name, self.load_rows(table_name), None, None)
+
+
+class SegmentedStorage(StorageEngine):
+    """Сегменты по SEGMENT_ROWS id в каталоге <table>.segments (segments.py).
+
+    Просмотр с условием и агрегаты выполняются параллельно в процессах,
+    сегменты пропускаются по зонным картам, изменения переписывают
+    только затронутые сегменты.
+    """
+
+    name = SEGMENTED_STORAGE
+    compressions = SEGMENT_COMPRESSIONS
+
+    def paths(self, table_name: str) -> list[Path]:
+        return [get_table_segments_dir(table_name)]
+
+    def exists(self, table_name: str) -> bool:
+        return get_table_segments_dir(table_name).is_dir()
+
+    def load_rows(self, table_name: str) -> list[dict[str, Any]]:
+        return load_segmented_rows(get_table_segments_dir(table_name))
+
+    def write_rows(self, table_name: str, rows: list[dict[str, Any]],
+                   columns: dict[str, str] | None,
+                   compression: str | None) -> None:
+        write_segmented_table(get_table_segments_dir(table_name), rows,
+                              compression)
+
+    def iter_rows(self, table_name: str) -> Iterator[dict[str, Any]]:
+        yield from iter_segmented_rows(get_table_segments_dir(table_name))
+
+    def get_row(self, table_name: str, row_id: int) -> dict[str, Any] | None:
+        return get_segment_row(get_table_segments_dir(table_name), row_id)
+
+    def append_rows(self, table_name: str,
+                    rows: Iterable[dict[str, Any]]) -> int:
+        return append_segment_rows(get_table_segments_dir(table_name), rows)
+
+    def count_rows(self, table_name: str) -> int | None:
+        return count_segmented_rows(get_table_segments_dir(table_name))
+
+    def put_row(self, table_name: str, row: dict[str, Any]) -> None:
+        replace_segment_row(get_table_segments_dir(table_name), row)
+
+    def delete_row(self, table_name: str, row_id: int) -> None:
+        delete_segment_row(get_table_segments_dir(table_name), row_id)
+
+    def change_rows(self, table_name: str,
+                    changed: dict[int, dict[str, Any] | None]) -> None:
+        change_segment_rows(get_table_segments_dir(table_name), changed)
+
+    def scan_rows(self, table_name: str, columns: dict[str, str],
+                  condition: Expression | None,
+                  parallel: bool) -> Iterator[dict[str, Any]]:
+        scan = scan_segmented_rows if parallel else iter_matching_segment_rows
+        yield from scan(get_table_segments_dir(table_name), columns, condition)
+
+    def aggregate(self, table_name: str, columns: dict[str, str],
+                  condition: Expression | None,
+                  aggregates: list[tuple[str, str]],
+                  group_by: str | None) -> HashAggregator:
+        return aggregate_segmented_rows(get_table_segments_dir(table_name),
+                                        columns, condition, aggregates,
+                                        group_by)
+
+
+# Зарегистрированные форматы хранения. Формат существующей таблицы
+# определяется по файлам в этом порядке (json — последним: файл <table>.json
+# мог остаться рядом с более новым форматом)
+_STORAGE_ENGINES: dict[str, StorageEngine] = {}
+
+
+def register_storage_engine(storage_engine: StorageEngine) -> None:
+    """Добавляет формат хранения (или заменяет формат с тем же именем)."""
+    if not storage_engine.name:
+        raise ValueError("У формата хранения должно быть имя")
+    _STORAGE_ENGINES[storage_engine.name] = storage_engine
+
+
+def get_storage_engine(storage: str) -> StorageEngine:
+    """Возвращает зарегистрированный формат хранения по имени."""
+    try:
+        return _STORAGE_ENGINES[storage]
+    except KeyError:
+        raise ValueError(f"Формат хранения {storage!r} не поддерживается") from None
+
+
+def list_storage_engines() -> list[str]:
+    """Имена зарегистрированных форматов хранения."""
+    return list(_STORAGE_ENGINES)
+
+
+for _storage_engine in (LogStorage(), BinaryStorage(), SegmentedStorage(),
+                        JsonStorage()):
+    register_storage_engine(_storage_engine)
+
+
+def get_table_storage(table_name: str) -> str:
+    """Возвращает формат хранения таблицы из её схемы (ключ "storage").
+
+    По файлам в папке данных формат определяется, только если в схеме его
+    нет (таблицы старых версий, файлы без схемы) или файлов этого формата
+    нет на диске: конвертацию прервал сбой до сохранения схемы, и
+    восстановление должно прочитать строки оттуда, где они лежат. Таблицы
+    без файлов и без формата в схеме считаются таблицами формата по
+    умолчанию.
+    """
+    schema = _cached_db_meta().get(table_name, {})
+    storage = schema.get("storage")
+    if storage in _STORAGE_ENGINES and _STORAGE_ENGINES[storage].exists(
+            table_name):
+        return storage
+    for name, storage_engine in _STORAGE_ENGINES.items():
+        if storage_engine.exists(table_name):
+            return name
+    return storage if storage in _STORAGE_ENGINES else DEFAULT_STORAGE
+
+
+def _table_engine(table_name: str) -> StorageEngine:
+    return get_storage_engine(get_table_storage(table_name))
+
+
+@_reads_table
+def get_table_row(table_name: str, row_id: int) -> dict[str, Any] | None:
+    """Возвращает строку по ID или None, если её нет.
+
+    Для jsonl-таблиц читается одна запись журнала по смещению из
+    первичного индекса, для бинарных — запись находится двоичным поиском,
+    для сегментированных разбирается один сегмент, для json-таблиц —
+    просматривается весь список.
+    """
+    return _table_engine(table_name).get_row(table_name, row_id)
+
+
+def get_table_rows(table_name: str,
+                   row_ids: Iterable[int]) -> Iterator[dict[str, Any]]:
+    """Потоково читает строки по списку id, в порядке row_ids.
+
+    Отсутствующие строки пропускаются. json-таблица разбирается один раз
+    на весь список, остальные форматы читают строки по одной, поэтому
+    чтение можно прервать. Разделяемая блокировка таблицы держится, пока
+    итератор не исчерпан или не закрыт.
+    """
+    with table_lock(table_name).shared():
+        yield from _table_engine(table_name).get_rows(table_name, row_ids)
+
+
+@_reads_table
+def count_table_rows(table_name: str) -> int | None:
+    """Возвращает число строк, если формат знает его без чтения строк.
+
+    У jsonl-таблиц это размер первичного индекса, у сегментированных —
+    сумма строк по зонам сегментов; для json и binary — None.
+    """
+    return _table_engine(table_name).count_rows(table_name)
+
+
+@timed("table_load")
+@_reads_table
 def load_table_data(table_name: str) -> list[dict[str, Any]]:
-    """Загружает строки таблицы из JSON-файла."""
-    table_path = get_table_file_path(table_name)
-    if not table_path.exists():
-        return []
-    with table_path.open("r", encoding="utf-8") as table_file:
-        return json.load(table_file)
-
-
-def save_table_data(table_name: str, rows: list[dict[str, Any]]) -> None:
-    """Сохраняет строки таблицы в JSON-файл."""
-    table_path = get_table_file_path(table_name)
-    with table_path.open("w", encoding="utf-8") as table_file:
-        json.dump(rows, table_file, indent=2, ensure_ascii=False)
+    """Загружает строки таблицы из файла данных.
+
+    Сегменты сегментированной таблицы разбираются параллельно.
+    """
+    return _table_engine(table_name).load_rows(table_name)
+
+
+def iter_table_rows(table_name: str) -> Iterator[dict[str, Any]]:
+    """Потоково перебирает строки таблицы в том же порядке, что load_table_data.
+
+    jsonl-таблица читается по смещениям первичного индекса, бинарная —
+    запись за записью через mmap, поэтому чтение прекращается, как только
+    вызывающему хватит строк. json-файл приходится разобрать целиком.
+    Разделяемая блокировка таблицы держится, пока итератор не исчерпан
+    или не закрыт.
+    """
+    with table_lock(table_name).shared():
+        yield from _table_engine(table_name).iter_rows(table_name)
+
+
+def scan_table_rows(table_name: str, columns: dict[str, str],
+                    condition: Expression | None,
+                    parallel: bool = True) -> Iterator[dict[str, Any]]:
+    """Полный просмотр таблицы с фильтром по условию.
+
+    Сегменты сегментированной таблицы читаются и фильтруются
+    параллельно в процессах пула (см. segments.py), а сегменты, которые
+    по зонным картам не могут содержать подходящих строк, пропускаются.
+    С parallel=False сегменты читаются по очереди, чтобы чтение можно
+    было прервать. В остальных форматах строки проверяются здесь же по
+    ходу потокового чтения.
+    """
+    with table_lock(table_name).shared():
+        yield from _table_engine(table_name).scan_rows(table_name, columns,
+                                                       condition, parallel)
+
+
+def count_scanned_segments(table_name: str, columns: dict[str, str],
+                           condition: Expression | None) -> tuple[int, int]:
+    """Сколько сегментов прочитает просмотр с условием и сколько их всего."""
+    with table_lock(table_name).shared():
+        paths, total = select_segment_paths(get_table_segments_dir(table_name),
+                                            columns, condition)
+    return len(paths), total
+
+
+def aggregate_table_rows(
+    table_name: str,
+    columns: dict[str, str],
+    condition: Expression | None,
+    aggregates: list[tuple[str, str]],
+    group_by: str | None,
+) -> HashAggregator:
+    """Агрегаты по всей таблице за один просмотр.
+
+    Для сегментированной таблицы каждый процесс возвращает частичные
+    агрегаты своего сегмента, а здесь они только сливаются.
+    """
+    with table_lock(table_name).shared():
+        return _table_engine(table_name).aggregate(
+            table_name, columns, condition, aggregates, group_by)
+
+
+@timed("save")
+@_writes_table
+def save_table_data(
+    table_name: str,
+    rows: list[dict[str, Any]],
+    storage: str | None = None,
+    columns: dict[str, str] | None = None,
+    compression: str | None = None,
+) -> None:
+    """Полностью перезаписывает файл данных таблицы.
+
+    Новый файл пишется рядом, сбрасывается на диск и атомарно подменяет
+    старый, поэтому сбой во время записи не оставляет обрезанной таблицы
+    (точечные изменения защищает журнал упреждающей записи, см. wal.py).
+    Для jsonl-таблиц журнал при этом уплотняется: остаётся по одной
+    записи на каждую строку. Бинарному формату нужна схема колонок:
+    она берётся из columns или из заголовка существующего файла.
+    compression задаёт сжатие сегментов сегментированной таблицы (None —
+    оставить прежнее). Если storage отличается от текущего формата, файлы
+    старого формата удаляются после записи нового (так таблица
+    конвертируется).
+    """
+    previous_storage = get_table_storage(table_name)
+    storage_engine = get_storage_engine(storage or previous_storage)
+    try:
+        storage_engine.write_rows(table_name, rows, columns, compression)
+    finally:
+        _bump_table_generation(table_name)
+    if storage_engine.name != previous_storage:
+        get_storage_engine(previous_storage).delete_files(table_name)
+
+
+@timed("save")
+@_writes_table
+def append_table_row(table_name: str, row: dict[str, Any]) -> None:
+    """Добавляет одну строку в конец таблицы."""
+    append_table_rows(table_name, [row])
+
+
+@timed("save")
+@_writes_table
+def append_table_rows(table_name: str, rows: Iterable[dict[str, Any]]) -> int:
+    """Добавляет строки в конец таблицы за один проход и возвращает их число.
+
+    Строки читаются из итератора по одной, поэтому вход может быть
+    потоковым. Если итератор падает с ошибкой, журнал обрезается до
+    исходного размера — таблица остаётся без частично добавленных строк.
+    """
+    try:
+        return _table_engine(table_name).append_rows(table_name, rows)
+    finally:
+        _bump_table_generation(table_name)
+
+
+@timed("save")
+@_writes_table
+def replace_table_row(table_name: str, row: dict[str, Any]) -> None:
+    """Заменяет строку с тем же ID новой версией.
+
+    В бинарной таблице поля обновляются на месте.
+    """
+    try:
+        _table_engine(table_name).put_row(table_name, row)
+    finally:
+        _bump_table_generation(table_name)
+
+
+@timed("save")
+@_writes_table
+def delete_table_row(table_name: str, row_id: int) -> None:
+    """Удаляет строку по ID (для jsonl — дописывает запись-надгробие)."""
+    try:
+        _table_engine(table_name).delete_row(table_name, row_id)
+    finally:
+        _bump_table_generation(table_name)
+
+
+@timed("save")
+@_writes_table
+def change_table_rows(table_name: str,
+                      changed: dict[int, dict[str, Any] | None]) -> None:
+    """Заменяет или удаляет (None) несколько строк таблицы.
+
+    jsonl и бинарная таблицы меняются по строке на месте, json-таблица
+    переписывается один раз, а в сегментированной каждый затронутый
+    сегмент переписывается один раз.
+    """
+    try:
+        _table_engine(table_name).change_rows(table_name, changed)
+    finally:
+        _bump_table_generation(table_name)
+
+
+@_writes_table
+def delete_table_data(table_name: str) -> None:
+    """Удаляет файлы данных и индекса таблицы во всех форматах хранения.
+
+    Файл поколения остаётся и увеличивается, чтобы кэши других процессов
+    не приняли новую таблицу с тем же именем за старую.
+    """
+    _bump_table_generation(table_name)
+    for storage_engine in _STORAGE_ENGINES.values():
+        storage_engine.delete_files(table_name)
+
+
+def get_table_disk_size(table_name: str) -> int:
+    """Сколько байт занимают на диске данные таблицы."""
+    total = 0
+    for path in _table_engine(table_name).paths(table_name):
+        files = path.rglob("*") if path.is_dir() else [path]
+        total += sum(file.stat().st_size for file in files if file.is_file())
+    return total
@@ -0,0 +1,374 @@
+"""Условия where: разбор выражения и компиляция в функцию-предикат.
+
+Грамматика (ключевые слова без учёта регистра):
+
+    выражение := и-выражение ("or" и-выражение)*
+    и-выражение := не-выражение ("and" не-выражение)*
+    не-выражение := "not" не-выражение | "(" выражение ")" | условие
+    условие := поле оператор значение | поле "in" "(" значение, ... ")"
+    оператор := = | != | < | <= | > | >=
+
+Значение — слово без пробелов и скобок или строка в кавычках.
+Выражение разбирается один раз в дерево (frozen dataclass — его можно
+использовать как ключ кэша), а compile_predicate превращает дерево в
+замыкание над строкой-словарём: литералы заранее приводятся к типу
+колонки из db_meta.json, поэтому int сравниваются как числа, без str()
+на каждую строку.
+"""
+
+from __future__ import annotations
+
+import operator
+import re
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
+from typing import Any
+
+Predicate = Callable[[dict[str, Any]], bool]
+# Проверка непустого значения одной колонки
+ValueTest = Callable[[Any], bool]
+
+COMPARISON_OPERATORS: dict[str, Callable[[Any, Any], bool]] = {
+    "=": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+_TOKEN_RE = re.compile(
+    r"""\s*(?:
+        (?P<op><=|>=|!=|=|<|>)
+        |(?P<paren>[(),])
+        |'(?P<single>[^']*)'
+        |"(?P<double>[^"]*)"
+        |(?P<word>[^\s()=!<>,'"]+)
+    )""",
+    re.VERBOSE,
+)
+
+_WORD_RE = re.compile(r"[^\s()=!<>,'\"]+")
+
+_KEYWORDS = ("and", "or", "not", "in")
+
+
+@dataclass(frozen=True)
+class Comparison:
+    """Сравнение поля с литералом: age>30, name=Bob."""
+
+    column: str
+    op: str
+    value: str
+
+
+@dataclass(frozen=True)
+class InList:
+    """Принадлежность списку: city in (Moscow, Kazan)."""
+
+    column: str
+    values: tuple[str, ...]
+
+
+@dataclass(frozen=True)
+class And:
+    left: Expression
+    right: Expression
+
+
+@dataclass(frozen=True)
+class Or:
+    left: Expression
+    right: Expression
+
+
+@dataclass(frozen=True)
+class Not:
+    operand: Expression
+
+
+Expression = Comparison | InList | And | Or | Not
+
+
+@dataclass(frozen=True)
+class _Token:
+    kind: str  # "op", "paren", "value", "word"
+    text: str
+
+
+def _tokenize(text: str) -> list[_Token]:
+    tokens: list[_Token] = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = _TOKEN_RE.match(text, position)
+        if match is None:
+            raise ValueError(f"Не удалось разобрать условие около "
+                             f"{text[position:]!r}")
+        position = match.end()
+        if match.group("op") is not None:
+            tokens.append(_Token("op", match.group("op")))
+        elif match.group("paren") is not None:
+            tokens.append(_Token("paren", match.group("paren")))
+        elif match.group("single") is not None:
+            tokens.append(_Token("value", match.group("single")))
+        elif match.group("double") is not None:
+            tokens.append(_Token("value", match.group("double")))
+        else:
+            tokens.append(_Token("word", match.group("word")))
+    return tokens
+
+
+class _Parser:
+    """Рекурсивный спуск по токенам условия."""
+
+    def __init__(self, tokens: list[_Token]) -> None:
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self) -> _Token | None:
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return None
+
+    def next(self, expected: str) -> _Token:
+        token = self.peek()
+        if token is None:
+            raise ValueError(f"Условие оборвалось: ожидалось {expected}")
+        self.position += 1
+        return token
+
+    def at_keyword(self, keyword: str) -> bool:
+        token = self.peek()
+        return (token is not None and token.kind == "word"
+                and token.text.lower() == keyword)
+
+    def expect_paren(self, paren: str) -> None:
+        token = self.next(repr(paren))
+        if token.kind != "paren" or token.text != paren:
+            raise ValueError(f"Ожидалось {paren!r}, получено {token.text!r}")
+
+    def parse(self) -> Expression:
+        expression = self.parse_or()
+        token = self.peek()
+        if token is not None:
+            raise ValueError(f"Лишнее в условии: {token.text!r}")
+        return expression
+
+    def parse_or(self) -> Expression:
+        expression = self.parse_and()
+        while self.at_keyword("or"):
+            self.position += 1
+            expression = Or(expression, self.parse_and())
+        return expression
+
+    def parse_and(self) -> Expression:
+        expression = self.parse_not()
+        while self.at_keyword("and"):
+            self.position += 1
+            expression = And(expression, self.parse_not())
+        return expression
+
+    def parse_not(self) -> Expression:
+        if self.at_keyword("not"):
+            self.position += 1
+            return Not(self.parse_not())
+        token = self.peek()
+        if token is not None and token.kind == "paren" and token.text == "(":
+            self.position += 1
+            expression = self.parse_or()
+            self.expect_paren(")")
+            return expression
+        return self.parse_condition()
+
+    def parse_value(self) -> str:
+        token = self.next("значение")
+        if token.kind not in ("value", "word"):
+            raise ValueError(f"Ожидалось значение, получено {token.text!r}")
+        return token.text
+
+    def parse_condition(self) -> Comparison | InList:
+        token = self.next("имя поля")
+        if token.kind != "word" or token.text.lower() in _KEYWORDS:
+            raise ValueError(f"Ожидалось имя поля, получено {token.text!r}")
+        column = token.text
+
+        if self.at_keyword("in"):
+            self.position += 1
+            self.expect_paren("(")
+            values = [self.parse_value()]
+            while True:
+                separator = self.next("',' или ')'")
+                if separator.kind == "paren" and separator.text == ")":
+                    return InList(column, tuple(values))
+                if separator.kind != "paren" or separator.text != ",":
+                    raise ValueError(f"Ожидалось ',' или ')', получено "
+                                     f"{separator.text!r}")
+                values.append(self.parse_value())
+
+        op_token = self.next("оператор сравнения")
+        if op_token.kind != "op":
+            raise ValueError(f"Ожидался оператор сравнения после {column!r}, "
+                             f"получено {op_token.text!r}")
+        value_token = self.peek()
+        if op_token.text in ("=", "!=") and (
+            value_token is None or value_token.kind not in ("value", "word")
+        ):
+            # Пустое значение: name= ищет пустую строку
+            return Comparison(column, op_token.text, "")
+        return Comparison(column, op_token.text, self.parse_value())
+
+
+def parse_where(text: str) -> Expression:
+    """Разбирает текст условия where в дерево выражения."""
+    tokens = _tokenize(text)
+    if not tokens:
+        raise ValueError("Пустое условие where")
+    return _Parser(tokens).parse()
+
+
+def as_simple_equality(expression: Expression) -> tuple[str, str] | None:
+    """(поле, значение), если выражение — одно сравнение на равенство."""
+    if isinstance(expression, Comparison) and expression.op == "=":
+        return expression.column, expression.value
+    return None
+
+
+def iter_comparisons(expression: Expression) -> Iterator[Comparison | InList]:
+    """Все условия на поля внутри выражения."""
+    if isinstance(expression, (Comparison, InList)):
+        yield expression
+    elif isinstance(expression, (And, Or)):
+        yield from iter_comparisons(expression.left)
+        yield from iter_comparisons(expression.right)
+    else:
+        yield from iter_comparisons(expression.operand)
+
+
+def iter_conjuncts(expression: Expression) -> Iterator[Expression]:
+    """Части выражения, соединённые and на верхнем уровне."""
+    if isinstance(expression, And):
+        yield from iter_conjuncts(expression.left)
+        yield from iter_conjuncts(expression.right)
+    else:
+        yield expression
+
+
+def _format_value(value: str) -> str:
+    if _WORD_RE.fullmatch(value) and value.lower() not in _KEYWORDS:
+        return value
+    return repr(value)
+
+
+def format_expression(expression: Expression) -> str:
+    """Текст выражения в синтаксисе where (для explain)."""
+    if isinstance(expression, Comparison):
+        return (f"{expression.column}{expression.op}"
+                f"{_format_value(expression.value)}")
+    if isinstance(expression, InList):
+        values = ", ".join(_format_value(value) for value in expression.values)
+        return f"{expression.column} in ({values})"
+    if isinstance(expression, Not):
+        operand = format_expression(expression.operand)
+        if isinstance(expression.operand, (And, Or)):
+            operand = f"({operand})"
+        return f"not {operand}"
+
+    parts = []
+    for part in (expression.left, expression.right):
+        text = format_expression(part)
+        if isinstance(expression, And) and isinstance(part, Or):
+            text = f"({text})"
+        parts.append(text)
+    keyword = " and " if isinstance(expression, And) else " or "
+    return keyword.join(parts)
+
+
+def _convert_literal(value: str, column: str, column_type: str,
+                     op: str) -> object:
+    """Приводит литерал к типу колонки (None — значение не того типа)."""
+    if column_type != "int":
+        return value
+    try:
+        return int(value)
+    except ValueError:
+        if op in ("=", "!="):
+            # Как при поиске по равенству: число не равно такой строке
+            return None
+        raise ValueError(f"Колонка {column!r} имеет тип int, "
+                         f"а значение {value!r} — не число") from None
+
+
+def equality_literal(column: str, value: str,
+                     columns: dict[str, str]) -> object | None:
+    """Значение условия поле=значение, приведённое к типу колонки.
+
+    Приведение то же, что в compile_predicate, поэтому поиск по индексу
+    или по колонке совпадает с проверкой предикатом: age=030 ищет 30.
+    None — значение не того типа, такое равенство не совпадает ни с чем.
+    """
+    if column not in columns:
+        raise ValueError(f"Колонки {column!r} нет в таблице")
+    return _convert_literal(value, column, columns[column], "=")
+
+
+def compile_value_test(condition: Comparison | InList,
+                       columns: dict[str, str]) -> tuple[ValueTest, bool]:
+    """Компилирует условие над одной колонкой.
+
+    Возвращает проверку непустого значения колонки и результат условия
+    для пустого (None) значения. Ею пользуются и предикат над строкой, и
+    проверка колонки целиком (ColumnarTable.find_where).
+    """
+    column = condition.column
+    if column not in columns:
+        raise ValueError(f"Колонки {column!r} нет в таблице")
+    column_type = columns[column]
+
+    if isinstance(condition, InList):
+        allowed = {
+            _convert_literal(value, column, column_type, "=")
+            for value in condition.values
+        }
+        allowed.discard(None)
+        return allowed.__contains__, False
+
+    compare = COMPARISON_OPERATORS[condition.op]
+    literal = _convert_literal(condition.value, column, column_type,
+                               condition.op)
+    if literal is None:
+        # int-колонка и не число: = не совпадает ни с чем, != — со всем
+        matches_all = condition.op == "!="
+        return lambda value: matches_all, matches_all
+    return lambda value: compare(value, literal), condition.op == "!="
+
+
+def compile_predicate(expression: Expression,
+                      columns: dict[str, str]) -> Predicate:
+    """Компилирует выражение в предикат над строкой-словарём.
+
+    columns — схема таблицы (имя колонки → тип). Строки с пустым (None)
+    значением поля не подходят ни под одно сравнение, кроме !=.
+    """
+    if isinstance(expression, And):
+        left = compile_predicate(expression.left, columns)
+        right = compile_predicate(expression.right, columns)
+        return lambda row: left(row) and right(row)
+    if isinstance(expression, Or):
+        left = compile_predicate(expression.left, columns)
+        right = compile_predicate(expression.right, columns)
+        return lambda row: left(row) or right(row)
+    if isinstance(expression, Not):
+        operand = compile_predicate(expression.operand, columns)
+        return lambda row: not operand(row)
+
+    column = expression.column
+    test, null_matches = compile_value_test(expression, columns)
+
+    def predicate(row: dict[str, Any]) -> bool:
+        value = row.get(column)
+        if value is None:
+            return null_matches
+        return test(value)
+
+    return predicate
@@ -0,0 +1,154 @@
+"""Выдача id новых строк блоками.
+
+Вставка не сохраняет next_id на каждую строку. Процесс резервирует блок
+из ID_BLOCK_SIZE id: next_id в схеме таблицы сразу переносится за конец
+блока и сохраняется (одна запись метаданных на блок), а id внутри блока
+выдаются из памяти. Другие процессы резервируют свои блоки уже после
+этой отметки, поэтому id не пересекаются, а recover(), отбрасывая строки
+с id не меньше next_id, не трогает выданные.
+
+Блок действует, пока у таблицы тот же uid (её не пересоздали) и next_id
+в схеме не меньше конца блока. Неиспользованный остаток блока
+возвращается (release_id_block) при выходе и перед массовой вставкой,
+которая продолжает нумерацию с него, если после блока никто не
+резервировал id; после сбоя остаток остаётся пропуском в нумерации.
+"""
+
+from __future__ import annotations
+
+import threading
+import uuid
+from dataclasses import dataclass
+from typing import Any
+
+from .constants import ID_BLOCK_SIZE
+
+
+def new_table_uid() -> str:
+    """Уникальный идентификатор таблицы (меняется при пересоздании)."""
+    return uuid.uuid4().hex
+
+
+@dataclass
+class IdBlock:
+    """Зарезервированный диапазон id таблицы: [next_id, limit)."""
+
+    uid: str
+    next_id: int
+    limit: int
+
+    def is_valid(self, schema: dict[str, Any]) -> bool:
+        return (self.uid == schema.get("uid")
+                and self.limit <= schema["next_id"])
+
+
+class IdAllocator:
+    """Блоки id по таблицам; вызывается под блокировкой записи таблицы."""
+
+    def __init__(self, block_size: int = ID_BLOCK_SIZE) -> None:
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._blocks: dict[str, IdBlock] = {}
+
+    def take(self, table_name: str, schema: dict[str, Any]) -> int | None:
+        """Выдаёт id из уже зарезервированного блока; None — блока нет.
+
+        Схема не меняется, поэтому так id берёт и транзакция: её копия
+        метаданных сохранится только при commit.
+        """
+        with self._lock:
+            block = self._blocks.get(table_name)
+            if (block is None or not block.is_valid(schema)
+                    or block.next_id >= block.limit):
+                return None
+            block.next_id += 1
+            return block.next_id - 1
+
+    def allocate(self, table_name: str,
+                 schema: dict[str, Any]) -> tuple[int, bool]:
+        """Выдаёт id новой строки, при необходимости резервируя блок.
+
+        Второе значение True, если зарезервирован новый блок: next_id
+        (и uid у таблиц, созданных до его появления) в schema изменены,
+        и схему нужно сохранить вместе со строкой.
+        """
+        row_id = self.take(table_name, schema)
+        if row_id is not None:
+            return row_id, False
+        with self._lock:
+            if "uid" not in schema:
+                schema["uid"] = new_table_uid()
+            start: int = schema["next_id"]
+            self._blocks[table_name] = IdBlock(
+                schema["uid"], start + 1, start + self.block_size)
+            schema["next_id"] = start + self.block_size
+            return start, True
+
+    def release(self, table_name: str,
+                schema: dict[str, Any] | None) -> bool:
+        """Забывает блок таблицы и возвращает его остаток, если можно.
+
+        Вернуть остаток можно, только если после блока никто не
+        резервировал id (next_id в schema — конец блока). Тогда next_id
+        в schema сдвигается назад и схему нужно сохранить (True).
+        schema None — таблицы уже нет.
+        """
+        with self._lock:
+            block = self._blocks.pop(table_name, None)
+        if (block is None or schema is None or block.uid != schema.get("uid")
+                or block.limit != schema["next_id"]
+                or block.next_id >= block.limit):
+            return False
+        schema["next_id"] = block.next_id
+        return True
+
+    def unused(self, table_name: str, schema: dict[str, Any]) -> int:
+        """Сколько id блока ещё не выдано, если блок — последний в таблице."""
+        with self._lock:
+            block = self._blocks.get(table_name)
+            if (block is None or block.uid != schema.get("uid")
+                    or block.limit != schema["next_id"]):
+                return 0
+            return block.limit - block.next_id
+
+    def tables(self) -> list[str]:
+        """Таблицы, у которых есть зарезервированный блок."""
+        with self._lock:
+            return sorted(self._blocks)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._blocks.clear()
+
+
+_ALLOCATOR = IdAllocator()
+
+
+def allocate_id(table_name: str, schema: dict[str, Any]) -> tuple[int, bool]:
+    """Выдаёт id новой строки (см. IdAllocator.allocate)."""
+    return _ALLOCATOR.allocate(table_name, schema)
+
+
+def take_id(table_name: str, schema: dict[str, Any]) -> int | None:
+    """Выдаёт id из зарезервированного блока (см. IdAllocator.take)."""
+    return _ALLOCATOR.take(table_name, schema)
+
+
+def release_id_block(table_name: str, schema: dict[str, Any] | None) -> bool:
+    """Возвращает остаток блока таблицы (см. IdAllocator.release)."""
+    return _ALLOCATOR.release(table_name, schema)
+
+
+def unused_ids(table_name: str, schema: dict[str, Any]) -> int:
+    """Невыданный остаток блока таблицы (см. IdAllocator.unused)."""
+    return _ALLOCATOR.unused(table_name, schema)
+
+
+def tables_with_id_blocks() -> list[str]:
+    """Таблицы, у которых в этом процессе есть зарезервированный блок."""
+    return _ALLOCATOR.tables()
+
+
+def reset_id_blocks() -> None:
+    """Забывает все блоки (остатки станут пропусками в нумерации)."""
+    _ALLOCATOR.clear()
@@ -0,0 +1,233 @@
+"""Вторичные хэш-индексы по колонкам таблиц."""
+
+from __future__ import annotations
+
+import json
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from .constants import (
+    COLUMN_INDEX_FLUSH_RECORDS,
+    DATA_DIR,
+    ID_COLUMN_NAME,
+    LOG_STORAGE,
+)
+from .engine import (
+    LOG_OP_DELETE,
+    LOG_OP_PUT,
+    ensure_data_dir_exists,
+    get_table_log_path,
+    get_table_storage,
+    iter_log_lines,
+    load_table_data,
+    read_table_generation,
+    write_json_atomic,
+)
+from .locks import table_lock
+
+
+def index_key(value: object) -> str:
+    """Приводит значение к ключу индекса.
+
+    Литерал условия перед поиском приводится к типу колонки
+    (expressions.equality_literal), поэтому age=030 находит ключ "30".
+    Пустое значение и строка "None" дают один ключ: найденные строки
+    вызывающий проверяет ещё раз.
+    """
+    return str(value)
+
+
+@dataclass
+class ColumnIndex:
+    """Хэш-индекс по одной колонке: значение -> множество id.
+
+    Для jsonl-таблиц индекс, как и первичный, хранит водяную отметку
+    журнала и при обращении дочитывает только новые записи. Для
+    остальных форматов запись этого процесса правит индекс по изменённым
+    строкам (update_column_indexes), а если поколение таблицы изменил
+    кто-то другой, индекс перестраивается.
+    """
+
+    column: str
+    keys: dict[int, str] = field(default_factory=dict)
+    ids_by_key: dict[str, set[int]] = field(default_factory=dict)
+    signature: list[int] = field(default_factory=list)
+    log_size: int = 0
+    unflushed: int = 0
+
+    def put(self, row_id: int, value: object) -> None:
+        """Запоминает (новое) значение колонки для строки."""
+        key = index_key(value)
+        old_key = self.keys.get(row_id)
+        if old_key == key:
+            return
+        if old_key is not None:
+            self._discard(row_id, old_key)
+        self.keys[row_id] = key
+        self.ids_by_key.setdefault(key, set()).add(row_id)
+
+    def remove(self, row_id: int) -> None:
+        """Убирает строку из индекса."""
+        old_key = self.keys.pop(row_id, None)
+        if old_key is not None:
+            self._discard(row_id, old_key)
+
+    def lookup(self, value: object) -> set[int]:
+        """Возвращает id строк, у которых колонка равна значению."""
+        return self.ids_by_key.get(index_key(value), set())
+
+    def _discard(self, row_id: int, key: str) -> None:
+        ids = self.ids_by_key[key]
+        ids.discard(row_id)
+        if not ids:
+            del self.ids_by_key[key]
+
+
+_COLUMN_INDEXES: dict[tuple[str, str], ColumnIndex] = {}
+# Читатели в разных потоках могут одновременно догонять один индекс
+_COLUMN_INDEX_MUTEX = threading.RLock()
+
+
+def get_column_index_path(table_name: str, column: str) -> Path:
+    """Возвращает путь к файлу индекса колонки (рядом с db_meta.json)."""
+    ensure_data_dir_exists()
+    return DATA_DIR / f"{table_name}.{column}.idx.json"
+
+
+def _save_column_index(table_name: str, index: ColumnIndex) -> None:
+    """Сохраняет индекс колонки на диск."""
+    write_json_atomic(
+        get_column_index_path(table_name, index.column),
+        {
+            "signature": index.signature,
+            "log_size": index.log_size,
+            "keys": index.keys,
+        },
+    )
+    index.unflushed = 0
+
+
+def _load_column_index(table_name: str, column: str) -> ColumnIndex | None:
+    """Читает индекс колонки с диска, если файл есть."""
+    path = get_column_index_path(table_name, column)
+    if not path.exists():
+        return None
+    try:
+        with path.open("r", encoding="utf-8") as index_file:
+            data = json.load(index_file)
+    except json.JSONDecodeError:
+        return None
+
+    index = ColumnIndex(column=column, signature=data["signature"],
+                        log_size=data["log_size"])
+    for row_id, key in data["keys"].items():
+        index.keys[int(row_id)] = key
+        index.ids_by_key.setdefault(key, set()).add(int(row_id))
+    return index
+
+
+def _table_signature(table_name: str) -> list[int]:
+    """Возвращает отпечаток файла данных для проверки свежести индекса.
+
+    Для журнала это номер inode (дописывания учитываются по водяной
+    отметке), для остальных форматов — поколение таблицы на диске.
+    """
+    if get_table_storage(table_name) == LOG_STORAGE:
+        try:
+            return [get_table_log_path(table_name).stat().st_ino]
+        except FileNotFoundError:
+            return []
+    return [read_table_generation(table_name)]
+
+
+def _apply_row(index: ColumnIndex, row: dict[str, Any]) -> None:
+    index.put(row[ID_COLUMN_NAME], row.get(index.column))
+
+
+def get_column_index(table_name: str, column: str) -> ColumnIndex:
+    """Возвращает актуальный индекс колонки.
+
+    Индекс берётся из памяти или с диска и догоняет изменения таблицы,
+    сделанные после его сохранения (в том числе другими процессами).
+    Блокировка таблицы берётся раньше мьютекса индексов, в том же
+    порядке, что и у писателей, которые обновляют индексы после записи.
+    """
+    with table_lock(table_name).shared(), _COLUMN_INDEX_MUTEX:
+        signature = _table_signature(table_name)
+        index = _COLUMN_INDEXES.get((table_name, column))
+        if index is None or index.signature != signature:
+            index = _load_column_index(table_name, column)
+        if index is None or index.signature != signature:
+            index = ColumnIndex(column=column, signature=signature)
+            if get_table_storage(table_name) != LOG_STORAGE:
+                for row in load_table_data(table_name):
+                    _apply_row(index, row)
+                _save_column_index(table_name, index)
+        _COLUMN_INDEXES[(table_name, column)] = index
+
+        if get_table_storage(table_name) != LOG_STORAGE:
+            return index
+
+        for _, next_offset, record in iter_log_lines(table_name, index.log_size):
+            if record["op"] == LOG_OP_PUT:
+                _apply_row(index, record["row"])
+            elif record["op"] == LOG_OP_DELETE:
+                index.remove(record["id"])
+            index.log_size = next_offset
+            index.unflushed += 1
+        if index.unflushed >= COLUMN_INDEX_FLUSH_RECORDS:
+            _save_column_index(table_name, index)
+        return index
+
+
+def build_column_index(table_name: str, column: str) -> ColumnIndex:
+    """Строит индекс колонки с нуля и сохраняет его на диск."""
+    drop_column_indexes(table_name, [column])
+    index = get_column_index(table_name, column)
+    _save_column_index(table_name, index)
+    return index
+
+
+def refresh_column_indexes(table_name: str, columns: list[str]) -> None:
+    """Доводит индексы таблицы до актуального состояния после записи."""
+    for column in columns:
+        get_column_index(table_name, column)
+
+
+def update_column_indexes(table_name: str, columns: list[str],
+                          changed: dict[int, dict[str, Any] | None]) -> None:
+    """Обновляет индексы таблицы по строкам, изменённым записью (None — удаление).
+
+    Вызывается сразу после записи, под блокировкой записи таблицы.
+    Индекс не-jsonl таблицы, актуальный до этой записи (его поколение на
+    единицу меньше текущего), правится только в изменённых строках, без
+    чтения таблицы; jsonl-индекс, как обычно, дочитывает журнал.
+    """
+    if get_table_storage(table_name) == LOG_STORAGE:
+        refresh_column_indexes(table_name, columns)
+        return
+    with table_lock(table_name).shared(), _COLUMN_INDEX_MUTEX:
+        generation = read_table_generation(table_name)
+        for column in columns:
+            index = _COLUMN_INDEXES.get((table_name, column))
+            if index is None or index.signature != [generation - 1]:
+                get_column_index(table_name, column)
+                continue
+            for row_id, row in changed.items():
+                if row is None:
+                    index.remove(row_id)
+                else:
+                    _apply_row(index, row)
+            index.signature = [generation]
+            index.unflushed += len(changed)
+            if index.unflushed >= COLUMN_INDEX_FLUSH_RECORDS:
+                _save_column_index(table_name, index)
+
+
+def drop_column_indexes(table_name: str, columns: list[str]) -> None:
+    """Удаляет индексы колонок из памяти и с диска."""
+    for column in columns:
+        _COLUMN_INDEXES.pop((table_name, column), None)
+        get_column_index_path(table_name, column).unlink(missing_ok=True)
@@ -0,0 +1,185 @@
+"""Блокировки таблиц между процессами и между потоками.
+
+У каждой таблицы есть файл data/<table>.lock: читатели держат на нём
+разделяемую блокировку fcntl.flock, писатели — исключительную, поэтому
+несколько процессов читают таблицу параллельно, а запись ждёт, пока
+чтение закончится. flock действует на процесс целиком, поэтому потоки
+одного процесса дополнительно согласуются через RWLock.
+
+Все писатели базы, кроме того, по очереди берут блокировку записи
+(файл db_meta.json.lock): она защищает db_meta.json от потерянных
+обновлений и сохраняет порядок групп в WAL.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from collections.abc import Iterator
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+from typing import BinaryIO
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows: только блокировки потоков
+    fcntl = None  # type: ignore[assignment]
+
+from .constants import DATA_DIR, DB_META_FILE
+
+
+class RWLock:
+    """Блокировка «много читателей или один писатель» для потоков.
+
+    Поток может захватывать её повторно: читать под своей же записью и
+    перейти от чтения к записи, если других читателей нет. Ожидающий
+    писатель не пропускает вперёд новых читателей.
+    """
+
+    def __init__(self) -> None:
+        self._condition = threading.Condition()
+        self._readers: dict[int, int] = {}
+        self._writer: int | None = None
+        self._writer_depth = 0
+        self._waiting_writers = 0
+
+    def acquire_read(self) -> None:
+        me = threading.get_ident()
+        with self._condition:
+            if self._writer != me and me not in self._readers:
+                while self._writer is not None or self._waiting_writers:
+                    self._condition.wait()
+            self._readers[me] = self._readers.get(me, 0) + 1
+
+    def release_read(self) -> None:
+        me = threading.get_ident()
+        with self._condition:
+            depth = self._readers[me] - 1
+            if depth:
+                self._readers[me] = depth
+            else:
+                del self._readers[me]
+                self._condition.notify_all()
+
+    def acquire_write(self) -> None:
+        me = threading.get_ident()
+        with self._condition:
+            if self._writer == me:
+                self._writer_depth += 1
+                return
+            self._waiting_writers += 1
+            try:
+                while self._writer is not None or any(
+                    reader != me for reader in self._readers
+                ):
+                    self._condition.wait()
+            finally:
+                self._waiting_writers -= 1
+            self._writer = me
+            self._writer_depth = 1
+
+    def release_write(self) -> None:
+        with self._condition:
+            self._writer_depth -= 1
+            if not self._writer_depth:
+                self._writer = None
+                self._condition.notify_all()
+
+
+class FileLock:
+    """Разделяемая/исключительная блокировка файла для процесса и потоков."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._rw = RWLock()
+        self._mutex = threading.Lock()
+        self._file: BinaryIO | None = None
+        self._shared_holders = 0
+        self._exclusive_depth = 0
+
+    def _flock(self, operation: str) -> None:
+        """Меняет блокировку процесса: LOCK_SH, LOCK_EX или LOCK_UN."""
+        if fcntl is None:
+            return
+        if self._file is None:
+            self.path.parent.mkdir(exist_ok=True)
+            self._file = self.path.open("ab")
+        fcntl.flock(self._file.fileno(), getattr(fcntl, operation))
+
+    @contextmanager
+    def shared(self) -> Iterator[None]:
+        """Блокировка на чтение: параллельно с другими читателями."""
+        self._rw.acquire_read()
+        try:
+            with self._mutex:
+                if not self._shared_holders and not self._exclusive_depth:
+                    self._flock("LOCK_SH")
+                self._shared_holders += 1
+            try:
+                yield
+            finally:
+                with self._mutex:
+                    self._shared_holders -= 1
+                    if not self._shared_holders and not self._exclusive_depth:
+                        self._flock("LOCK_UN")
+        finally:
+            self._rw.release_read()
+
+    @contextmanager
+    def exclusive(self) -> Iterator[None]:
+        """Блокировка на запись: ждёт всех читателей и писателей."""
+        self._rw.acquire_write()
+        try:
+            with self._mutex:
+                if not self._exclusive_depth:
+                    self._flock("LOCK_EX")
+                self._exclusive_depth += 1
+            try:
+                yield
+            finally:
+                with self._mutex:
+                    self._exclusive_depth -= 1
+                    if not self._exclusive_depth:
+                        # Если поток читал до записи, возвращаем ему чтение
+                        if self._shared_holders:
+                            self._flock("LOCK_SH")
+                        else:
+                            self._flock("LOCK_UN")
+        finally:
+            self._rw.release_write()
+
+
+_FILE_LOCKS: dict[str, FileLock] = {}
+_FILE_LOCKS_MUTEX = threading.Lock()
+
+
+def _get_file_lock(path: Path) -> FileLock:
+    key = os.path.abspath(path)
+    with _FILE_LOCKS_MUTEX:
+        lock = _FILE_LOCKS.get(key)
+        if lock is None:
+            lock = _FILE_LOCKS[key] = FileLock(Path(key))
+        return lock
+
+
+def table_lock(table_name: str) -> FileLock:
+    """Блокировка таблицы (файл data/<table>.lock)."""
+    return _get_file_lock(DATA_DIR / f"{table_name}.lock")
+
+
+def database_lock() -> FileLock:
+    """Блокировка записи в базу: писатели и контрольная точка WAL."""
+    return _get_file_lock(DB_META_FILE.with_name(DB_META_FILE.name + ".lock"))
+
+
+@contextmanager
+def write_lock(*table_names: str) -> Iterator[None]:
+    """Захватывает блокировку записи в базу и таблицы на время изменения.
+
+    Таблицы блокируются в порядке имён, чтобы два писателя не ждали
+    друг друга по кругу.
+    """
+    with database_lock().exclusive(), ExitStack() as stack:
+        for table_name in sorted(set(table_names)):
+            stack.enter_context(table_lock(table_name).exclusive())
+        yield
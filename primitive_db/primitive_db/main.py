@@ -1,22 +1,49 @@
 from __future__ import annotations
 
+import argparse
 import readline
-from prettytable import PrettyTable  # type: ignore[import]
+import sys
+from collections.abc import Iterable, Sequence
 from typing import Any
-from .decorators import handle_db_errors, confirm_action, log_time
+from .decorators import handle_db_errors, confirm_action, log_time, notify
 
 from primitive_db.core import (
+    aggregate_rows,
+    analyze_table,
+    begin_transaction,
+    commit_transaction,
+    convert_table,
+    create_index,
     create_table,
     drop_table,
     list_tables,
     insert_row,
+    iter_select_rows,
+    load_table_from_file,
+    plan_select,
+    release_id_blocks,
     select_rows_cached,
+    select_rows_matching,
+    select_rows_where,
     update_row_by_id,
+    update_rows_where,
     delete_row_by_id,
+    delete_rows_where,
+    get_cache_stats,
+    in_transaction,
+    rollback_transaction,
 )
+from .metrics import dump_metrics, get_metrics, increment, measure, reset_metrics
 from .parser import parse_command, Command
-from primitive_db.utils import print_parse_error
-from primitive_db.engine import load_db_meta
+from primitive_db.utils import print_parse_error, print_rows_chunked
+from primitive_db.engine import get_table_disk_size, load_db_meta
+from primitive_db.constants import (
+    DEFAULT_STORAGE,
+    SEGMENTED_STORAGE,
+    SERVER_HOST,
+    SERVER_PORT,
+)
+from primitive_db.wal import recover, start_checkpointer, stop_checkpointer
 
 
 @handle_db_errors
@@ -37,6 +64,7 @@ def handle_create_table(command: Command | None = None) -> None:
 
         table_name = command.table
         column_types = command.columns
+        options = command.options or {}
 
     else:
         table_name = input("Введите имя таблицы: ").strip()
@@ -57,8 +85,15 @@ def handle_create_table(command: Command | None = None) -> None:
             col_name, col_type = parts
             manual_columns[col_name] = col_type
 
-    create_table(table_name, column_types)
-    print(f"Таблица {table_name!r} создана.")
+        column_types = manual_columns
+        options = {}
+
+    compression = options.get("compression")
+    # Сжатие есть только у сегментированных таблиц
+    default_storage = DEFAULT_STORAGE if compression is None else SEGMENTED_STORAGE
+    create_table(table_name, column_types,
+                 options.get("storage", default_storage), compression)
+    notify(f"Таблица {table_name!r} создана.")
 
 @handle_db_errors
 def handle_list_tables() -> None:
@@ -115,7 +150,19 @@ def handle_insert_row(command: Command | None = None) -> None:
             values[field_name] = field_value
 
     insert_row(table_name, values)
-    print(f"Строка добавлена в таблицу {table_name!r}.")
+    notify(f"Строка добавлена в таблицу {table_name!r}.")
+
+
+@handle_db_errors
+@log_time
+def handle_load_rows(command: Command) -> None:
+    """Обработка команды массовой загрузки строк из CSV/JSONL-файла."""
+    if not command.table or not command.file_path:
+        print("Ожидалось: load <table> <file>.")
+        return
+
+    count = load_table_from_file(command.table, command.file_path)
+    notify(f"Загружено строк в таблицу {command.table!r}: {count}.")
 
 
 @handle_db_errors
@@ -127,31 +174,78 @@ def handle_select_rows(command: Command) -> None:
         return
 
     table_name = command.table
-    rows, from_cache = select_rows_cached(table_name)
-
-    if command.where:
-        field_name, expected_value = next(iter(command.where.items()))
-        rows = [
-            row for row in rows
-            if str(row.get(field_name, "")) == str(expected_value)
-        ]
-
-    if not rows:
-        print(f"Нет строк, удовлетворяющих условию, \
-              в таблице {table_name!r}.")
+    if command.limit is not None or command.offset is not None:
+        # С limit/offset таблица читается потоком и не дальше нужного
+        column_names, row_dicts, source = iter_select_rows(
+            table_name, command.where, command.limit, command.offset or 0,
+            condition=command.condition)
+        rows: Iterable[tuple[object, ...]] = (
+            tuple(row.get(name) for name in column_names) for row in row_dicts
+        )
+    else:
+        if command.where:
+            field_name, expected_value = next(iter(command.where.items()))
+            table, source = select_rows_where(table_name, field_name,
+                                              expected_value)
+        elif command.condition is not None:
+            table, source = select_rows_matching(table_name, command.condition)
+        else:
+            table, from_cache = select_rows_cached(table_name)
+            if in_transaction(table_name):
+                source = "transaction"
+            else:
+                source = "cache" if from_cache else "disk"
+        column_names = table.column_names
+        # Строки собираются из колонок только здесь, при выводе
+        rows = table.iter_tuples()
+
+    with measure("render"):
+        printed = print_rows_chunked(column_names, rows)
+    if not printed:
+        notify(f"Нет строк, удовлетворяющих условию, в таблице "
+               f"{table_name!r}.")
         return
 
-    table = PrettyTable()
-    table.field_names = list(rows[0].keys())
-    for row in rows:
-        table.add_row([row[field] for field in table.field_names])
+    if source == "index":
+        notify("[строки найдены по индексу]")
+    elif source == "parallel":
+        notify("[сегменты таблицы просмотрены параллельно]")
+    elif source == "cache":
+        notify("[данные взяты из кэша]")
+    elif source == "stream":
+        notify("[данные прочитаны с диска потоком]")
+    elif source == "transaction":
+        notify("[с учётом незафиксированных изменений транзакции]")
+    else:
+        notify("[данные прочитаны с диска]")
+
 
-    print(table)
+@handle_db_errors
+@log_time
+def handle_select_aggregates(command: Command) -> None:
+    """Обработка select с агрегатными функциями и group by."""
+    assert command.table is not None and command.aggregates is not None
+    column_names, rows, source = aggregate_rows(
+        command.table, command.aggregates, command.condition, command.group_by)
+    with measure("render"):
+        printed = print_rows_chunked(column_names, rows)
+    if not printed:
+        notify(f"Нет строк, удовлетворяющих условию, в таблице "
+               f"{command.table!r}.")
+        return
 
-    if from_cache:
-        print("[данные взяты из кэша]")
+    if source == "storage":
+        notify("[число строк взято из индекса или зон сегментов таблицы]")
+    elif source == "index":
+        notify("[ответ посчитан по индексу]")
+    elif source == "parallel":
+        notify("[сегменты таблицы агрегированы параллельно]")
+    elif source == "cache":
+        notify("[данные взяты из кэша]")
+    elif source == "transaction":
+        notify("[с учётом незафиксированных изменений транзакции]")
     else:
-        print("[данные прочитаны с диска]")
+        notify("[данные прочитаны с диска потоком]")
 
 
 @handle_db_errors
@@ -166,8 +260,21 @@ def handle_update_row(command: Command | None = None) -> None:
             print("Не указано имя таблицы для update.")
             return
 
+        if command.condition is None:
+            print("Для update нужно условие после where.")
+            return
+
+        table_name = command.table
+
+        if not command.values:
+            print("Не указаны поля для обновления (после set).")
+            return
+
         if not command.where or "id" not in command.where:
-            print("Для update нужно условие вида: where id=ЧИСЛО.")
+            # Условие по другим полям или выражение — все подходящие строки
+            count = update_rows_where(table_name, command.condition,
+                                      dict(command.values))
+            notify(f"Обновлено строк в таблице {table_name!r}: {count}.")
             return
 
         try:
@@ -176,12 +283,6 @@ def handle_update_row(command: Command | None = None) -> None:
             print("ID в where должен быть целым числом.")
             return
 
-        table_name = command.table
-
-        if not command.values:
-            print("Не указаны поля для обновления (после set).")
-            return
-
         new_values: dict[str, object] = {}
         for field_name, field_value in command.values.items():
             new_values[field_name] = field_value
@@ -215,7 +316,7 @@ def handle_update_row(command: Command | None = None) -> None:
             new_values[field_name] = field_value
 
     update_row_by_id(table_name, row_id, new_values)
-    print(f"Строка с id={row_id} в таблице {table_name!r} обновлена.")
+    notify(f"Строка с id={row_id} в таблице {table_name!r} обновлена.")
 
 
 @handle_db_errors
@@ -231,8 +332,16 @@ def handle_delete_row(command: Command | None = None) -> None:
             print("Не указано имя таблицы для delete.")
             return
 
+        if command.condition is None:
+            print("Для delete нужно условие после where.")
+            return
+
+        table_name = command.table
+
         if not command.where or "id" not in command.where:
-            print("Для delete нужно условие вида: where id=ЧИСЛО.")
+            # Условие по другим полям или выражение — все подходящие строки
+            count = delete_rows_where(table_name, command.condition)
+            notify(f"Удалено строк из таблицы {table_name!r}: {count}.")
             return
 
         try:
@@ -241,8 +350,6 @@ def handle_delete_row(command: Command | None = None) -> None:
             print("ID в where должен быть целым числом.")
             return
 
-        table_name = command.table
-
     else:
         table_name = input("Введите имя таблицы: ").strip()
         row_id_str = input("Введите ID строки для удаления: ").strip()
@@ -254,7 +361,7 @@ def handle_delete_row(command: Command | None = None) -> None:
             return
 
     delete_row_by_id(table_name, row_id)
-    print(f"Строка с id={row_id} в таблице {table_name!r} удалена.")
+    notify(f"Строка с id={row_id} в таблице {table_name!r} удалена.")
 
 @handle_db_errors
 def handle_describe_table(command: Command) -> None:
@@ -274,13 +381,165 @@ def handle_describe_table(command: Command) -> None:
     for name, col_type in columns.items():
         print(f"  {name}: {col_type}")
 
+    indexes: list[str] = schema.get("indexes", [])
+    if indexes:
+        print(f"Индексы: {', '.join(indexes)}")
+
+
+@handle_db_errors
+def handle_create_index(command: Command) -> None:
+    """Обработка команды создания индекса по колонке."""
+    if not command.table or not command.column:
+        print("Ожидалось: create index <table> <column>.")
+        return
+
+    create_index(command.table, command.column)
+    notify(f"Индекс по колонке {command.column!r} "
+           f"таблицы {command.table!r} создан.")
+
 @handle_db_errors
 @confirm_action("Точно удалить таблицу? (y/n): ")
-def handle_drop_table() -> None:
-    """Обработка команды удаления таблицы."""
-    table_name = input("Введите имя таблицы для удаления: ").strip()
+def handle_drop_table(command: Command | None = None) -> None:
+    """Обработка команды удаления таблицы.
+
+    Если передан command, использует command.table. Иначе спрашивает
+    имя таблицы.
+    """
+    if command is not None and command.table:
+        table_name = command.table
+    else:
+        table_name = input("Введите имя таблицы для удаления: ").strip()
     drop_table(table_name)
-    print(f"Таблица {table_name!r} удалена (метаданные и данные).")
+    notify(f"Таблица {table_name!r} удалена (метаданные и данные).")
+
+
+@handle_db_errors
+def handle_analyze_table(command: Command) -> None:
+    """Обработка команды сбора статистики таблицы для планировщика."""
+    if not command.table:
+        print("Не указано имя таблицы для analyze.")
+        return
+
+    stats = analyze_table(command.table)
+    print(f"Статистика таблицы {command.table!r} обновлена: "
+          f"строк {stats['rows']}.")
+    for name, column_stats in stats["columns"].items():
+        line = f"  {name}: различных значений {column_stats['distinct']}"
+        if "min" in column_stats:
+            line += f", от {column_stats['min']} до {column_stats['max']}"
+        print(line)
+
+
+@handle_db_errors
+@log_time
+def handle_convert_table(command: Command) -> None:
+    """Обработка команды перевода таблицы в другой формат хранения."""
+    options = command.options or {}
+    compression = options.get("compression")
+    storage = options.get("storage")
+    if storage is None and compression is not None:
+        storage = SEGMENTED_STORAGE
+    if not command.table or storage is None:
+        print("Ожидалось: convert <table> storage=<формат> "
+              "[compression=<сжатие>]")
+        return
+
+    size_before = get_table_disk_size(command.table)
+    row_count = convert_table(command.table, storage, compression)
+    size_after = get_table_disk_size(command.table)
+    description = storage if compression is None else f"{storage}, {compression}"
+    notify(f"Таблица {command.table!r} переведена в формат {description}: "
+           f"строк {row_count}, на диске {size_before} -> {size_after} байт.")
+
+
+@handle_db_errors
+def handle_explain(command: Command) -> None:
+    """Обработка команды explain select: печатает план и оценки."""
+    if not command.table:
+        print("Не указано имя таблицы для explain.")
+        return
+
+    plan = plan_select(command.table, command.condition)
+    for line in plan.describe():
+        print(line)
+    if command.limit is not None:
+        print(f"Лимит: чтение остановится после {command.offset or 0} + "
+              f"{command.limit} подходящих строк")
+
+
+def handle_cache_stats() -> None:
+    """Обработка команды вывода статистики кэша select."""
+    stats = get_cache_stats()
+    print("Кэш select:")
+    print(f"  записей: {stats['entries']}, строк: {stats['rows']} "
+          f"из {stats['max_rows']}")
+    print(f"  объём: {stats['bytes'] / 1024:.1f} КБ "
+          f"из {stats['max_bytes'] / 1024:.1f} КБ")
+    print(f"  попаданий: {stats['hits']}, промахов: {stats['misses']}, "
+          f"доля попаданий: {stats['hit_ratio']:.1%}")
+    print(f"  вытеснений: {stats['evictions']}, сбросов из-за записи "
+          f"другим процессом: {stats['remote_invalidations']}")
+    print(f"Кэш метаданных: попаданий {stats['meta_hits']}, "
+          f"промахов {stats['meta_misses']}")
+
+
+@handle_db_errors
+def handle_stats(command: Command) -> None:
+    """Обработка команды stats: вывод метрик или их сохранение в файл."""
+    if command.file_path:
+        dump_metrics(command.file_path)
+        notify(f"Метрики сохранены в {command.file_path!r}.")
+        return
+
+    metrics = get_metrics()
+    if not metrics["counters"] and not metrics["histograms"]:
+        print("Метрик пока нет.")
+        return
+    if metrics["counters"]:
+        print("Счётчики: " + ", ".join(
+            f"{name} {value}" for name, value in metrics["counters"].items()))
+    rows = [
+        (name, histogram["count"], f"{histogram['sum_seconds'] * 1000:.3f}",
+         f"{histogram['sum_seconds'] * 1000 / histogram['count']:.3f}",
+         f"{histogram['p50_seconds'] * 1000:.3f}",
+         f"{histogram['p99_seconds'] * 1000:.3f}",
+         f"{histogram['max_seconds'] * 1000:.3f}")
+        for name, histogram in metrics["histograms"].items()
+    ]
+    print_rows_chunked(["фаза", "замеров", "всего, мс", "среднее, мс",
+                        "p50 ≤, мс", "p99 ≤, мс", "макс, мс"], rows)
+
+
+def handle_stats_reset() -> None:
+    """Обработка команды сброса метрик."""
+    reset_metrics()
+    notify("Метрики сброшены.")
+
+
+@handle_db_errors
+def handle_begin() -> None:
+    """Обработка команды начала транзакции."""
+    begin_transaction()
+    notify("Транзакция начата. Изменения будут записаны по commit.")
+
+
+@handle_db_errors
+@log_time
+def handle_commit() -> None:
+    """Обработка команды фиксации транзакции."""
+    tables = commit_transaction()
+    if tables:
+        notify(f"Транзакция зафиксирована, записаны таблицы: "
+               f"{', '.join(tables)}.")
+    else:
+        notify("Транзакция зафиксирована (изменений не было).")
+
+
+@handle_db_errors
+def handle_rollback() -> None:
+    """Обработка команды отката транзакции."""
+    rollback_transaction()
+    notify("Транзакция отменена.")
 
 
 def print_help() -> None:
@@ -294,18 +553,63 @@ def print_help() -> None:
     print("  create <table> col:type ...")
     print("      Создать таблицу с указанными колонками и типами.")
     print("      Пример: create users id:int name:str age:int")
+    print("  create <table> col:type ... storage=json|jsonl|binary|segmented")
+    print("      Создать таблицу в заданном формате хранения "
+          "(по умолчанию jsonl).")
+    print("  create <table> col:type ... compression=zlib|lzma")
+    print("      Создать сегментированную таблицу со сжатыми сегментами.")
+    print("  convert <table> storage=<формат> [compression=zlib|lzma|none]")
+    print("      Перевести существующую таблицу в другой формат хранения.")
+    print("      Пример: convert logs storage=segmented compression=zlib")
+    print("  create index <table> <column>")
+    print("      Создать хэш-индекс по колонке (ускоряет select ... where).")
+    print("      Пример: create index users age")
     print("  insert <table> field=value ...")
     print("      Добавить строку в таблицу.")
     print("      Пример: insert users name=Alice age=30")
+    print("  load <table> <file>")
+    print("      Загрузить строки из CSV (с заголовком) или JSONL-файла.")
+    print("      Пример: load users users.csv")
     print("  select <table>")
     print("      Показать все строки таблицы (с кэшем).")
     print("      Пример: select users")
-    print("  update <table> set field=value ... where id=VALUE")
-    print("      Обновить строку по id.")
+    print("  select <table> [where field=value] limit N [offset M]")
+    print("      Показать не больше N строк, пропустив первые M (читает таблицу")
+    print("      потоком и останавливается, набрав нужные строки).")
+    print("      Пример: select users where age=30 limit 10 offset 20")
+    print("  select <table> where <условие>")
+    print("      Условие: =, !=, <, <=, >, >=, in (...), and, or, not, скобки.")
+    print("      Пример: select users where age>=18 and city in (Moscow, Kazan)")
+    print("  select <func>(<col>|*), ... from <table> [where <условие>] "
+          "[group by <col>]")
+    print("      Агрегаты count, sum, min, max, avg за один проход по таблице;")
+    print("      count(*) без условия считается по формату хранения (индекс")
+    print("      jsonl, зонные карты сегментов), иначе — просмотром таблицы.")
+    print("      Пример: select city, count(*), avg(age) from users "
+          "group by city")
+    print("  explain select <table> [where <условие>]")
+    print("      Показать план select (просмотр, id, индекс, диапазон id)")
+    print("      и оценку числа строк, не выполняя запрос.")
+    print("      Пример: explain select users where id>100 and age=30")
+    print("  analyze <table>")
+    print("      Собрать статистику таблицы (строки, различные значения)")
+    print("      для планировщика.")
+    print("  cache stats")
+    print("      Показать статистику кэша select (попадания, вытеснения, объём).")
+    print("  stats [reset | save <file>]")
+    print("      Показать счётчики и задержки по фазам (разбор, метаданные,")
+    print("      чтение, фильтр, вывод, запись), сбросить их или сохранить")
+    print("      в файл (Prometheus; JSON для *.json).")
+    print("  update <table> set field=value ... where <условие>")
+    print("      Обновить строку по id или все строки, подходящие под условие.")
     print("      Пример: update users set age=31 where id=1")
-    print("  delete <table> where id=VALUE")
-    print("      Удалить строку по id (с подтверждением).")
-    print("      Пример: delete users where id=1")
+    print("  delete <table> where <условие>")
+    print("      Удалить строки по условию (с подтверждением).")
+    print("      Пример: delete users where age<18 or name=Bob")
+    print("  begin / commit / rollback")
+    print("      Начать транзакцию, записать все её изменения одним проходом")
+    print("      или отменить их. Внутри транзакции недоступны create,")
+    print("      create index и drop.")
     print("  drop <table>")
     print("      Удалить таблицу целиком (с подтверждением).")
     print("      Пример: drop users")
@@ -325,40 +629,163 @@ def dispatch_command(command: Command) -> None:
         handle_list_tables()
     elif command.cmd_type == "create":
         handle_create_table(command)
+    elif command.cmd_type == "create_index":
+        handle_create_index(command)
     elif command.cmd_type == "insert":
         handle_insert_row(command)
+    elif command.cmd_type == "load":
+        handle_load_rows(command)
+    elif command.cmd_type == "select" and command.aggregates:
+        handle_select_aggregates(command)
     elif command.cmd_type == "select":
         handle_select_rows(command)
+    elif command.cmd_type == "cache_stats":
+        handle_cache_stats()
+    elif command.cmd_type == "stats":
+        handle_stats(command)
+    elif command.cmd_type == "stats_reset":
+        handle_stats_reset()
+    elif command.cmd_type == "analyze":
+        handle_analyze_table(command)
+    elif command.cmd_type == "convert":
+        handle_convert_table(command)
+    elif command.cmd_type == "explain":
+        handle_explain(command)
     elif command.cmd_type == "update":
         handle_update_row(command)
     elif command.cmd_type == "delete":
         handle_delete_row(command)
     elif command.cmd_type == "drop":
-        handle_drop_table()
+        handle_drop_table(command)
+    elif command.cmd_type == "begin":
+        handle_begin()
+    elif command.cmd_type == "commit":
+        handle_commit()
+    elif command.cmd_type == "rollback":
+        handle_rollback()
     else:
         print(f"Неизвестный тип команды: {command.cmd_type!r}")
 
 
-def main() -> None:
-    """Точка входа в CLI интерфейс базы данных."""
-    print("Введите 'help' для списка доступных команд.")
-    while True:
-        line = input(">>> ").strip()
-        if not line:
-            continue
+def abandon_transaction() -> None:
+    """Отменяет незафиксированную транзакцию, предупредив об этом."""
+    if in_transaction():
+        rollback_transaction()
+        print("Незафиксированная транзакция отменена.")
 
-        try:
+
+def execute_line(line: str) -> bool:
+    """Разбирает и выполняет одну строку команды.
+
+    Возвращает False, если это была команда exit. Используется и
+    консолью, и сетевым сервером.
+    """
+    increment("commands")
+    try:
+        with measure("parse"):
             command = parse_command(line)
-        except ValueError as exc:
-            print_parse_error(str(exc))
-            print("Введите 'help' для списка доступных команд.")
-            continue
+    except ValueError as exc:
+        increment("parse_errors")
+        print_parse_error(str(exc))
+        notify("Введите 'help' для списка доступных команд.")
+        return True
+
+    if command.cmd_type == "exit":
+        abandon_transaction()
+        notify("Выход.")
+        return False
+
+    with measure(f"command.{command.cmd_type}"):
+        dispatch_command(command)
+    return True
 
-        if command.cmd_type == "exit":
-            print("Выход.")
+
+def run_console() -> None:
+    """Цикл чтения и выполнения команд."""
+    print("Введите 'help' для списка доступных команд.")
+    while True:
+        line = input(">>> ").strip()
+        if line and not execute_line(line):
             break
 
-        dispatch_command(command)
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    """Аргументы командной строки: без них запускается консоль."""
+    arg_parser = argparse.ArgumentParser(
+        prog="project", description="Примитивная файловая база данных.")
+    batch_group = arg_parser.add_mutually_exclusive_group()
+    batch_group.add_argument(
+        "-f", "--file", metavar="SCRIPT",
+        help="выполнить команды из файла, по одной на строку "
+             "('-' — из stdin), и выйти")
+    batch_group.add_argument(
+        "-c", "--command", metavar="COMMANDS",
+        help="выполнить команды, разделённые ';', и выйти")
+    arg_parser.add_argument(
+        "--metrics", metavar="FILE",
+        help="при выходе сохранить метрики в файл (Prometheus; JSON для *.json)")
+    subparsers = arg_parser.add_subparsers(dest="mode")
+    serve_parser = subparsers.add_parser(
+        "serve", help="принимать команды по сети (TCP, построчно)")
+    serve_parser.add_argument("--host", default=SERVER_HOST,
+                              help=f"адрес (по умолчанию {SERVER_HOST})")
+    serve_parser.add_argument("--port", type=int, default=SERVER_PORT,
+                              help=f"порт (по умолчанию {SERVER_PORT})")
+    return arg_parser
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    """Точка входа в CLI интерфейс базы данных."""
+    arg_parser = build_arg_parser()
+    args = arg_parser.parse_args(argv)
+    script: str | None = args.command
+    if args.mode == "serve" and (args.file or args.command):
+        arg_parser.error("serve нельзя совмещать с -f/-c")
+    if args.file == "-":
+        script = sys.stdin.read()
+    elif args.file:
+        try:
+            with open(args.file, encoding="utf-8") as script_file:
+                script = script_file.read()
+        except OSError as exc:
+            arg_parser.error(f"не удалось прочитать {args.file}: {exc}")
+
+    recovered = recover()
+    if recovered:
+        print(f"Восстановлено изменений из журнала (WAL): {recovered}.",
+              file=sys.stderr)
+    start_checkpointer()
+    try:
+        if args.mode == "serve":
+            # Импорт здесь: server сам импортирует main ради execute_line
+            from primitive_db.server import serve
+
+            serve(args.host, args.port)
+        elif script is not None:
+            # Импорт здесь: batch сам импортирует main ради execute_line
+            from primitive_db.batch import (
+                STATEMENT_SEPARATOR,
+                run_batch,
+                split_statements,
+            )
+
+            # Файл, как и консоль, читается по команде на строку
+            separator = None if args.file else STATEMENT_SEPARATOR
+            report = run_batch(split_statements(script, separator))
+            print(report.format(), file=sys.stderr)
+        else:
+            run_console()
+    finally:
+        try:
+            release_id_blocks()
+        except (OSError, ValueError) as exc:
+            print(f"Ошибка: {exc}", file=sys.stderr)
+        stop_checkpointer()
+        if args.metrics:
+            try:
+                dump_metrics(args.metrics)
+            except ValueError as exc:
+                print(f"Ошибка: {exc}", file=sys.stderr)
 
 
 if __name__ == "__main__":
@@ -369,5 +796,4 @@ if __name__ == "__main__":
     else:
         readline.parse_and_bind("tab: complete")
 
-    print("Введите 'help' для списка доступных команд.")
     main()
\ No newline at end of file
@@ -0,0 +1,221 @@
+"""Метрики: счётчики и гистограммы задержек по фазам выполнения команд.
+
+Фазы замеряются через measure(name) (time.perf_counter_ns) в core, engine
+и main:
+
+    parse       — разбор строки команды;
+    meta_load   — чтение метаданных: каталога и схем таблиц (с кэшем);
+    meta_save   — запись метаданных;
+    table_load  — чтение всех строк таблицы;
+    filter      — проверка условия where по строкам;
+    aggregate   — чтение строк и подсчёт агрегатов select;
+    render      — вывод результата select (для select с limit сюда
+                  входит и потоковое чтение строк);
+    save        — запись строк таблицы (целиком или точечно);
+    command.<тип>  — команда целиком (execute_line);
+    handler.<функция> — обработчик команды с log_time.
+
+Гистограммы хранят число замеров, сумму, максимум и накопленные счётчики
+по границам METRICS_LATENCY_BUCKETS. Команда stats показывает их вместе
+со счётчиками, а stats save <файл> сохраняет в формате Prometheus (или
+JSON, если имя файла оканчивается на .json).
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+from bisect import bisect_left
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from pathlib import Path
+from typing import Any, TypeVar
+
+from .constants import METRICS_LATENCY_BUCKETS, METRICS_PREFIX
+
+_NS_PER_SECOND = 1_000_000_000
+
+_F = TypeVar("_F", bound=Callable[..., Any])
+
+# Фазы, замер которых уже идёт в этом потоке (или задаче asyncio)
+_ACTIVE_PHASES: ContextVar[frozenset[str]] = ContextVar(
+    "active_phases", default=frozenset())
+
+
+class Histogram:
+    """Распределение задержек по фиксированным границам (в секундах)."""
+
+    __slots__ = ("bucket_counts", "count", "max_ns", "total_ns")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        # Последний счётчик — значения больше всех границ (+Inf)
+        self.bucket_counts = [0] * (len(METRICS_LATENCY_BUCKETS) + 1)
+
+    def observe(self, duration_ns: int) -> None:
+        self.count += 1
+        self.total_ns += duration_ns
+        self.max_ns = max(self.max_ns, duration_ns)
+        index = bisect_left(METRICS_LATENCY_BUCKETS,
+                            duration_ns / _NS_PER_SECOND)
+        self.bucket_counts[index] += 1
+
+    def quantile(self, fraction: float) -> float:
+        """Оценка квантиля сверху: граница корзины, где он находится."""
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip(METRICS_LATENCY_BUCKETS, self.bucket_counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max_ns / _NS_PER_SECOND)
+        return self.max_ns / _NS_PER_SECOND
+
+    def to_dict(self) -> dict[str, Any]:
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(METRICS_LATENCY_BUCKETS, self.bucket_counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        buckets["+Inf"] = self.count
+        return {
+            "count": self.count,
+            "sum_seconds": self.total_ns / _NS_PER_SECOND,
+            "max_seconds": self.max_ns / _NS_PER_SECOND,
+            "p50_seconds": self.quantile(0.5),
+            "p99_seconds": self.quantile(0.99),
+            "buckets": buckets,
+        }
+
+
+class MetricsRegistry:
+    """Именованные счётчики и гистограммы; безопасен для потоков сервера."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counters: dict[str, int] = {}
+        self._histograms: dict[str, Histogram] = {}
+
+    def increment(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def observe_ns(self, name: str, duration_ns: int) -> None:
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.observe(duration_ns)
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "counters": dict(sorted(self._counters.items())),
+                "histograms": {name: histogram.to_dict() for name, histogram
+                               in sorted(self._histograms.items())},
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+_REGISTRY = MetricsRegistry()
+
+
+def increment(name: str, amount: int = 1) -> None:
+    """Увеличивает счётчик name."""
+    _REGISTRY.increment(name, amount)
+
+
+def observe_ns(name: str, duration_ns: int) -> None:
+    """Добавляет замер длительности (в наносекундах) в гистограмму name."""
+    _REGISTRY.observe_ns(name, duration_ns)
+
+
+@contextmanager
+def measure(name: str) -> Iterator[None]:
+    """Замеряет время выполнения блока with в гистограмму name.
+
+    Вложенный замер той же фазы (save_table_data внутри replace_table_row)
+    не учитывается второй раз: время уже входит во внешний замер.
+    """
+    active = _ACTIVE_PHASES.get()
+    if name in active:
+        yield
+        return
+    token = _ACTIVE_PHASES.set(active | {name})
+    started = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        _REGISTRY.observe_ns(name, time.perf_counter_ns() - started)
+        _ACTIVE_PHASES.reset(token)
+
+
+def timed(name: str) -> Callable[[_F], _F]:
+    """Декоратор: каждый вызов функции замеряется как фаза name."""
+
+    def decorator(func: _F) -> _F:
+        @wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with measure(name):
+                return func(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
+
+
+def get_metrics() -> dict[str, Any]:
+    """Снимок всех счётчиков и гистограмм."""
+    return _REGISTRY.snapshot()
+
+
+def reset_metrics() -> None:
+    _REGISTRY.reset()
+
+
+def _metric_name(name: str) -> str:
+    return METRICS_PREFIX + "".join(
+        char if char.isalnum() else "_" for char in name)
+
+
+def format_prometheus(metrics: dict[str, Any] | None = None) -> str:
+    """Метрики в текстовом формате Prometheus."""
+    if metrics is None:
+        metrics = get_metrics()
+    lines = []
+    for name, value in metrics["counters"].items():
+        metric = _metric_name(name) + "_total"
+        lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+    for name, histogram in metrics["histograms"].items():
+        metric = _metric_name(name) + "_seconds"
+        lines.append(f"# TYPE {metric} histogram")
+        for bound, count in histogram["buckets"].items():
+            lines.append(f'{metric}_bucket{{le="{bound}"}} {count}')
+        lines += [f"{metric}_sum {histogram['sum_seconds']}",
+                  f"{metric}_count {histogram['count']}"]
+    return "\n".join(lines) + "\n"
+
+
+def dump_metrics(file_path: str | Path) -> None:
+    """Сохраняет метрики в файл: JSON для *.json, иначе Prometheus."""
+    path = Path(file_path)
+    metrics = get_metrics()
+    if path.suffix.lower() == ".json":
+        text = json.dumps(metrics, ensure_ascii=False, indent=2) + "\n"
+    else:
+        text = format_prometheus(metrics)
+    try:
+        path.write_text(text, encoding="utf-8")
+    except OSError as exc:
+        raise ValueError(f"Не удалось записать метрики в {str(path)!r}: "
+                         f"{exc}") from None
@@ -1,11 +1,19 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Literal, Any
+import re
+from dataclasses import dataclass, replace
+from typing import Literal, Any, cast
+
+from .constants import AGGREGATE_FUNCTIONS
+
+from .expressions import Comparison, Expression, parse_where
 
 
 CommandType = Literal["create", "insert", "select", "update", "delete",
-                      "drop", "list", "exit", "help", "describe"]
+                      "drop", "list", "exit", "help", "describe",
+                      "create_index", "load", "cache_stats",
+                      "begin", "commit", "rollback", "analyze", "explain",
+                      "convert", "stats", "stats_reset"]
 
 
 @dataclass
@@ -15,6 +23,114 @@ class Command:
     columns: dict[str, str] | None = None  # только для create
     values: dict[str, Any] | None = None  # insert/update
     where: dict[str, Any] | None = None  # простейший where по одному полю
+    condition: Expression | None = None  # where-выражение целиком
+    options: dict[str, str] | None = None  # create/convert: storage=, compression=
+    column: str | None = None  # только для create index
+    file_path: str | None = None  # load и stats save
+    limit: int | None = None  # select ... limit N
+    offset: int | None = None  # select ... offset M
+    aggregates: list[tuple[str, str]] | None = None  # (функция, колонка или *)
+    group_by: str | None = None  # select ... group by колонка
+
+
+# count(*), sum(age), ...
+_AGGREGATE_RE = re.compile(r"(\w+)\(\s*([^()\s]+)\s*\)")
+
+
+# Параметры таблицы в create и convert: storage=..., compression=...
+_TABLE_OPTIONS = ("storage", "compression")
+
+
+def _parse_table_option(token: str, options: dict[str, str]) -> None:
+    option, option_value = token.split("=", maxsplit=1)
+    if option not in _TABLE_OPTIONS or not option_value:
+        raise ValueError(f"Некорректный параметр таблицы: {token!r}")
+    options[option] = option_value
+
+
+def _parse_count_option(tokens: list[str], keyword: str) -> int | None:
+    """Разбирает «keyword N» (limit/offset) с неотрицательным целым N."""
+    if keyword not in tokens:
+        return None
+    keyword_index = tokens.index(keyword)
+    if keyword_index + 1 >= len(tokens):
+        raise ValueError(f"После {keyword!r} ожидается число")
+    raw_value = tokens[keyword_index + 1]
+    if not raw_value.isdigit():
+        raise ValueError(f"После {keyword!r} ожидается неотрицательное "
+                         f"целое число, получено {raw_value!r}")
+    return int(raw_value)
+
+
+def _parse_where_clause(
+    tokens: list[str], end_keywords: tuple[str, ...] = (),
+) -> tuple[dict[str, Any] | None, Expression]:
+    """Разбирает условие после where до конца или до end_keywords.
+
+    Возвращает словарь {поле: значение}, если условие — одно равенство
+    поле=значение (для него есть быстрые пути через индексы), и дерево
+    выражения.
+    """
+    where_index = tokens.index("where")
+    clause_tokens = tokens[where_index + 1:]
+    for position, token in enumerate(clause_tokens):
+        if token in end_keywords:
+            clause_tokens = clause_tokens[:position]
+            break
+    if not clause_tokens:
+        raise ValueError("После 'where' ожидается условие вида поле=значение")
+
+    if len(clause_tokens) == 1 and "=" in clause_tokens[0]:
+        field, value = clause_tokens[0].split("=", maxsplit=1)
+        if field and field[-1] not in "!<>":
+            return {field: value}, Comparison(field, "=", value)
+        if not field:
+            raise ValueError("Имя поля в where не может быть пустым")
+    return None, parse_where(" ".join(clause_tokens))
+
+
+def _parse_aggregate_select(tokens: list[str], from_index: int) -> Command:
+    """Разбирает select count(*), sum(col) from <table> [where ...] [group by col]."""
+    if from_index + 1 >= len(tokens):
+        raise ValueError("Ожидалось имя таблицы после 'from'")
+    table = tokens[from_index + 1]
+    rest = tokens[from_index + 2:]
+
+    group_by: str | None = None
+    if "group" in rest:
+        group_index = rest.index("group")
+        if rest[group_index + 1:group_index + 2] != ["by"] or \
+                len(rest) != group_index + 3:
+            raise ValueError("Ожидалось: group by <колонка> в конце команды")
+        group_by = rest[group_index + 2]
+        rest = rest[:group_index]
+
+    condition: Expression | None = None
+    if rest:
+        if rest[0] != "where":
+            raise ValueError(f"Неожиданное {rest[0]!r} после имени таблицы")
+        _, condition = _parse_where_clause(rest)
+
+    aggregates: list[tuple[str, str]] = []
+    for item in " ".join(tokens[1:from_index]).split(","):
+        item = item.strip()
+        if group_by is not None and item == group_by:
+            continue  # колонка группировки выводится всегда
+        match = _AGGREGATE_RE.fullmatch(item)
+        if match is None:
+            raise ValueError(f"Ожидалась агрегатная функция вида count(*) "
+                             f"или sum(колонка), получено {item!r}")
+        function, column = match.group(1).lower(), match.group(2)
+        if function not in AGGREGATE_FUNCTIONS:
+            raise ValueError(f"Неизвестная агрегатная функция {function!r}")
+        if column == "*" and function != "count":
+            raise ValueError(f"{function}(*) не поддерживается, "
+                             "укажите колонку")
+        aggregates.append((function, column))
+    if not aggregates:
+        raise ValueError("Нужна хотя бы одна агрегатная функция")
+    return Command(cmd_type="select", table=table, condition=condition,
+                   aggregates=aggregates, group_by=group_by)
 
 
 def parse_command(line: str) -> Command:
@@ -39,12 +155,71 @@ def parse_command(line: str) -> Command:
     if cmd == "exit":
         return Command(cmd_type="exit")
 
+    if cmd in ("begin", "commit", "rollback"):
+        if len(tokens) != 1:
+            raise ValueError(f"Команда {cmd!r} не принимает аргументов")
+        return Command(cmd_type=cast(CommandType, cmd))
+
+    if cmd == "analyze":
+        if len(tokens) != 2:
+            raise ValueError("Ожидалось: analyze <table>")
+        return Command(cmd_type="analyze", table=tokens[1])
+
+    if cmd == "explain":
+        # explain select users where age>30
+        if len(tokens) < 2 or tokens[1].lower() != "select":
+            raise ValueError("Ожидалось: explain select ...")
+        select = parse_command(line.strip()[len(tokens[0]):])
+        return replace(select, cmd_type="explain")
+
     if cmd == "describe":
         if len(tokens) < 2:
             raise ValueError("Ожидалось имя таблицы после 'describe'")
         table = tokens[1]
         return Command(cmd_type="describe", table=table)
 
+    if cmd == "create" and len(tokens) > 1 and tokens[1].lower() == "index":
+        # create index users age
+        if len(tokens) != 4:
+            raise ValueError("Ожидалось: create index <table> <column>")
+        return Command(cmd_type="create_index", table=tokens[2],
+                       column=tokens[3])
+
+    if cmd == "cache":
+        if len(tokens) != 2 or tokens[1].lower() != "stats":
+            raise ValueError("Ожидалось: cache stats")
+        return Command(cmd_type="cache_stats")
+
+    if cmd == "stats":
+        # stats, stats reset, stats save metrics.prom
+        if len(tokens) == 1:
+            return Command(cmd_type="stats")
+        action = tokens[1].lower()
+        if action == "reset" and len(tokens) == 2:
+            return Command(cmd_type="stats_reset")
+        if action == "save" and len(tokens) == 3:
+            return Command(cmd_type="stats", file_path=tokens[2])
+        raise ValueError("Ожидалось: stats, stats reset или stats save <file>")
+
+    if cmd == "convert":
+        # convert users storage=segmented compression=zlib
+        if len(tokens) < 3:
+            raise ValueError("Ожидалось: convert <table> storage=<формат> "
+                             "[compression=<сжатие>]")
+        convert_options: dict[str, str] = {}
+        for token in tokens[2:]:
+            if "=" not in token:
+                raise ValueError(f"Некорректный параметр таблицы: {token!r}")
+            _parse_table_option(token, convert_options)
+        return Command(cmd_type="convert", table=tokens[1],
+                       options=convert_options)
+
+    if cmd == "load":
+        # load users users.csv
+        if len(tokens) != 3:
+            raise ValueError("Ожидалось: load <table> <file>")
+        return Command(cmd_type="load", table=tokens[1], file_path=tokens[2])
+
     if cmd in ("create", "insert", "select", "update", "delete", "drop"):
         if len(tokens) < 2:
             raise ValueError(f"Ожидалось имя таблицы после {cmd!r}")
@@ -54,14 +229,21 @@ def parse_command(line: str) -> Command:
         if len(tokens) == 2:
             raise ValueError("Нужно указать хотя бы одну колонку: name:type")
         columns: dict[str, str] = {}
+        options: dict[str, str] = {}
         for token in tokens[2:]:
+            if "=" in token and ":" not in token:
+                _parse_table_option(token, options)
+                continue
             if ":" not in token:
                 raise ValueError(f"Ожидалось имя_колонки:тип, получено {token!r}")
             name, type_name = token.split(":", maxsplit=1)
             if not name or not type_name:
                 raise ValueError(f"Некорректное описание колонки: {token!r}")
             columns[name] = type_name
-        return Command(cmd_type="create", table=table, columns=columns)
+        if not columns:
+            raise ValueError("Нужно указать хотя бы одну колонку: name:type")
+        return Command(cmd_type="create", table=table, columns=columns,
+                       options=options or None)
 
     if cmd == "insert":
         if len(tokens) == 2:
@@ -76,22 +258,24 @@ def parse_command(line: str) -> Command:
             insert_values[name] = val
         return Command(cmd_type="insert", table=table, values=insert_values)
 
+    if cmd == "select" and "from" in tokens[2:]:
+        # select count(*), avg(age) from users where age>18 group by city
+        from_index = tokens.index("from")
+        if "where" not in tokens or from_index < tokens.index("where"):
+            return _parse_aggregate_select(tokens, from_index)
+
     if cmd == "select":
         # select users
         # select users where age=30
+        # select users where age>30 and name!=Bob
         where: dict[str, Any] | None = None
+        condition: Expression | None = None
         if "where" in tokens:
-            where_index = tokens.index("where")
-            if where_index + 1 >= len(tokens):
-                raise ValueError("После 'where' ожидается условие вида поле=значение")
-            where_token = tokens[where_index + 1]
-            if "=" not in where_token:
-                raise ValueError(f"Некорректное условие после where: {where_token!r}")
-            field, value = where_token.split("=", maxsplit=1)
-            if not field:
-                raise ValueError("Имя поля в where не может быть пустым")
-            where = {field: value}
-        return Command(cmd_type="select", table=table, where=where)
+            where, condition = _parse_where_clause(tokens, ("limit", "offset"))
+        limit = _parse_count_option(tokens, "limit")
+        offset = _parse_count_option(tokens, "offset")
+        return Command(cmd_type="select", table=table, where=where,
+                       condition=condition, limit=limit, offset=offset)
 
     if cmd == "drop":
         return Command(cmd_type="drop", table=table)
@@ -100,15 +284,7 @@ def parse_command(line: str) -> Command:
         if "where" not in tokens:
             raise ValueError("Ожидалось ключевое слово 'where'")
         where_index = tokens.index("where")
-        if where_index + 1 >= len(tokens):
-            raise ValueError("После 'where' ожидается условие вида поле=значение")
-        where_token = tokens[where_index + 1]
-        if "=" not in where_token:
-            raise ValueError(f"Некорректное условие после where: {where_token!r}")
-        field, value = where_token.split("=", maxsplit=1)
-        if not field:
-            raise ValueError("Имя поля в where не может быть пустым")
-        where = {field: value}
+        where, condition = _parse_where_clause(tokens)
 
         if cmd == "update":
             if "set" not in tokens:
@@ -127,8 +303,10 @@ def parse_command(line: str) -> Command:
                     raise ValueError(f"Пустое имя поля в set-токене {token!r}")
                 update_values[name] = val
             return Command(cmd_type="update", table=table, 
-                           values=update_values, where=where)
+                           values=update_values, where=where,
+                           condition=condition)
 
-        return Command(cmd_type="delete", table=table, where=where)
+        return Command(cmd_type="delete", table=table, where=where,
+                       condition=condition)
 
     raise ValueError(f"Неизвестная команда: {cmd!r}")
\ No newline at end of file
@@ -0,0 +1,280 @@
+"""Планировщик запросов: как выполнить select с условием.
+
+Для условия where планировщик рассматривает способы доступа к строкам:
+
+    full_scan    — полный просмотр таблицы;
+    pk_lookup    — чтение строк по id (id=N, id in (...));
+    index_lookup — хэш-индекс по колонке (поле=значение, поле in (...));
+    range_scan   — диапазон id (id>N, id<=M).
+
+Лучшим считается способ с наименьшей оценкой стоимости: просмотр стоит
+1 за строку, чтение строки по id — PLANNER_LOOKUP_COST. json-таблица
+читает строки по id одним разбором файла: он стоит PLANNER_JSON_PARSE_COST
+от просмотра, и к нему добавляется 1 за каждую выбранную строку. Число строк
+оценивается по статистике в схеме таблицы (собирается командой
+analyze): числу строк, числу различных значений и min/max int-колонок.
+Без статистики число строк берётся по next_id (без невыданного остатка
+блока id, см. ids.py), а доля подходящих строк — по константам
+PLANNER_*_SELECTIVITY.
+
+Способ доступа только выбирает строки-кандидаты: условие целиком всё
+равно проверяется на каждой из них. Для сегментированной таблицы полный
+просмотр читает только сегменты, не исключённые зонными картами, и его
+стоимость уменьшается в той же доле (scan_fraction).
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any
+
+from .constants import (
+    ID_COLUMN_NAME,
+    JSON_STORAGE,
+    PLANNER_EQUALITY_SELECTIVITY,
+    PLANNER_JSON_PARSE_COST,
+    PLANNER_LOOKUP_COST,
+    PLANNER_RANGE_SELECTIVITY,
+    SEGMENT_ROWS,
+    SEGMENTED_STORAGE,
+)
+from .expressions import (
+    And,
+    Comparison,
+    Expression,
+    InList,
+    Not,
+    Or,
+    format_expression,
+    iter_conjuncts,
+)
+
+ACCESS_FULL_SCAN = "full_scan"
+ACCESS_PK_LOOKUP = "pk_lookup"
+ACCESS_INDEX_LOOKUP = "index_lookup"
+ACCESS_RANGE_SCAN = "range_scan"
+
+_RANGE_OPERATORS = ("<", "<=", ">", ">=")
+
+
+@dataclass
+class QueryPlan:
+    """Выбранный способ выполнения select и оценки для explain."""
+
+    table: str
+    access: str
+    condition: Expression | None = None
+    column: str | None = None  # колонка индекса (index_lookup)
+    keys: tuple[str, ...] = ()  # значения для pk_lookup/index_lookup
+    low: int | None = None  # границы id для range_scan (включительно)
+    high: int | None = None
+    table_rows: float = 0.0
+    fetched_rows: float = 0.0  # сколько строк будет прочитано
+    estimated_rows: float = 0.0  # сколько из них подойдёт под условие
+    cost: float = 0.0
+    scan_cost: float = 0.0
+    has_stats: bool = False
+    segments: tuple[int, int] | None = None  # (прочитать, всего) сегментов
+
+    def describe(self) -> list[str]:
+        """Строки вывода explain."""
+        if self.has_stats:
+            stats_note = "по статистике analyze"
+        else:
+            stats_note = "статистики нет, оценка по next_id"
+        if self.access == ACCESS_PK_LOOKUP:
+            access = f"чтение по первичному ключу id: {', '.join(self.keys)}"
+        elif self.access == ACCESS_INDEX_LOOKUP:
+            access = (f"хэш-индекс по колонке {self.column}: "
+                      f"{', '.join(self.keys)}")
+        elif self.access == ACCESS_RANGE_SCAN:
+            access = f"диапазон id от {self.low} до {self.high}"
+        else:
+            access = "полный просмотр таблицы"
+        condition = ("нет" if self.condition is None
+                     else format_expression(self.condition))
+        return [
+            f"Таблица: {self.table} (~{self.table_rows:.0f} строк, {stats_note})",
+            f"Доступ: {self.access} — {access}",
+            f"Условие: {condition}",
+            *self._describe_segments(),
+            (f"Оценка строк: прочитать ~{self.fetched_rows:.0f}, "
+             f"в результате ~{self.estimated_rows:.0f}"),
+            f"Стоимость: {self.cost:.1f} (полный просмотр — {self.scan_cost:.1f})",
+        ]
+
+    def _describe_segments(self) -> list[str]:
+        if self.segments is None or self.access != ACCESS_FULL_SCAN:
+            return []
+        read, total = self.segments
+        line = f"Сегменты: прочитать {read} из {total}"
+        if read < total:
+            line += " (остальные исключены зонными картами)"
+        return [line]
+
+
+def estimate_table_rows(schema: dict[str, Any]) -> float:
+    """Оценка числа строк: статистика плюс вставки после неё."""
+    next_id: int = schema.get("next_id", 1)
+    stats = schema.get("stats")
+    if not stats:
+        return float(max(next_id - 1, 0))
+    inserted = max(next_id - stats.get("next_id", next_id), 0)
+    return float(stats["rows"] + inserted)
+
+
+def _column_stats(schema: dict[str, Any], column: str) -> dict[str, Any]:
+    return (schema.get("stats") or {}).get("columns", {}).get(column, {})
+
+
+def _int_literal(value: str) -> int | None:
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+def _equality_selectivity(schema: dict[str, Any], column: str,
+                          table_rows: float) -> float:
+    if column == ID_COLUMN_NAME:
+        return 1 / table_rows if table_rows else 0.0
+    distinct = _column_stats(schema, column).get("distinct")
+    if distinct:
+        return 1 / distinct
+    return PLANNER_EQUALITY_SELECTIVITY
+
+
+def _value_bounds(schema: dict[str, Any], column: str) -> tuple[Any, Any]:
+    if column == ID_COLUMN_NAME:
+        return 1, schema.get("next_id", 1) - 1
+    stats = _column_stats(schema, column)
+    return stats.get("min"), stats.get("max")
+
+
+def _range_selectivity(schema: dict[str, Any], comparison: Comparison) -> float:
+    """Доля строк для <, <=, >, >= по min/max колонки (равномерно)."""
+    low, high = _value_bounds(schema, comparison.column)
+    value = _int_literal(comparison.value)
+    if not isinstance(low, int) or not isinstance(high, int) or value is None:
+        return PLANNER_RANGE_SELECTIVITY
+    if high <= low:
+        below = 1.0 if value > low else 0.0
+    else:
+        below = min(max((value - low) / (high - low + 1), 0.0), 1.0)
+    if comparison.op in ("<=", ">"):
+        below = min(below + 1 / max(high - low + 1, 1), 1.0)
+    return below if comparison.op in ("<", "<=") else 1.0 - below
+
+
+def estimate_selectivity(schema: dict[str, Any], expression: Expression,
+                         table_rows: float) -> float:
+    """Оценка доли строк таблицы, подходящих под выражение."""
+    if isinstance(expression, And):
+        return (estimate_selectivity(schema, expression.left, table_rows)
+                * estimate_selectivity(schema, expression.right, table_rows))
+    if isinstance(expression, Or):
+        left = estimate_selectivity(schema, expression.left, table_rows)
+        right = estimate_selectivity(schema, expression.right, table_rows)
+        return left + right - left * right
+    if isinstance(expression, Not):
+        return 1.0 - estimate_selectivity(schema, expression.operand,
+                                          table_rows)
+    equality = _equality_selectivity(schema, expression.column, table_rows)
+    if isinstance(expression, InList):
+        return min(len(set(expression.values)) * equality, 1.0)
+    if expression.op == "=":
+        return equality
+    if expression.op == "!=":
+        return 1.0 - equality
+    return _range_selectivity(schema, expression)
+
+
+def _access_candidates(schema: dict[str, Any], condition: Expression,
+                       table_rows: float) -> list[QueryPlan]:
+    """Способы доступа по индексам для частей условия, соединённых and."""
+    indexes = set(schema.get("indexes", []))
+    density = 1.0
+    if schema.get("next_id", 1) > 1:
+        density = min(table_rows / (schema["next_id"] - 1), 1.0)
+    low, high = _value_bounds(schema, ID_COLUMN_NAME)
+    has_range = False
+
+    candidates: list[QueryPlan] = []
+    for part in iter_conjuncts(condition):
+        if not isinstance(part, (Comparison, InList)):
+            continue
+        if isinstance(part, InList):
+            keys = tuple(dict.fromkeys(part.values))
+        elif part.op == "=":
+            keys = (part.value,)
+        else:
+            keys = ()
+
+        if keys and part.column == ID_COLUMN_NAME:
+            candidates.append(QueryPlan("", ACCESS_PK_LOOKUP, keys=keys,
+                                        fetched_rows=float(len(keys))))
+        elif keys and part.column in indexes:
+            fetched = table_rows * estimate_selectivity(schema, part, table_rows)
+            candidates.append(QueryPlan("", ACCESS_INDEX_LOOKUP,
+                                        column=part.column, keys=keys,
+                                        fetched_rows=fetched))
+        elif (isinstance(part, Comparison) and part.column == ID_COLUMN_NAME
+              and part.op in _RANGE_OPERATORS):
+            bound = _int_literal(part.value)
+            if bound is None:
+                continue
+            has_range = True
+            if part.op == ">":
+                low = max(low, bound + 1)
+            elif part.op == ">=":
+                low = max(low, bound)
+            elif part.op == "<":
+                high = min(high, bound - 1)
+            else:
+                high = min(high, bound)
+
+    if has_range:
+        fetched = max(high - low + 1, 0) * density
+        candidates.append(QueryPlan("", ACCESS_RANGE_SCAN, low=low, high=high,
+                                    fetched_rows=fetched))
+    return candidates
+
+
+def plan_query(table_name: str, schema: dict[str, Any], storage: str,
+               condition: Expression | None,
+               scan_fraction: float = 1.0) -> QueryPlan:
+    """Выбирает способ выполнения select по схеме и статистике таблицы.
+
+    scan_fraction — доля строк, которую прочитает полный просмотр
+    (меньше 1, если зонные карты исключают часть сегментов).
+    """
+    table_rows = estimate_table_rows(schema)
+    scan_cost = table_rows * scan_fraction
+    plan = QueryPlan(table_name, ACCESS_FULL_SCAN, condition,
+                     table_rows=table_rows, fetched_rows=scan_cost,
+                     cost=scan_cost)
+    if condition is not None:
+        # json-таблица разбирается один раз на все выбранные id, а
+        # сегментированная — по сегменту на каждую строку
+        parse_cost = 0.0
+        if storage == JSON_STORAGE:
+            parse_cost = table_rows * PLANNER_JSON_PARSE_COST
+            lookup_cost = 1.0
+        elif storage == SEGMENTED_STORAGE:
+            lookup_cost = min(max(table_rows, 1.0), float(SEGMENT_ROWS))
+        else:
+            lookup_cost = PLANNER_LOOKUP_COST
+        for candidate in _access_candidates(schema, condition, table_rows):
+            cost = parse_cost + candidate.fetched_rows * lookup_cost
+            if cost < plan.cost:
+                candidate.cost = cost
+                plan = candidate
+        plan.table, plan.condition = table_name, condition
+        plan.table_rows = table_rows
+
+    plan.scan_cost = scan_cost
+    plan.has_stats = bool(schema.get("stats"))
+    selectivity = (1.0 if condition is None
+                   else estimate_selectivity(schema, condition, table_rows))
+    plan.estimated_rows = min(table_rows * selectivity, plan.fetched_rows)
+    return plan
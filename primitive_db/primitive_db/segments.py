@@ -0,0 +1,453 @@
+"""Сегментированный формат таблиц и параллельный просмотр сегментов.
+
+Таблица хранится в каталоге <table>.segments: строки из одного диапазона
+id длиной SEGMENT_ROWS лежат в своём JSON-файле (id 1..10000 — в
+000000.json, 10001..20000 — в 000001.json и т. д.). Изменение строки
+переписывает только её сегмент, а чтение по id разбирает один сегмент.
+
+Полный просмотр распределяется по процессам ProcessPoolExecutor: каждый
+процесс сам читает и разбирает свой сегмент, проверяет условие и
+возвращает только подходящие строки или частичные агрегаты, поэтому
+просмотр большой таблицы ускоряется с числом ядер, а не упирается в GIL.
+Условие передаётся процессам деревом выражения (его можно сериализовать
+pickle) и компилируется в предикат уже на месте. Пул процессов создаётся
+при первом параллельном просмотре и переиспользуется.
+
+При каждой записи сегмента его зона (min/max/nulls колонок, см.
+zonemaps.py) сохраняется в zones.json того же каталога вместе с размером
+и временем изменения файла. Просмотр с условием пропускает сегменты, зона
+которых исключает совпадения; зона, не совпавшая с файлом (например,
+после сбоя между записью сегмента и зон), не используется.
+
+Сегменты можно хранить сжатыми (compression=zlib или lzma при создании
+таблицы): каждый сегмент — независимо сжатый блок, поэтому распаковываются
+только сегменты, которые читает запрос, — после отсева по зонам или один
+сегмент при чтении по id. Способ сжатия записан в format.json каталога, а
+у файла сегмента — своё расширение (.json, .json.zlib, .json.xz).
+"""
+
+from __future__ import annotations
+
+import json
+import lzma
+import multiprocessing
+import os
+import threading
+import zlib
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any
+
+from .aggregates import HashAggregator
+from .constants import (
+    ID_COLUMN_NAME,
+    NO_COMPRESSION,
+    PARALLEL_SCAN_MIN_SEGMENTS,
+    SCAN_WORKERS,
+    SEGMENT_COMPRESSIONS,
+    SEGMENT_ROWS,
+)
+from .expressions import Expression, compile_predicate
+from .zonemaps import compute_zone, zone_may_match
+
+# Расширение файла сегмента по способу сжатия
+_SEGMENT_SUFFIXES = {NO_COMPRESSION: ".json", "zlib": ".json.zlib",
+                     "lzma": ".json.xz"}
+_ZONES_FILE_NAME = "zones.json"
+_FORMAT_FILE_NAME = "format.json"
+
+_EXECUTOR: ProcessPoolExecutor | None = None
+_EXECUTOR_LOCK = threading.Lock()
+
+
+def segment_number(row_id: int) -> int:
+    """Номер сегмента, в котором лежит строка с этим id."""
+    return (row_id - 1) // SEGMENT_ROWS
+
+
+def read_compression(directory: Path) -> str:
+    """Способ сжатия сегментов таблицы."""
+    try:
+        format_path = directory / _FORMAT_FILE_NAME
+        with format_path.open("r", encoding="utf-8") as format_file:
+            return json.load(format_file)["compression"]
+    except FileNotFoundError:
+        return NO_COMPRESSION
+
+
+def _write_compression(directory: Path, compression: str) -> None:
+    if compression not in SEGMENT_COMPRESSIONS:
+        raise ValueError(f"Способ сжатия {compression!r} не поддерживается")
+    format_path = directory / _FORMAT_FILE_NAME
+    tmp_path = format_path.with_name(format_path.name + ".tmp")
+    with tmp_path.open("w", encoding="utf-8") as format_file:
+        json.dump({"compression": compression}, format_file)
+        format_file.flush()
+        os.fsync(format_file.fileno())
+    os.replace(tmp_path, format_path)
+
+
+def segment_path(directory: Path, number: int,
+                 compression: str | None = None) -> Path:
+    if compression is None:
+        compression = read_compression(directory)
+    return directory / f"{number:06d}{_SEGMENT_SUFFIXES[compression]}"
+
+
+def _path_number(path: Path) -> int | None:
+    """Номер сегмента по имени файла (None — это не файл сегмента)."""
+    number, _, suffix = path.name.partition(".")
+    if number.isdigit() and f".{suffix}" in _SEGMENT_SUFFIXES.values():
+        return int(number)
+    return None
+
+
+def list_segment_paths(directory: Path) -> list[Path]:
+    """Файлы сегментов таблицы по возрастанию id."""
+    if not directory.is_dir():
+        return []
+    numbered = [(_path_number(path), path) for path in directory.iterdir()]
+    return [path for number, path in sorted(
+        (number, path) for number, path in numbered if number is not None)]
+
+
+def read_segment(path: Path) -> list[dict[str, Any]]:
+    """Читает (и при необходимости распаковывает) сегмент."""
+    try:
+        data = path.read_bytes()
+    except FileNotFoundError:
+        return []
+    if path.name.endswith(_SEGMENT_SUFFIXES["zlib"]):
+        data = zlib.decompress(data)
+    elif path.name.endswith(_SEGMENT_SUFFIXES["lzma"]):
+        data = lzma.decompress(data)
+    return json.loads(data)
+
+
+def write_segment(path: Path, rows: list[dict[str, Any]]) -> None:
+    """Атомарно переписывает сегмент (пустой сегмент удаляется)."""
+    if not rows:
+        path.unlink(missing_ok=True)
+        return
+    data = json.dumps(rows, ensure_ascii=False,
+                      separators=(",", ":")).encode("utf-8")
+    if path.name.endswith(_SEGMENT_SUFFIXES["zlib"]):
+        data = zlib.compress(data)
+    elif path.name.endswith(_SEGMENT_SUFFIXES["lzma"]):
+        data = lzma.compress(data)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with tmp_path.open("wb") as segment_file:
+        segment_file.write(data)
+        segment_file.flush()
+        os.fsync(segment_file.fileno())
+    os.replace(tmp_path, path)
+
+
+def _file_signature(path: Path) -> list[int] | None:
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def load_zone_map(directory: Path) -> dict[str, dict[str, Any]]:
+    """Зоны сегментов: номер сегмента строкой -> зона."""
+    try:
+        with (directory / _ZONES_FILE_NAME).open("r", encoding="utf-8") as zones_file:
+            return json.load(zones_file)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _update_zone_map(directory: Path,
+                     written: dict[int, list[dict[str, Any]]]) -> None:
+    """Пересчитывает зоны только что записанных сегментов.
+
+    fsync не нужен: зона с устаревшей подписью файла просто не
+    используется.
+    """
+    zones = load_zone_map(directory)
+    compression = read_compression(directory)
+    for number, rows in written.items():
+        path = segment_path(directory, number, compression)
+        signature = _file_signature(path)
+        if signature is None:
+            zones.pop(str(number), None)
+        else:
+            zones[str(number)] = {**compute_zone(rows), "signature": signature}
+    zones_path = directory / _ZONES_FILE_NAME
+    tmp_path = zones_path.with_name(zones_path.name + ".tmp")
+    with tmp_path.open("w", encoding="utf-8") as zones_file:
+        json.dump(zones, zones_file, ensure_ascii=False)
+    os.replace(tmp_path, zones_path)
+
+
+def count_segmented_rows(directory: Path) -> int | None:
+    """Число строк по зонам сегментов; None — какая-то зона устарела."""
+    zones = load_zone_map(directory)
+    total = 0
+    for path in list_segment_paths(directory):
+        zone = zones.get(str(_path_number(path)))
+        if zone is None or zone["signature"] != _file_signature(path):
+            return None
+        total += zone["rows"]
+    return total
+
+
+def select_segment_paths(directory: Path, columns: dict[str, str],
+                         condition: Expression | None,
+                         ) -> tuple[list[Path], int]:
+    """Сегменты, которые нужно прочитать для условия, и всего сегментов."""
+    paths = list_segment_paths(directory)
+    if condition is None:
+        return paths, len(paths)
+    zones = load_zone_map(directory)
+    selected = []
+    for path in paths:
+        zone = zones.get(str(_path_number(path)))
+        if (zone is not None and zone["signature"] == _file_signature(path)
+                and not zone_may_match(zone, condition, columns)):
+            continue
+        selected.append(path)
+    return selected, len(paths)
+
+
+def write_segmented_table(directory: Path, rows: Iterable[dict[str, Any]],
+                          compression: str | None = None) -> None:
+    """Полностью переписывает таблицу, раскладывая строки по сегментам.
+
+    compression меняет способ сжатия (None — оставить прежний). Каждый
+    сегмент подменяется атомарно; согласованность таблицы целиком
+    обеспечивает журнал упреждающей записи (см. wal.py).
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    old_paths = list_segment_paths(directory)
+    if compression is not None:
+        _write_compression(directory, compression)
+    else:
+        compression = read_compression(directory)
+    segments: dict[int, list[dict[str, Any]]] = {}
+    for row in sorted(rows, key=lambda row: row[ID_COLUMN_NAME]):
+        segments.setdefault(segment_number(row[ID_COLUMN_NAME]), []).append(row)
+
+    written: dict[int, list[dict[str, Any]]] = {}
+    new_paths = set()
+    for number, segment_rows in segments.items():
+        path = segment_path(directory, number, compression)
+        write_segment(path, segment_rows)
+        written[number] = segment_rows
+        new_paths.add(path)
+    for path in old_paths:
+        old_number = _path_number(path)
+        if path not in new_paths and old_number is not None:
+            path.unlink()
+            written.setdefault(old_number, [])
+    _update_zone_map(directory, written)
+
+
+def iter_segmented_rows(directory: Path) -> Iterator[dict[str, Any]]:
+    """Последовательно читает строки, сегмент за сегментом."""
+    for path in list_segment_paths(directory):
+        yield from read_segment(path)
+
+
+def get_segment_row(directory: Path, row_id: int) -> dict[str, Any] | None:
+    """Ищет строку по id в её сегменте."""
+    path = segment_path(directory, segment_number(row_id))
+    for row in read_segment(path):
+        if row[ID_COLUMN_NAME] == row_id:
+            return row
+    return None
+
+
+def append_segment_rows(directory: Path,
+                        rows: Iterable[dict[str, Any]]) -> int:
+    """Дописывает строки в их сегменты и возвращает их число.
+
+    Строки приходят по возрастанию id, поэтому в памяти держится только
+    текущий сегмент. Если итератор падает с ошибкой, затронутые сегменты
+    возвращаются к исходному содержимому.
+    """
+    compression = read_compression(directory)
+
+    def path_of(number: int) -> Path:
+        return segment_path(directory, number, compression)
+
+    originals: dict[int, list[dict[str, Any]]] = {}
+    written: dict[int, list[dict[str, Any]]] = {}
+    current: int | None = None
+    pending: list[dict[str, Any]] = []
+    count = 0
+    try:
+        for row in rows:
+            number = segment_number(row[ID_COLUMN_NAME])
+            if number != current:
+                if current is not None:
+                    write_segment(path_of(current), pending)
+                    written[current] = pending
+                current = number
+                pending = read_segment(path_of(number))
+                originals.setdefault(number, list(pending))
+            pending.append(row)
+            count += 1
+        if current is not None:
+            write_segment(path_of(current), pending)
+            written[current] = pending
+    except BaseException:
+        for number, original in originals.items():
+            write_segment(path_of(number), original)
+        _update_zone_map(directory, originals)
+        raise
+    _update_zone_map(directory, written)
+    return count
+
+
+def change_segment_rows(directory: Path,
+                        changed: dict[int, dict[str, Any] | None]) -> int:
+    """Заменяет или удаляет (None) строки по id; возвращает число изменённых.
+
+    Каждый затронутый сегмент переписывается один раз, сколько бы строк
+    в нём ни менялось.
+    """
+    by_segment: dict[int, dict[int, dict[str, Any] | None]] = {}
+    for row_id, row in changed.items():
+        by_segment.setdefault(segment_number(row_id), {})[row_id] = row
+    compression = read_compression(directory)
+    count = 0
+    written: dict[int, list[dict[str, Any]]] = {}
+    for number, segment_changes in by_segment.items():
+        path = segment_path(directory, number, compression)
+        rows = []
+        for existing in read_segment(path):
+            row_id = existing[ID_COLUMN_NAME]
+            if row_id not in segment_changes:
+                rows.append(existing)
+                continue
+            count += 1
+            new_row = segment_changes[row_id]
+            if new_row is not None:
+                rows.append(new_row)
+        write_segment(path, rows)
+        written[number] = rows
+    _update_zone_map(directory, written)
+    return count
+
+
+def replace_segment_row(directory: Path, row: dict[str, Any]) -> bool:
+    """Заменяет строку в её сегменте; False, если строки нет."""
+    return change_segment_rows(directory, {row[ID_COLUMN_NAME]: row}) > 0
+
+
+def delete_segment_row(directory: Path, row_id: int) -> bool:
+    """Удаляет строку из её сегмента; False, если строки нет."""
+    return change_segment_rows(directory, {row_id: None}) > 0
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _EXECUTOR
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is None:
+            # spawn: процессы не наследуют потоки и блокировки родителя
+            _EXECUTOR = ProcessPoolExecutor(
+                max_workers=SCAN_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _EXECUTOR
+
+
+def shutdown_scan_pool() -> None:
+    """Останавливает процессы параллельного просмотра."""
+    global _EXECUTOR
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is not None:
+            _EXECUTOR.shutdown()
+            _EXECUTOR = None
+
+
+# Функции процессов-исполнителей: получают путь сегмента строкой,
+# потому что у процессов пула может быть другой текущий каталог
+
+def _load_segment(path: str) -> list[dict[str, Any]]:
+    return read_segment(Path(path))
+
+
+def _filter_segment(path: str, columns: dict[str, str],
+                    condition: Expression | None) -> list[dict[str, Any]]:
+    rows = read_segment(Path(path))
+    if condition is None:
+        return rows
+    predicate = compile_predicate(condition, columns)
+    return [row for row in rows if predicate(row)]
+
+
+def _aggregate_segment(path: str, columns: dict[str, str],
+                       condition: Expression | None,
+                       aggregates: list[tuple[str, str]],
+                       group_by: str | None) -> HashAggregator:
+    aggregator = HashAggregator(aggregates, group_by)
+    aggregator.add_rows(_filter_segment(path, columns, condition))
+    return aggregator
+
+
+def _map_segments(function: Callable[..., Any], segment_paths: list[Path],
+                  *args: Any) -> Iterator[Any]:
+    """Применяет функцию к сегментам, результаты — по порядку id.
+
+    При малом числе сегментов процессы не запускаются.
+    """
+    paths = [str(path.resolve()) for path in segment_paths]
+    if len(paths) < PARALLEL_SCAN_MIN_SEGMENTS:
+        for path in paths:
+            yield function(path, *args)
+        return
+    repeated = [[arg] * len(paths) for arg in args]
+    yield from _get_executor().map(function, paths, *repeated)
+
+
+def load_segmented_rows(directory: Path) -> list[dict[str, Any]]:
+    """Все строки таблицы; сегменты разбираются параллельно."""
+    rows: list[dict[str, Any]] = []
+    for part in _map_segments(_load_segment, list_segment_paths(directory)):
+        rows.extend(part)
+    return rows
+
+
+def scan_segmented_rows(directory: Path, columns: dict[str, str],
+                        condition: Expression | None,
+                        ) -> Iterator[dict[str, Any]]:
+    """Строки, подходящие под условие; сегменты проверяются параллельно.
+
+    Сегменты, которые по зонам не могут содержать подходящих строк, не
+    читаются.
+    """
+    paths, _ = select_segment_paths(directory, columns, condition)
+    for part in _map_segments(_filter_segment, paths, columns, condition):
+        yield from part
+
+
+def iter_matching_segment_rows(directory: Path, columns: dict[str, str],
+                               condition: Expression | None,
+                               ) -> Iterator[dict[str, Any]]:
+    """Как scan_segmented_rows, но последовательно в этом процессе.
+
+    Для select ... limit: чтение останавливается, как только вызывающему
+    хватит строк.
+    """
+    paths, _ = select_segment_paths(directory, columns, condition)
+    for path in paths:
+        yield from _filter_segment(str(path), columns, condition)
+
+
+def aggregate_segmented_rows(directory: Path, columns: dict[str, str],
+                             condition: Expression | None,
+                             aggregates: list[tuple[str, str]],
+                             group_by: str | None) -> HashAggregator:
+    """Агрегаты по таблице: частичные по сегментам, затем их слияние."""
+    total = HashAggregator(aggregates, group_by)
+    paths, _ = select_segment_paths(directory, columns, condition)
+    for partial in _map_segments(_aggregate_segment, paths, columns,
+                                 condition, aggregates, group_by):
+        total.merge(partial)
+    return total
@@ -0,0 +1,161 @@
+"""Сетевой режим: язык команд консоли по TCP на asyncio.
+
+Клиент шлёт строки команд — можно несколько подряд, не дожидаясь
+ответов, — а сервер отвечает на каждую в том же порядке: выводом команды
+и строкой "." в конце (строки вывода, начинающиеся с точки, получают
+ещё одну точку, как в SMTP). Команды выполняются в пуле потоков, поэтому
+медленная запись одного клиента не задерживает остальных. Кэши и индексы
+общие для всех соединений, а транзакция у каждого соединения своя.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import io
+import sys
+import threading
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import TextIO
+
+from .constants import SERVER_WORKERS
+from .core import in_transaction, rollback_transaction
+from .decorators import set_confirmations
+from .main import execute_line
+
+# Строка, которой заканчивается ответ на каждую команду
+RESPONSE_END = "."
+
+
+class _ThreadLocalStdout(io.TextIOBase):
+    """sys.stdout, который в потоках команд пишет в буфер ответа.
+
+    Обработчики команд печатают результат через print; чтобы ответы
+    клиентов не смешивались, у каждого потока свой буфер.
+    """
+
+    def __init__(self, default: TextIO) -> None:
+        self.default = default
+        self._local = threading.local()
+
+    def write(self, text: str) -> int:
+        buffer = getattr(self._local, "buffer", None)
+        return (buffer or self.default).write(text)
+
+    def flush(self) -> None:
+        if getattr(self._local, "buffer", None) is None:
+            self.default.flush()
+
+    @contextmanager
+    def capture(self) -> Iterator[io.StringIO]:
+        """Перенаправляет вывод текущего потока в новый буфер."""
+        buffer = io.StringIO()
+        self._local.buffer = buffer
+        try:
+            yield buffer
+        finally:
+            self._local.buffer = None
+
+
+def encode_response(output: str) -> bytes:
+    """Кодирует вывод команды в ответ протокола."""
+    lines = [
+        "." + line if line.startswith(".") else line
+        for line in output.splitlines()
+    ]
+    lines.append(RESPONSE_END)
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+class DatabaseServer:
+    """TCP-сервер, выполняющий команды консоли в пуле потоков."""
+
+    def __init__(self, workers: int = SERVER_WORKERS) -> None:
+        self._pool = ThreadPoolExecutor(max_workers=workers,
+                                        thread_name_prefix="primitive-db")
+        self._stdout: _ThreadLocalStdout | None = None
+
+    async def start(self, host: str, port: int) -> asyncio.Server:
+        """Начинает принимать соединения (port=0 — любой свободный)."""
+        if self._stdout is None:
+            self._stdout = _ThreadLocalStdout(sys.stdout)
+            sys.stdout = self._stdout
+        # Подтверждения спрашивать некого
+        set_confirmations(False)
+        return await asyncio.start_server(self._handle_client, host, port)
+
+    def close(self) -> None:
+        """Возвращает stdout и останавливает пул потоков."""
+        if self._stdout is not None:
+            sys.stdout = self._stdout.default
+            self._stdout = None
+        set_confirmations(True)
+        self._pool.shutdown(wait=True)
+
+    def _execute(self, line: str) -> tuple[str, bool]:
+        assert self._stdout is not None
+        with self._stdout.capture() as buffer:
+            try:
+                keep_open = execute_line(line)
+            except (ValueError, OSError) as exc:
+                # Ошибки обработчиков перехватывает handle_db_errors; здесь —
+                # то, что вышло за него: соединение при этом не рвётся
+                print(f"Неожиданная ошибка: {exc}")
+                keep_open = True
+        return buffer.getvalue(), keep_open
+
+    async def _handle_client(self, reader: asyncio.StreamReader,
+                             writer: asyncio.StreamWriter) -> None:
+        loop = asyncio.get_running_loop()
+        # Свой контекст на соединение: в нём живёт транзакция клиента
+        context = contextvars.copy_context()
+        try:
+            while True:
+                raw_line = await reader.readline()
+                if not raw_line:
+                    break
+                line = raw_line.decode("utf-8", errors="replace").strip()
+                if not line:
+                    continue
+                output, keep_open = await loop.run_in_executor(
+                    self._pool, context.run, self._execute, line)
+                writer.write(encode_response(output))
+                await writer.drain()
+                if not keep_open:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            if context.run(in_transaction):
+                await loop.run_in_executor(self._pool, context.run,
+                                           rollback_transaction)
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+
+async def _serve_forever(host: str, port: int) -> None:
+    database_server = DatabaseServer()
+    server = await database_server.start(host, port)
+    addresses = ", ".join(
+        f"{sock.getsockname()[0]}:{sock.getsockname()[1]}"
+        for sock in server.sockets
+    )
+    print(f"Сервер принимает команды на {addresses}. Ctrl+C — остановить.")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        database_server.close()
+
+
+def serve(host: str, port: int) -> None:
+    """Запускает сервер и работает до Ctrl+C."""
+    try:
+        asyncio.run(_serve_forever(host, port))
+    except KeyboardInterrupt:
+        print("Сервер остановлен.")
@@ -1,7 +1,14 @@
 """Вспомогательные функции для пользовательского интерфейса."""
 
+import math
+from collections.abc import Iterable, Sequence
+from itertools import islice
 from typing import Any
 
+from prettytable import PrettyTable  # type: ignore[import]
+
+from .constants import RENDER_CHUNK_ROWS, RENDER_MAX_COLUMN_WIDTH
+
 
 def read_non_empty(prompt: str) -> str:
     """Считывает непустую строку, повторяя запрос при пустом вводе."""
@@ -22,3 +29,54 @@ def debug_print(label: str, payload: Any) -> None:
     """Печатает отладочную информацию (можно отключить при необходимости)."""
     # На будущее: можно завести флаг DEBUG и выводить только при его включении
     print(f"[DEBUG] {label}: {payload!r}")
+
+
+def percentile(values: Sequence[float], fraction: float) -> float:
+    """Значение, которое не превышает доля fraction значений."""
+    ordered = sorted(values)
+    index = max(math.ceil(fraction * len(ordered)) - 1, 0)
+    return ordered[index]
+
+
+def print_rows_chunked(
+    column_names: list[str],
+    rows: Iterable[tuple[object, ...]],
+    chunk_size: int = RENDER_CHUNK_ROWS,
+) -> int:
+    """Печатает строки таблицей порциями и возвращает их число.
+
+    Ширина колонок берётся по первой порции, поэтому первые строки
+    появляются сразу, не дожидаясь чтения всей выборки. Значения длиннее
+    этой ширины переносятся внутри ячейки.
+    """
+    rows_iter = iter(rows)
+    chunk = list(islice(rows_iter, chunk_size))
+    if not chunk:
+        return 0
+
+    widths = {name: len(name) for name in column_names}
+    for values in chunk:
+        for name, value in zip(column_names, values):
+            widths[name] = max(widths[name], len(str(value)))
+    widths = {name: min(width, RENDER_MAX_COLUMN_WIDTH)
+              for name, width in widths.items()}
+
+    printed = 0
+    bottom_border = ""
+    first = True
+    while chunk:
+        table = PrettyTable()
+        table.field_names = column_names
+        table.min_width = widths
+        table.max_width = widths
+        table.add_rows([list(values) for values in chunk])
+        lines = table.get_string(header=first).splitlines()
+        bottom_border = lines[-1]
+        # Рамки между порциями не нужны: верхняя есть только у первой
+        print("\n".join(lines[:-1] if first else lines[1:-1]), flush=True)
+        printed += len(chunk)
+        first = False
+        chunk = list(islice(rows_iter, chunk_size))
+
+    print(bottom_border)
+    return printed
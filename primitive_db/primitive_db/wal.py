@@ -0,0 +1,359 @@
+"""Журнал упреждающей записи (WAL), контрольные точки и восстановление.
+
+Каждое изменение из core сначала дописывается в data/wal.log группой
+небольших JSON-записей и сбрасывается на диск одним fsync, и только
+потом применяется к файлам таблиц. Группа заканчивается записью commit:
+группы без неё (сбой посередине) при восстановлении не повторяются.
+
+Контрольная точка сбрасывает на диск файлы таблиц, упомянутых в журнале,
+и начинает журнал заново со снимка метаданных. recover() при запуске
+повторяет группы, записанные после последней контрольной точки.
+"""
+
+from __future__ import annotations
+
+import copy
+import json
+import os
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, BinaryIO
+
+from .constants import (
+    DATA_DIR,
+    ID_COLUMN_NAME,
+    WAL_CHECKPOINT_BYTES,
+    WAL_CHECKPOINT_INTERVAL,
+    WAL_FILE,
+)
+from .engine import (
+    delete_table_data,
+    ensure_data_dir_exists,
+    get_table_binary_paths,
+    get_table_file_path,
+    get_table_log_path,
+    get_table_segments_dir,
+    load_db_meta,
+    load_table_data,
+    repair_table_log,
+    save_db_meta,
+    save_table_data,
+    sync_path,
+)
+from .indexes import drop_column_indexes
+from .locks import database_lock
+
+# Типы записей WAL
+WAL_OP_PUT = "put"  # новая версия строки
+WAL_OP_DELETE = "del"  # удаление строки по id
+WAL_OP_META = "meta"  # новая схема таблицы (блок id, индексы)
+WAL_OP_CREATE = "create"  # создание (пересоздание) пустой таблицы
+WAL_OP_DROP = "drop"  # удаление таблицы
+WAL_OP_SNAPSHOT = "snapshot"  # снимок метаданных в начале журнала
+WAL_OP_COMMIT = "commit"  # конец группы
+
+
+
+def put_record(table_name: str, row: dict[str, Any]) -> dict[str, Any]:
+    return {"op": WAL_OP_PUT, "table": table_name, "row": dict(row)}
+
+
+def delete_record(table_name: str, row_id: int) -> dict[str, Any]:
+    return {"op": WAL_OP_DELETE, "table": table_name, "id": row_id}
+
+
+def meta_record(table_name: str, schema: dict[str, Any]) -> dict[str, Any]:
+    return {"op": WAL_OP_META, "table": table_name,
+            "schema": copy.deepcopy(schema)}
+
+
+def create_record(table_name: str, schema: dict[str, Any]) -> dict[str, Any]:
+    return {"op": WAL_OP_CREATE, "table": table_name,
+            "schema": copy.deepcopy(schema)}
+
+
+def drop_record(table_name: str) -> dict[str, Any]:
+    return {"op": WAL_OP_DROP, "table": table_name}
+
+
+def _encode(record: dict[str, Any]) -> bytes:
+    line = json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+    return line.encode("utf-8")
+
+
+class WalGroup:
+    """Группа записей WAL, которая повторяется целиком или не повторяется."""
+
+    def __init__(self, wal_file: BinaryIO) -> None:
+        self._file = wal_file
+        self.start = wal_file.seek(0, os.SEEK_END)
+        self.committed = False
+
+    def add(self, record: dict[str, Any]) -> None:
+        """Добавляет запись в группу (на диск она попадёт при commit)."""
+        self._file.write(_encode(record))
+
+    def commit(self) -> None:
+        """Закрывает группу и сбрасывает её на диск.
+
+        После commit изменение считается надёжным: если применить его к
+        таблицам не успеют, это сделает recover().
+        """
+        self._file.write(_encode({"op": WAL_OP_COMMIT}))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.committed = True
+
+
+@contextmanager
+def wal_group() -> Iterator[WalGroup]:
+    """Открывает группу записей WAL.
+
+    Внутри блока записи добавляются через add, затем commit делает их
+    надёжными — после этого изменение применяется к файлам таблиц (тоже
+    внутри блока, чтобы контрольная точка не вклинилась между ними).
+    Группа пишется под блокировкой записи в базу, поэтому группы разных
+    процессов в журнале не перемешиваются.
+    Если блок завершается ошибкой, группа вырезается из журнала.
+    """
+    ensure_data_dir_exists()
+    with database_lock().exclusive(), WAL_FILE.open("ab") as wal_file:
+        group = WalGroup(wal_file)
+        try:
+            yield group
+        except BaseException:
+            wal_file.truncate(group.start)
+            raise
+        if not group.committed:
+            group.commit()
+        wal_size = wal_file.tell()
+    if wal_size > WAL_CHECKPOINT_BYTES:
+        _request_checkpoint()
+
+
+@dataclass
+class _WalContents:
+    """Разобранный журнал: снимок метаданных, завершённые группы и хвост.
+
+    Хвост — записи последней группы без commit. damaged означает, что
+    чтение остановилось на недописанной или повреждённой строке.
+    """
+
+    snapshot: dict[str, Any] | None = None
+    groups: list[list[dict[str, Any]]] = field(default_factory=list)
+    tail: list[dict[str, Any]] = field(default_factory=list)
+    damaged: bool = False
+
+    def tables(self) -> set[str]:
+        return {record["table"] for group in [*self.groups, self.tail]
+                for record in group if "table" in record}
+
+
+def _read_wal() -> _WalContents:
+    """Читает журнал до первой недописанной или повреждённой строки."""
+    contents = _WalContents()
+    if not WAL_FILE.exists():
+        return contents
+
+    current: list[dict[str, Any]] = []
+    with WAL_FILE.open("rb") as wal_file:
+        for line in wal_file:
+            if not line.endswith(b"\n"):
+                contents.damaged = True
+                break
+            try:
+                record = json.loads(line)
+            except ValueError:
+                contents.damaged = True
+                break
+            if record["op"] != WAL_OP_COMMIT:
+                current.append(record)
+                continue
+            if current and current[0]["op"] == WAL_OP_SNAPSHOT:
+                contents.snapshot = current[0]["meta"]
+            else:
+                contents.groups.append(current)
+            current = []
+    contents.tail = current
+    return contents
+
+
+def _table_paths(table_name: str) -> list[Path]:
+    # Сегменты и format.json сбрасываются на диск при записи, но
+    # os.replace в каталоге сегментов фиксирует только fsync каталога
+    return [
+        get_table_file_path(table_name),
+        get_table_log_path(table_name),
+        *get_table_binary_paths(table_name),
+        get_table_segments_dir(table_name),
+    ]
+
+
+def checkpoint() -> None:
+    """Сбрасывает изменённые таблицы на диск и начинает журнал заново.
+
+    Новый журнал содержит только снимок метаданных: файлы схем таблиц
+    переписываются без fsync, а снимок вместе с последующими записями
+    позволяет восстановить их после сбоя.
+    """
+    ensure_data_dir_exists()
+    with database_lock().exclusive():
+        for table_name in sorted(_read_wal().tables()):
+            for path in _table_paths(table_name):
+                sync_path(path)
+        sync_path(DATA_DIR)
+
+        tmp_path = WAL_FILE.with_name(WAL_FILE.name + ".tmp")
+        with tmp_path.open("wb") as wal_file:
+            wal_file.write(_encode({"op": WAL_OP_SNAPSHOT,
+                                    "meta": load_db_meta()}))
+            wal_file.write(_encode({"op": WAL_OP_COMMIT}))
+            wal_file.flush()
+            os.fsync(wal_file.fileno())
+        os.replace(tmp_path, WAL_FILE)
+        sync_path(DATA_DIR)
+
+
+def recover() -> int:
+    """Повторяет изменения из WAL, которые могли не дойти до файлов таблиц.
+
+    Таблицы, упомянутые в журнале, читаются с диска, к ним применяются
+    завершённые группы, и каждая записывается заново одним файлом.
+    Строки с id не меньше next_id — след незавершённой массовой вставки —
+    отбрасываются. Возвращает число повторённых групп.
+    """
+    with database_lock().exclusive():
+        contents = _read_wal()
+        try:
+            meta = load_db_meta()
+            meta_broken = False
+        except ValueError:
+            meta, meta_broken = {}, True
+        if not contents.groups and not contents.tail and not meta_broken:
+            if contents.damaged or contents.snapshot is None:
+                # Журнал начинается заново со снимка, иначе новые группы
+                # окажутся за повреждённой строкой или без базы для повтора
+                checkpoint()
+            return 0
+        if contents.snapshot is not None:
+            meta = copy.deepcopy(contents.snapshot)
+        elif meta_broken:
+            raise ValueError("Файл метаданных повреждён, а в журнале "
+                             "нет их снимка")
+
+        tables: dict[str, dict[int, dict[str, Any]]] = {}
+        old_indexes: dict[str, set[str]] = {}
+
+        def table_rows(table_name: str) -> dict[int, dict[str, Any]]:
+            if table_name not in tables:
+                old_indexes.setdefault(table_name, set()).update(
+                    meta.get(table_name, {}).get("indexes", []))
+                rows: dict[int, dict[str, Any]] = {}
+                if table_name in meta:
+                    repair_table_log(table_name)
+                    rows = {row[ID_COLUMN_NAME]: row
+                            for row in load_table_data(table_name)}
+                tables[table_name] = rows
+            return tables[table_name]
+
+        for group in contents.groups:
+            for record in group:
+                op, table_name = record["op"], record["table"]
+                if op == WAL_OP_PUT:
+                    row = record["row"]
+                    table_rows(table_name)[row[ID_COLUMN_NAME]] = row
+                elif op == WAL_OP_DELETE:
+                    table_rows(table_name).pop(record["id"], None)
+                elif op == WAL_OP_META:
+                    table_rows(table_name)
+                    meta[table_name] = record["schema"]
+                elif op == WAL_OP_CREATE:
+                    table_rows(table_name)
+                    meta[table_name] = record["schema"]
+                    tables[table_name] = {}
+                elif op == WAL_OP_DROP:
+                    table_rows(table_name)
+                    meta.pop(table_name, None)
+        for record in contents.tail:
+            if "table" in record:
+                table_rows(record["table"])
+
+        save_db_meta(meta)
+        for table_name, rows in tables.items():
+            schema = meta.get(table_name)
+            indexes = old_indexes.get(table_name, set())
+            if schema is not None:
+                indexes |= set(schema.get("indexes", []))
+            # Индексы перестроятся при первом обращении
+            drop_column_indexes(table_name, sorted(indexes))
+            if schema is None:
+                delete_table_data(table_name)
+                continue
+            save_table_data(
+                table_name,
+                [row for row in rows.values()
+                 if row[ID_COLUMN_NAME] < schema["next_id"]],
+                storage=schema.get("storage"),
+                columns=schema["columns"],
+                compression=schema.get("compression"),
+            )
+        checkpoint()
+        return len(contents.groups)
+
+
+# Фоновая контрольная точка: поток просыпается по таймеру или когда
+# журнал перерос WAL_CHECKPOINT_BYTES
+_CHECKPOINT_WAKE = threading.Event()
+_CHECKPOINT_STOP = threading.Event()
+_CHECKPOINT_THREAD: threading.Thread | None = None
+
+
+def _request_checkpoint() -> None:
+    if _CHECKPOINT_THREAD is not None and _CHECKPOINT_THREAD.is_alive():
+        _CHECKPOINT_WAKE.set()
+    else:
+        checkpoint()
+
+
+def _wal_has_changes() -> bool:
+    contents = _read_wal()
+    return bool(contents.groups or contents.tail)
+
+
+def _checkpoint_loop() -> None:
+    while not _CHECKPOINT_STOP.is_set():
+        _CHECKPOINT_WAKE.wait(WAL_CHECKPOINT_INTERVAL)
+        _CHECKPOINT_WAKE.clear()
+        if _CHECKPOINT_STOP.is_set():
+            break
+        try:
+            if _wal_has_changes():
+                checkpoint()
+        except OSError as exc:
+            print(f"Ошибка контрольной точки WAL: {exc}")
+
+
+def start_checkpointer() -> None:
+    """Запускает фоновый поток контрольных точек."""
+    global _CHECKPOINT_THREAD
+    if _CHECKPOINT_THREAD is not None and _CHECKPOINT_THREAD.is_alive():
+        return
+    _CHECKPOINT_STOP.clear()
+    _CHECKPOINT_THREAD = threading.Thread(target=_checkpoint_loop,
+                                          name="wal-checkpoint", daemon=True)
+    _CHECKPOINT_THREAD.start()
+
+
+def stop_checkpointer() -> None:
+    """Останавливает фоновый поток и делает последнюю контрольную точку."""
+    global _CHECKPOINT_THREAD
+    if _CHECKPOINT_THREAD is not None:
+        _CHECKPOINT_STOP.set()
+        _CHECKPOINT_WAKE.set()
+        _CHECKPOINT_THREAD.join()
+        _CHECKPOINT_THREAD = None
+    if WAL_FILE.exists():
+        checkpoint()
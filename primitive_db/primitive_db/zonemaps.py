@@ -0,0 +1,104 @@
+"""Зонные карты: min/max и число NULL по колонкам каждого сегмента.
+
+Зона сегмента сохраняется при каждой его записи. Перед просмотром
+условие where проверяется по зоне: если ни одна строка сегмента не может
+под него подойти (например, id>900000, а максимальный id сегмента —
+10000), сегмент не читается. Проверка консервативна: при сомнении
+(not, нет зоны, литерал не того типа) сегмент читается.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable
+from typing import Any
+
+from .expressions import And, Comparison, Expression, InList, Not, Or
+
+
+def compute_zone(rows: Iterable[dict[str, Any]]) -> dict[str, Any]:
+    """Зона по строкам сегмента: число строк и min/max/nulls колонок.
+
+    Колонки, в которых все значения пустые, в зону не попадают.
+    """
+    count = 0
+    stats: dict[str, dict[str, Any]] = {}
+    for row in rows:
+        count += 1
+        for column, value in row.items():
+            if value is None:
+                continue
+            column_stats = stats.get(column)
+            if column_stats is None:
+                stats[column] = {"min": value, "max": value, "values": 1}
+                continue
+            column_stats["values"] += 1
+            if value < column_stats["min"]:
+                column_stats["min"] = value
+            elif value > column_stats["max"]:
+                column_stats["max"] = value
+    return {"rows": count, "columns": {
+        column: {"min": column_stats["min"], "max": column_stats["max"],
+                 "nulls": count - column_stats["values"]}
+        for column, column_stats in stats.items()
+    }}
+
+
+def _literal(value: str, column_type: str) -> object:
+    if column_type != "int":
+        return value
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+def _comparison_may_match(column_stats: dict[str, Any], op: str,
+                          literal: object) -> bool:
+    low, high = column_stats["min"], column_stats["max"]
+    if op == "!=":
+        # NULL подходит под !=, как в compile_predicate
+        return column_stats["nulls"] > 0 or low != literal or high != literal
+    if op == "=":
+        return low <= literal <= high
+    if op == "<":
+        return low < literal
+    if op == "<=":
+        return low <= literal
+    if op == ">":
+        return high > literal
+    return high >= literal
+
+
+def zone_may_match(zone: dict[str, Any], expression: Expression,
+                   columns: dict[str, str]) -> bool:
+    """Может ли хоть одна строка сегмента подойти под выражение."""
+    if isinstance(expression, And):
+        return (zone_may_match(zone, expression.left, columns)
+                and zone_may_match(zone, expression.right, columns))
+    if isinstance(expression, Or):
+        return (zone_may_match(zone, expression.left, columns)
+                or zone_may_match(zone, expression.right, columns))
+    if isinstance(expression, Not):
+        return True
+
+    column_type = columns.get(expression.column)
+    if column_type is None:
+        return True
+    column_stats = zone["columns"].get(expression.column)
+    if column_stats is None:
+        # Все значения колонки в сегменте пустые: подойти может только !=
+        return (zone["rows"] > 0 and isinstance(expression, Comparison)
+                and expression.op == "!=")
+
+    if isinstance(expression, InList):
+        literals = [_literal(value, column_type) for value in expression.values]
+        return any(literal is not None
+                   and _comparison_may_match(column_stats, "=", literal)
+                   for literal in literals)
+
+    assert isinstance(expression, Comparison)
+    literal = _literal(expression.value, column_type)
+    if literal is None:
+        # int-колонка и не число: = не совпадёт, остальное решит предикат
+        return expression.op != "="
+    return _comparison_may_match(column_stats, expression.op, literal)
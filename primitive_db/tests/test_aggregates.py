@@ -0,0 +1,90 @@
+import unittest
+
+from primitive_db import core
+from primitive_db.aggregates import HashAggregator, check_aggregates
+from primitive_db.expressions import parse_where
+from tests.test_engine import TempDataDirTestCase
+
+
+class TestHashAggregator(unittest.TestCase):
+    def test_groups_and_nulls(self) -> None:
+        aggregator = HashAggregator(
+            [("count", "*"), ("count", "age"), ("sum", "age"), ("min", "age"),
+             ("max", "name"), ("avg", "age")], group_by="city")
+        aggregator.add_rows([
+            {"city": "Kazan", "name": "Bob", "age": 30},
+            {"city": None, "name": "Eve", "age": None},
+            {"city": "Kazan", "name": "Ann", "age": 20},
+        ])
+        self.assertEqual(aggregator.column_names,
+                         ["city", "count(*)", "count(age)", "sum(age)",
+                          "min(age)", "max(name)", "avg(age)"])
+        self.assertEqual(aggregator.results(), [
+            (None, 1, 0, None, None, "Eve", None),
+            ("Kazan", 2, 2, 50, 20, "Bob", 25.0),
+        ])
+
+    def test_empty_input_without_group(self) -> None:
+        aggregator = HashAggregator([("count", "*"), ("max", "age")])
+        self.assertEqual(aggregator.results(), [(0, None)])
+
+    def test_check_aggregates(self) -> None:
+        columns = {"id": "int", "name": "str"}
+        check_aggregates([("count", "*"), ("max", "name")], columns, "name")
+        for aggregates, group_by in (([("sum", "name")], None),
+                                     ([("count", "age")], None),
+                                     ([("count", "*")], "age")):
+            with self.assertRaises(ValueError):
+                check_aggregates(aggregates, columns, group_by)
+
+
+class TestAggregateRows(TempDataDirTestCase):
+    def _fill(self, storage: str) -> None:
+        core.create_table("users", {"city": "str", "age": "int"},
+                          storage=storage)
+        core.insert_many("users", ({"city": f"c{number % 3}",
+                                    "age": str(number)} for number in range(30)))
+        core.delete_row_by_id("users", 1)
+
+    def test_streaming_aggregates_in_every_storage(self) -> None:
+        for storage in ("jsonl", "binary", "json"):
+            with self.subTest(storage=storage):
+                self._fill(storage)
+                columns, rows, source = core.aggregate_rows(
+                    "users", [("count", "*"), ("sum", "age"), ("max", "age")],
+                    parse_where("age>=20"), group_by="city")
+                self.assertEqual(columns, ["city", "count(*)", "sum(age)",
+                                           "max(age)"])
+                self.assertEqual(rows, [("c0", 3, 72, 27), ("c1", 3, 75, 28),
+                                        ("c2", 4, 98, 29)])
+                self.assertEqual(source, "stream")
+                core.drop_table("users")
+
+    def test_count_from_storage_and_index(self) -> None:
+        self._fill("jsonl")
+        self.assertEqual(core.aggregate_rows("users", [("count", "*")]),
+                         (["count(*)"], [(29,)], "storage"))
+
+        core.create_index("users", "city")
+        _, rows, source = core.aggregate_rows(
+            "users", [("count", "*")], parse_where("city=c1"))
+        self.assertEqual((rows, source), ([(10,)], "index"))
+        _, rows, source = core.aggregate_rows("users", [("count", "*")],
+                                              group_by="city")
+        self.assertEqual((rows, source),
+                         ([("c0", 9), ("c1", 10), ("c2", 10)], "index"))
+
+    def test_transaction_rows_are_counted(self) -> None:
+        self._fill("binary")
+        core.begin_transaction()
+        core.insert_row("users", {"city": "c9", "age": "1"})
+        core.delete_row_by_id("users", 2)
+        _, rows, source = core.aggregate_rows("users", [("count", "*")])
+        self.assertEqual((rows, source), ([(29,)], "transaction"))
+        core.commit_transaction()
+        self.assertEqual(core.aggregate_rows("users", [("count", "*")])[1],
+                         [(29,)])
+
+
+if __name__ == "__main__":
+    unittest.main()
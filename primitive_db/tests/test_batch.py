@@ -0,0 +1,99 @@
+import io
+import unittest
+from contextlib import redirect_stderr, redirect_stdout
+from pathlib import Path
+
+from primitive_db import core, decorators, engine
+from primitive_db.batch import BatchReport, run_batch, split_statements
+from primitive_db.main import main
+from tests.test_engine import TempDataDirTestCase
+
+
+class TestSplitStatements(unittest.TestCase):
+    def test_lines_semicolons_and_comments(self) -> None:
+        script = "# демо\ncreate users name:str; insert users name=Alice\n\n;list\n"
+        self.assertEqual(list(split_statements(script)),
+                         ["create users name:str", "insert users name=Alice",
+                          "list"])
+
+    def test_file_lines_keep_semicolons(self) -> None:
+        script = "# демо\ninsert notes text=a;b\n\nlist\n"
+        self.assertEqual(list(split_statements(script, None)),
+                         ["insert notes text=a;b", "list"])
+
+
+class TestBatchReport(unittest.TestCase):
+    def test_percentiles(self) -> None:
+        report = BatchReport(latencies=[0.001 * n for n in range(1, 101)],
+                             total_seconds=2.0)
+        self.assertAlmostEqual(report.percentile(0.5), 0.050)
+        self.assertAlmostEqual(report.percentile(0.95), 0.095)
+        self.assertIn("Выполнено команд: 100 за 2.000 с (50.0 команд/с)",
+                      report.format())
+
+
+class TestRunBatch(TempDataDirTestCase):
+    def test_runs_without_prompts_or_timing(self) -> None:
+        output = io.StringIO()
+        with redirect_stdout(output):
+            report = run_batch([
+                "create users name:str",
+                "insert users name=Alice",
+                "select users",
+                "drop users",
+                "exit",
+                "create never name:str",
+            ])
+
+        self.assertEqual(len(report.latencies), 5)
+        self.assertNotIn("выполнена за", output.getvalue())
+        self.assertIn("Alice", output.getvalue())
+        self.assertEqual(engine.load_db_meta(), {})
+        # После пакета консоль снова спрашивает и печатает время
+        self.assertTrue(decorators._CONFIRMATIONS_ENABLED)
+        self.assertFalse(decorators._QUIET)
+
+    def test_open_transaction_is_rolled_back_with_warning(self) -> None:
+        output = io.StringIO()
+        with redirect_stdout(output):
+            run_batch(["create users name:str", "begin",
+                       "insert users name=Alice"])
+
+        self.assertIn("Незафиксированная транзакция отменена.",
+                      output.getvalue())
+        self.assertFalse(core.in_transaction())
+        self.assertEqual(engine.load_table_data("users"), [])
+
+    def test_stdout_has_only_data(self) -> None:
+        output = io.StringIO()
+        with redirect_stdout(output), redirect_stderr(io.StringIO()):
+            main(["-c", ("create users name:str; insert users name=Alice; "
+                         "update users set name=Bob where id=1; select users")])
+
+        lines = output.getvalue().splitlines()
+        self.assertTrue(any("Bob" in line for line in lines))
+        for message in ("Введите 'help'", "создана", "добавлена", "Обновлено",
+                        "[данные"):
+            self.assertFalse(any(message in line for line in lines), message)
+
+    def test_main_runs_script_file(self) -> None:
+        script = Path("script.db")
+        script.write_text("create users name:str\n"
+                          "insert users name=Alice\n"
+                          "insert users name=Bob;Jr\n", encoding="utf-8")
+        report = io.StringIO()
+        with redirect_stdout(io.StringIO()), redirect_stderr(report):
+            main(["-f", str(script)])
+        # Как в консоли: ';' в строке файла — часть значения
+        self.assertEqual([row["name"] for row in engine.load_table_data("users")],
+                         ["Alice", "Bob;Jr"])
+        self.assertIn("Выполнено команд: 3", report.getvalue())
+
+        with redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()):
+            main(["-c", "delete users where id=1; insert users name=Carol"])
+        self.assertEqual([row["name"] for row in engine.load_table_data("users")],
+                         ["Bob;Jr", "Carol"])
+
+
+if __name__ == "__main__":
+    unittest.main()
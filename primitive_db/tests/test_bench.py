@@ -0,0 +1,36 @@
+import argparse
+import random
+from pathlib import Path
+
+from primitive_db import bench, engine
+from tests.test_engine import TempDataDirTestCase
+
+
+class TestBenchmark(TempDataDirTestCase):
+    def test_operations_are_measured(self) -> None:
+        results = bench.benchmark_table(30, samples=5)
+
+        self.assertEqual(list(results), [
+            "bulk_load", "select_cached_miss", "select_cached_hit",
+            "select_where", "insert_row", "update_row_by_id",
+            "delete_row_by_id",
+        ])
+        self.assertEqual(results["bulk_load"]["samples"], 1)
+        self.assertEqual(results["insert_row"]["samples"], 5)
+        for result in results.values():
+            self.assertGreater(result["throughput"], 0)
+            self.assertLessEqual(result["p50_ms"], result["p99_ms"])
+        # 30 загруженных + 5 вставленных - 5 удалённых
+        self.assertEqual(len(engine.load_table_data("bench")), 30)
+        self.assertFalse(Path("bench.csv").exists())
+
+    def test_synthetic_data_is_reproducible(self) -> None:
+        bench.write_synthetic_csv(Path("a.csv"), 20, random.Random(1))
+        bench.write_synthetic_csv(Path("b.csv"), 20, random.Random(1))
+        self.assertEqual(Path("a.csv").read_text(), Path("b.csv").read_text())
+
+    def test_sizes_argument(self) -> None:
+        self.assertEqual(bench._parse_sizes("1_000,10000"), [1000, 10000])
+        for text in ("10k", "0"):
+            with self.assertRaises(argparse.ArgumentTypeError):
+                bench._parse_sizes(text)
@@ -0,0 +1,96 @@
+import sys
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from primitive_db.cache import QueryCache, estimate_rows_size
+
+
+def make_rows(count: int) -> list[dict[str, object]]:
+    return [{"id": number, "name": f"user{number}"} for number in range(count)]
+
+
+class TestQueryCache(unittest.TestCase):
+    def test_hit_and_miss_are_counted(self) -> None:
+        cache = QueryCache()
+        self.assertIsNone(cache.get("users", None))
+        cache.put("users", None, make_rows(3), cache.generation("users"))
+
+        self.assertEqual(len(cache.get("users", None) or []), 3)
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+        self.assertEqual(stats["hit_ratio"], 0.5)
+
+    def test_lru_eviction_by_row_budget(self) -> None:
+        cache = QueryCache(max_rows=5)
+        cache.put("users", ("age", "1"), make_rows(2), 0)
+        cache.put("users", ("age", "2"), make_rows(2), 0)
+        cache.get("users", ("age", "1"))  # делаем первую запись свежей
+        cache.put("users", ("age", "3"), make_rows(2), 0)
+
+        self.assertIsNotNone(cache.get("users", ("age", "1")))
+        self.assertIsNone(cache.get("users", ("age", "2")))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_byte_budget_rejects_oversized_result(self) -> None:
+        rows = make_rows(10)
+        cache = QueryCache(max_bytes=estimate_rows_size(rows) - 1)
+        cache.put("users", None, rows, 0)
+        self.assertEqual(cache.stats()["entries"], 0)
+
+    def test_invalidate_drops_table_and_stale_puts(self) -> None:
+        cache = QueryCache()
+        stale_generation = cache.generation("users")
+        cache.put("users", None, make_rows(1), stale_generation)
+        cache.put("orders", None, make_rows(1), 0)
+        cache.invalidate("users")
+
+        self.assertIsNone(cache.get("users", None))
+        self.assertIsNotNone(cache.get("orders", None))
+        cache.put("users", None, make_rows(1), stale_generation)
+        self.assertIsNone(cache.get("users", None))
+
+    def test_disk_generation_change_invalidates(self) -> None:
+        cache = QueryCache()
+        cache.sync_generation("users", 3)
+        cache.put("users", None, make_rows(1), cache.generation("users"))
+        cache.sync_generation("users", 3)
+        self.assertIsNotNone(cache.get("users", None))
+
+        cache.sync_generation("users", 4)
+        self.assertIsNone(cache.get("users", None))
+        self.assertEqual(cache.stats()["remote_invalidations"], 1)
+
+    def test_concurrent_readers_and_writers(self) -> None:
+        cache = QueryCache(max_rows=50)
+
+        def reader(number: int) -> None:
+            for step in range(2000):
+                predicate = ("age", str((number + step) % 20))
+                generation = cache.generation("users")
+                if cache.get("users", predicate) is None:
+                    cache.put("users", predicate, make_rows(3), generation)
+
+        def writer() -> None:
+            for step in range(500):
+                cache.invalidate("users")
+                cache.sync_generation("users", step)
+            cache.clear()
+
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)  # чаще переключать потоки
+        try:
+            with ThreadPoolExecutor(max_workers=10) as pool:
+                futures = [pool.submit(reader, number) for number in range(8)]
+                futures += [pool.submit(writer) for _ in range(2)]
+                for future in futures:
+                    future.result()  # исключение потока — ошибка теста
+        finally:
+            sys.setswitchinterval(interval)
+
+        stats = cache.stats()
+        self.assertGreaterEqual(stats["rows"], 0)
+        self.assertEqual(stats["rows"], 3 * stats["entries"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+
+from primitive_db.cache import estimate_rows_size
+from primitive_db.columnar import ColumnarTable
+from primitive_db.expressions import (
+    Comparison,
+    compile_predicate,
+    equality_literal,
+    parse_where,
+)
+
+COLUMNS = {"id": "int", "name": "str", "age": "int"}
+
+
+class TestColumnarTable(unittest.TestCase):
+    def setUp(self) -> None:
+        self.rows: list[dict[str, object]] = [
+            {"id": 1, "name": "Alice", "age": 30},
+            {"id": 2, "name": "Bob", "age": None},
+            {"id": 3, "name": None, "age": 30},
+            {"id": 4, "name": "Alice", "age": 25},
+        ]
+        self.table = ColumnarTable.from_rows(COLUMNS, self.rows)
+
+    def test_round_trip(self) -> None:
+        self.assertEqual(len(self.table), 4)
+        self.assertEqual(list(self.table), self.rows)
+
+    def test_find_equal_matches_typed_comparison(self) -> None:
+        for column, text in (("age", "30"), ("name", "Alice"),
+                             ("age", "None"), ("name", "None"),
+                             ("age", "030"), ("name", "Carol")):
+            literal = equality_literal(column, text, COLUMNS)
+            predicate = compile_predicate(Comparison(column, "=", text), COLUMNS)
+            positions = self.table.find_equal(column, literal)
+            self.assertEqual(
+                [self.rows[position] for position in positions],
+                [row for row in self.rows if predicate(row)],
+                (column, text),
+            )
+
+    def test_find_where_matches_predicate(self) -> None:
+        self.table.append({"id": 5, "name": "Big", "age": 2**70})
+        self.rows.append({"id": 5, "name": "Big", "age": 2**70})
+        for text in ("age>=30", "age!=30", "name!=Alice", "name<Bob",
+                     "age=abc", "age!=abc", "name in (Alice, None, Big)",
+                     "age in (25, x)", "not age=30",
+                     "age=30 and not name=Alice",
+                     "name=Bob or age<26 or id>4",
+                     "not (age>20 and (name=Alice or id=3))"):
+            predicate = compile_predicate(parse_where(text), COLUMNS)
+            positions = self.table.find_where(parse_where(text))
+            self.assertEqual(
+                [self.rows[position] for position in positions],
+                [row for row in self.rows if predicate(row)],
+                text,
+            )
+
+    def test_take_builds_subset(self) -> None:
+        subset = self.table.take(self.table.find_equal("name", "Alice"))
+        self.assertEqual([row["id"] for row in subset], [1, 4])
+
+    def test_huge_int_falls_back_to_object_column(self) -> None:
+        self.table.append({"id": 5, "name": "Big", "age": 2**70})
+        self.assertEqual(list(self.table)[-1]["age"], 2**70)
+        self.assertEqual(self.table.find_equal("age", 30), [0, 2])
+
+    def test_uses_less_memory_than_dicts(self) -> None:
+        rows = [{"id": number, "name": f"user{number % 10}", "age": number % 90}
+                for number in range(1000)]
+        table = ColumnarTable.from_rows(COLUMNS, rows)
+        self.assertLess(table.nbytes, estimate_rows_size(rows) / 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
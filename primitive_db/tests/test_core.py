@@ -0,0 +1,290 @@
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from primitive_db import core, engine
+from primitive_db.constants import ID_BLOCK_SIZE
+from primitive_db.expressions import parse_where
+from tests.test_engine import TempDataDirTestCase
+
+
+class TestInsertMany(TempDataDirTestCase):
+    def test_insert_many_reserves_ids_once(self) -> None:
+        core.create_table("users", {"name": "str", "age": "int"})
+        core.insert_row("users", {"name": "Alice", "age": "30"})
+
+        count = core.insert_many(
+            "users",
+            ({"name": f"user{number}", "age": str(number)} for number in range(3)),
+        )
+
+        self.assertEqual(count, 3)
+        self.assertEqual([row["id"] for row in engine.load_table_data("users")],
+                         [1, 2, 3, 4])
+        self.assertEqual(engine.load_db_meta()["users"]["next_id"], 5)
+
+    def test_bad_row_leaves_table_unchanged(self) -> None:
+        core.create_table("users", {"name": "str", "age": "int"})
+        core.insert_row("users", {"name": "Alice", "age": "30"})
+
+        with self.assertRaises(ValueError):
+            core.insert_many("users", [{"name": "Bob", "age": "25"},
+                                       {"name": "Eve", "age": "old"}])
+
+        self.assertEqual([row["name"] for row in engine.load_table_data("users")],
+                         ["Alice"])
+        self.assertEqual(engine.load_db_meta()["users"]["next_id"], 2)
+        core.insert_row("users", {"name": "Carol"})
+        self.assertEqual(engine.get_table_row("users", 2),
+                         {"id": 2, "name": "Carol", "age": None})
+
+    def test_load_csv_and_jsonl(self) -> None:
+        core.create_table("users", {"name": "str", "age": "int"})
+        Path("users.csv").write_text("name,age\nAlice,30\nBob,\n", encoding="utf-8")
+        Path("users.jsonl").write_text('{"name": "Carol", "age": 41}\n',
+                                       encoding="utf-8")
+
+        self.assertEqual(core.load_table_from_file("users", "users.csv"), 2)
+        self.assertEqual(core.load_table_from_file("users", "users.jsonl"), 1)
+        self.assertEqual(
+            engine.load_table_data("users"),
+            [
+                {"id": 1, "name": "Alice", "age": 30},
+                {"id": 2, "name": "Bob", "age": None},
+                {"id": 3, "name": "Carol", "age": 41},
+            ],
+        )
+
+    def test_load_rejects_malformed_rows(self) -> None:
+        core.create_table("users", {"name": "str", "age": "int"})
+        cases = {
+            "array.jsonl": ('{"name": "Alice"}\n\n[1, 2]\n', "Строка 3"),
+            "broken.jsonl": ('{"name": "Alice"}\n{"name": \n', "Строка 2"),
+            "float.jsonl": ('{"age": 3.7}\n', "3.7"),
+            "bool.jsonl": ('{"age": true}\n', "True"),
+            "extra.csv": ("name,age\nAlice,30\nBob,25,x\n", "полей больше"),
+        }
+        for file_name, (text, message) in cases.items():
+            with self.subTest(file_name):
+                Path(file_name).write_text(text, encoding="utf-8")
+                with self.assertRaisesRegex(ValueError, message):
+                    core.load_table_from_file("users", file_name)
+        self.assertEqual(engine.load_table_data("users"), [])
+
+        Path("ok.jsonl").write_text('{"age": 7}\n{"age": "8"}\n',
+                                    encoding="utf-8")
+        core.load_table_from_file("users", "ok.jsonl")
+        self.assertEqual([row["age"] for row in engine.load_table_data("users")],
+                         [7, 8])
+
+
+class TestStreamingSelect(TempDataDirTestCase):
+    def test_limit_offset_for_each_storage(self) -> None:
+        for storage in ("json", "jsonl", "binary"):
+            with self.subTest(storage=storage):
+                table_name = f"users_{storage}"
+                core.create_table(table_name, {"age": "int"}, storage=storage)
+                core.insert_many(table_name,
+                                 ({"age": str(number % 3)} for number in range(20)))
+                core.update_row_by_id(table_name, 2, {"age": "7"})
+
+                columns, rows, source = core.iter_select_rows(
+                    table_name, limit=3, offset=1)
+                self.assertEqual(columns, ["id", "age"])
+                self.assertEqual(source, "stream")
+                self.assertEqual(list(rows), [{"id": 2, "age": 7},
+                                              {"id": 3, "age": 2},
+                                              {"id": 4, "age": 0}])
+
+                _, rows, _ = core.iter_select_rows(table_name, {"age": "0"},
+                                                   limit=2)
+                self.assertEqual([row["id"] for row in rows], [1, 4])
+
+    def test_stream_stops_early(self) -> None:
+        core.create_table("users", {"age": "int"})
+        core.insert_many("users", ({"age": "1"} for _ in range(100)))
+        _, rows, _ = core.iter_select_rows("users", limit=2)
+        with mock.patch.object(engine.json, "loads",
+                               wraps=engine.json.loads) as loads:
+            self.assertEqual(len(list(rows)), 2)
+        self.assertEqual(loads.call_count, 2)
+
+
+class TestSelectCache(TempDataDirTestCase):
+    def test_filtered_select_is_cached_until_write(self) -> None:
+        core.create_table("users", {"name": "str"})
+        core.insert_row("users", {"name": "Alice"})
+
+        self.assertEqual(core.select_rows_where("users", "name", "Alice")[1], "disk")
+        self.assertEqual(core.select_rows_where("users", "name", "Alice")[1], "cache")
+
+        core.insert_row("users", {"name": "Alice"})
+        rows, source = core.select_rows_where("users", "name", "Alice")
+        self.assertEqual(source, "disk")
+        self.assertEqual(len(rows), 2)
+
+    def test_write_from_other_process_invalidates_cache(self) -> None:
+        core.create_table("users", {"name": "str"})
+        core.insert_row("users", {"name": "Alice"})
+        core.select_rows_cached("users")
+        self.assertTrue(core.select_rows_cached("users")[1])
+
+        # Запись мимо core — как будто её сделал другой процесс
+        engine.append_table_row("users", {"id": 2, "name": "Bob"})
+
+        rows, from_cache = core.select_rows_cached("users")
+        self.assertFalse(from_cache)
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(core.get_cache_stats()["remote_invalidations"], 1)
+
+
+class TestWhereExpressions(TempDataDirTestCase):
+    def test_select_by_expression_is_cached(self) -> None:
+        core.create_table("users", {"name": "str", "age": "int"})
+        core.insert_many("users", ({"name": name, "age": str(age)}
+                                   for name, age in [("Alice", 9), ("Bob", 30),
+                                                     ("Carol", 45)]))
+        condition = parse_where("age>10 and name!=Carol")
+
+        rows, source = core.select_rows_matching("users", condition)
+        self.assertEqual(([row["name"] for row in rows], source), (["Bob"], "disk"))
+        self.assertEqual(core.select_rows_matching("users", condition)[1], "cache")
+
+        _, rows_iter, source = core.iter_select_rows(
+            "users", condition=parse_where("age>=9"), limit=2, offset=1)
+        self.assertEqual(([row["name"] for row in rows_iter], source),
+                         (["Bob", "Carol"], "stream"))
+
+    def test_update_and_delete_where(self) -> None:
+        for storage in ("json", "jsonl", "binary"):
+            with self.subTest(storage=storage):
+                table_name = f"users_{storage}"
+                core.create_table(table_name, {"age": "int"}, storage=storage)
+                core.insert_many(table_name,
+                                 ({"age": str(age)} for age in range(10)))
+
+                self.assertEqual(core.update_rows_where(
+                    table_name, parse_where("age>=7"), {"age": "100"}), 3)
+                self.assertEqual(core.delete_rows_where(
+                    table_name, parse_where("age<3 or age=100")), 6)
+                self.assertEqual(
+                    [row["age"] for row in engine.load_table_data(table_name)],
+                    [3, 4, 5, 6])
+
+    def test_simple_equality_agrees_with_expressions(self) -> None:
+        for indexed in (False, True):
+            with self.subTest(indexed=indexed):
+                table_name = f"u_{int(indexed)}"
+                core.create_table(table_name, {"name": "str", "age": "int"})
+                core.insert_row(table_name, {"name": "A", "age": "30"})
+                core.insert_row(table_name, {"age": "31"})
+                if indexed:
+                    core.create_index(table_name, "age")
+                    core.create_index(table_name, "name")
+
+                for where, expected in (("age=030", [1]), ("name=None", []),
+                                        ("age=abc", [])):
+                    condition = parse_where(where)
+                    field, value = where.split("=")
+                    rows, _ = core.select_rows_where(table_name, field, value)
+                    self.assertEqual([row["id"] for row in rows], expected)
+                    _, rows_iter, _ = core.iter_select_rows(
+                        table_name, {field: value})
+                    self.assertEqual([row["id"] for row in rows_iter], expected)
+                    _, counts, _ = core.aggregate_rows(
+                        table_name, [("count", "*")], condition)
+                    self.assertEqual(counts, [(len(expected),)])
+                    self.assertEqual(core.update_rows_where(
+                        table_name, condition, {"name": "B"}), len(expected))
+
+                rows, _ = core.select_rows_matching(table_name,
+                                                    parse_where("age in (030)"))
+                self.assertEqual([row["id"] for row in rows], [1])
+
+    def test_update_where_in_transaction(self) -> None:
+        core.create_table("users", {"age": "int"})
+        core.insert_many("users", ({"age": str(age)} for age in range(4)))
+
+        core.begin_transaction()
+        self.assertEqual(core.update_rows_where(
+            "users", parse_where("age in (1, 2)"), {"age": "0"}), 2)
+        rows, source = core.select_rows_matching("users", parse_where("age=0"))
+        self.assertEqual((len(rows), source), (3, "transaction"))
+        core.rollback_transaction()
+
+        self.assertEqual([row["age"] for row in engine.load_table_data("users")],
+                         [0, 1, 2, 3])
+
+
+class TestTransactions(TempDataDirTestCase):
+    def test_commit_writes_each_table_once(self) -> None:
+        for storage in ("json", "jsonl", "binary"):
+            with self.subTest(storage=storage):
+                table = f"users_{storage}"
+                core.create_table(table, {"name": "str", "age": "int"}, storage)
+                core.insert_row(table, {"name": "Alice", "age": "30"})
+                generation = engine.read_table_generation(table)
+
+                core.begin_transaction()
+                for age in range(31, 41):
+                    core.update_row_by_id(table, 1, {"age": age})
+                core.insert_row(table, {"name": "Bob"})
+                core.delete_row_by_id(table, 1)
+                rows, source = core.select_rows_where(table, "name", "Bob")
+                self.assertEqual((len(rows), source), (1, "transaction"))
+                self.assertEqual(engine.read_table_generation(table), generation)
+                self.assertEqual(len(engine.load_table_data(table)), 1)
+
+                self.assertEqual(core.commit_transaction(), [table])
+                self.assertEqual(engine.read_table_generation(table),
+                                 generation + 1)
+                self.assertEqual(engine.load_table_data(table),
+                                 [{"id": 2, "name": "Bob", "age": None}])
+                # id 2 взят из блока, зарезервированного первой вставкой
+                self.assertEqual(engine.load_db_meta()[table]["next_id"],
+                                 1 + ID_BLOCK_SIZE)
+
+    def test_rollback_discards_changes(self) -> None:
+        core.create_table("users", {"name": "str"})
+        core.create_index("users", "name")
+        core.insert_row("users", {"name": "Alice"})
+
+        core.begin_transaction()
+        core.insert_many("users", [{"name": "Bob"}, {"name": "Eve"}])
+        self.assertEqual(len(core.select_rows_cached("users")[0]), 3)
+        core.rollback_transaction()
+
+        self.assertEqual(len(core.select_rows_cached("users")[0]), 1)
+        self.assertEqual(core.select_rows_where("users", "name", "Bob")[0].column_names,
+                         ["id", "name"])
+        self.assertEqual(len(core.select_rows_where("users", "name", "Bob")[0]), 0)
+        self.assertEqual(engine.load_db_meta()["users"]["next_id"],
+                         1 + ID_BLOCK_SIZE)
+
+    def test_commit_refreshes_indexes(self) -> None:
+        core.create_table("users", {"name": "str"})
+        core.create_index("users", "name")
+
+        core.begin_transaction()
+        core.insert_row("users", {"name": "Alice"})
+        core.commit_transaction()
+
+        rows, source = core.select_rows_where("users", "name", "Alice")
+        self.assertEqual((len(rows), source), (1, "index"))
+
+    def test_ddl_and_nesting_rejected(self) -> None:
+        core.create_table("users", {"name": "str"})
+        core.begin_transaction()
+        with self.assertRaises(ValueError):
+            core.begin_transaction()
+        with self.assertRaises(ValueError):
+            core.drop_table("users")
+        with self.assertRaises(ValueError):
+            core.create_table("items", {"title": "str"})
+        core.rollback_transaction()
+        with self.assertRaises(ValueError):
+            core.commit_transaction()
+
+
+if __name__ == "__main__":
+    unittest.main()
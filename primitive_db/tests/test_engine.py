@@ -0,0 +1,394 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from typing import Any
+from unittest import mock
+
+from primitive_db import binary_storage, core, engine, ids, indexes
+from primitive_db.expressions import parse_where
+
+
+class TempDataDirTestCase(unittest.TestCase):
+    """Запускает тест во временной папке, чтобы не трогать data/ проекта."""
+
+    def setUp(self) -> None:
+        self._old_cwd = os.getcwd()
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        os.chdir(self._tmp_dir.name)
+        core.clear_query_cache()
+        engine._PK_INDEXES.clear()
+        engine._META_CACHE = None
+        indexes._COLUMN_INDEXES.clear()
+        ids.reset_id_blocks()
+        core._TRANSACTION.set(None)
+
+    def tearDown(self) -> None:
+        os.chdir(self._old_cwd)
+        self._tmp_dir.cleanup()
+        core.clear_query_cache()
+        engine._PK_INDEXES.clear()
+        engine._META_CACHE = None
+        indexes._COLUMN_INDEXES.clear()
+        ids.reset_id_blocks()
+        core._TRANSACTION.set(None)
+
+
+class TestMetaCache(TempDataDirTestCase):
+    def test_repeated_loads_hit_cache(self) -> None:
+        engine.save_db_meta({"users": {"columns": {"id": "int"}, "next_id": 1}})
+        before = engine.get_meta_cache_stats()
+
+        first = engine.load_db_meta()
+        first["users"]["next_id"] = 100  # копия не должна портить кэш
+        second = engine.load_db_meta()
+
+        after = engine.get_meta_cache_stats()
+        self.assertEqual(after["hits"] - before["hits"], 2)
+        self.assertEqual(after["misses"], before["misses"])
+        self.assertEqual(second["users"]["next_id"], 1)
+
+    def test_external_edit_is_detected(self) -> None:
+        engine.save_db_meta({})
+        engine.load_db_meta()
+
+        # Другой процесс переписал файл
+        engine.DB_META_FILE.write_text('{"t": {"columns": {}, "next_id": 7}}',
+                                       encoding="utf-8")
+        meta_stat = engine.DB_META_FILE.stat()
+        os.utime(engine.DB_META_FILE,
+                 ns=(meta_stat.st_atime_ns, meta_stat.st_mtime_ns + 1_000_000))
+        misses = engine.get_meta_cache_stats()["misses"]
+
+        self.assertEqual(engine.load_db_meta()["t"]["next_id"], 7)
+        self.assertEqual(engine.get_meta_cache_stats()["misses"], misses + 1)
+
+
+class TestTableMetaFiles(TempDataDirTestCase):
+    def test_write_touches_only_own_schema_file(self) -> None:
+        core.create_table("users", {"name": "str"})
+        core.create_table("logs", {"text": "str"})
+        catalog = json.loads(engine.DB_META_FILE.read_text(encoding="utf-8"))
+        self.assertEqual(catalog, {"users": {"schema_file": "users.meta.json"},
+                                   "logs": {"schema_file": "logs.meta.json"}})
+        signatures = {path: path.stat().st_mtime_ns for path in (
+            engine.DB_META_FILE, engine.get_table_meta_path("users"),
+            engine.get_table_meta_path("logs"))}
+
+        time.sleep(0.01)
+        core.create_index("users", "name")
+
+        self.assertEqual(
+            [path.name for path, mtime in signatures.items()
+             if path.stat().st_mtime_ns != mtime], ["users.meta.json"])
+        self.assertEqual(engine.load_db_meta()["users"]["indexes"], ["name"])
+
+    def test_old_inline_schemas_move_to_files(self) -> None:
+        engine.ensure_data_dir_exists()
+        engine.DB_META_FILE.write_text(json.dumps(
+            {"t": {"columns": {"id": "int"}, "next_id": 7}}), encoding="utf-8")
+        meta = engine.load_db_meta()
+        self.assertEqual(meta["t"]["next_id"], 7)
+
+        engine.save_db_meta(meta)
+        self.assertEqual(
+            json.loads(engine.DB_META_FILE.read_text(encoding="utf-8")),
+            {"t": {"schema_file": "t.meta.json"}})
+        engine._META_CACHE = None
+        self.assertEqual(engine.load_db_meta(), meta)
+
+    def test_drop_removes_schema_file(self) -> None:
+        core.create_table("users", {"name": "str"})
+        core.drop_table("users")
+        self.assertFalse(engine.get_table_meta_path("users").exists())
+        self.assertEqual(engine.load_db_meta(), {})
+
+    def test_other_process_edit_rereads_only_that_file(self) -> None:
+        core.create_table("users", {"name": "str"})
+        core.create_table("logs", {"text": "str"})
+        engine.load_db_meta()
+
+        schema_path = engine.get_table_meta_path("logs")
+        schema = json.loads(schema_path.read_text(encoding="utf-8"))
+        schema["indexes"] = ["text"]
+        schema_path.write_text(json.dumps(schema), encoding="utf-8")
+        file_stat = schema_path.stat()
+        os.utime(schema_path,
+                 ns=(file_stat.st_atime_ns, file_stat.st_mtime_ns + 1_000_000))
+
+        with mock.patch.object(engine, "_read_json_file",
+                               wraps=engine._read_json_file) as read_json:
+            meta = engine.load_db_meta()
+        self.assertEqual(meta["logs"]["indexes"], ["text"])
+        self.assertEqual([call.args[0].name for call in read_json.call_args_list],
+                         ["db_meta.json", "logs.meta.json"])
+
+
+class TestLogStorage(TempDataDirTestCase):
+    def test_insert_appends_one_log_line(self) -> None:
+        core.create_table("users", {"name": "str", "age": "int"})
+        core.insert_row("users", {"name": "Alice", "age": "30"})
+        core.insert_row("users", {"name": "Bob", "age": "25"})
+
+        log_path = engine.get_table_log_path("users")
+        self.assertEqual(len(log_path.read_text(encoding="utf-8").splitlines()), 2)
+        self.assertEqual(
+            engine.load_table_data("users"),
+            [
+                {"id": 1, "name": "Alice", "age": 30},
+                {"id": 2, "name": "Bob", "age": 25},
+            ],
+        )
+
+    def test_update_and_delete_are_replayed(self) -> None:
+        core.create_table("users", {"name": "str", "age": "int"})
+        core.insert_row("users", {"name": "Alice", "age": "30"})
+        core.insert_row("users", {"name": "Bob", "age": "25"})
+        core.update_row_by_id("users", 1, {"age": "31"})
+        core.delete_row_by_id("users", 2)
+
+        self.assertEqual(
+            engine.load_table_data("users"),
+            [{"id": 1, "name": "Alice", "age": 31}],
+        )
+        engine.save_table_data("users", engine.load_table_data("users"))
+        log_lines = engine.get_table_log_path("users").read_text(
+            encoding="utf-8").splitlines()
+        self.assertEqual(len(log_lines), 1)
+
+    def test_truncated_last_record_is_ignored(self) -> None:
+        core.create_table("users", {"name": "str"})
+        core.insert_row("users", {"name": "Alice"})
+        with engine.get_table_log_path("users").open("a", encoding="utf-8") as f:
+            f.write('{"op":"put","row":{"id":2,')
+
+        self.assertEqual(engine.load_table_data("users"),
+                         [{"id": 1, "name": "Alice"}])
+
+    def test_legacy_json_table_keeps_working(self) -> None:
+        core.create_table("users", {"name": "str"}, storage="json")
+        core.insert_row("users", {"name": "Alice"})
+        core.update_row_by_id("users", 1, {"name": "Alicia"})
+
+        self.assertTrue(engine.get_table_file_path("users").exists())
+        self.assertFalse(engine.get_table_log_path("users").exists())
+        self.assertEqual(engine.load_table_data("users"),
+                         [{"id": 1, "name": "Alicia"}])
+
+
+class TestPrimaryKeyIndex(TempDataDirTestCase):
+    def test_get_row_reads_record_by_offset(self) -> None:
+        core.create_table("users", {"name": "str"})
+        for name in ("Alice", "Bob", "Carol"):
+            core.insert_row("users", {"name": name})
+        core.update_row_by_id("users", 2, {"name": "Bobby"})
+        core.delete_row_by_id("users", 3)
+
+        self.assertEqual(engine.get_table_row("users", 2),
+                         {"id": 2, "name": "Bobby"})
+        self.assertIsNone(engine.get_table_row("users", 3))
+        with self.assertRaises(ValueError):
+            core.delete_row_by_id("users", 3)
+
+    def test_index_catches_up_from_saved_watermark(self) -> None:
+        core.create_table("users", {"name": "str"})
+        core.insert_row("users", {"name": "Alice"})
+        engine._save_pk_index_file("users", engine.get_pk_index("users"))
+        core.insert_row("users", {"name": "Bob"})
+
+        # Новый процесс: индекс читается из файла и дочитывает хвост журнала
+        engine._PK_INDEXES.clear()
+        indexes._COLUMN_INDEXES.clear()
+        index = engine.get_pk_index("users")
+        self.assertEqual(sorted(index.positions), [1, 2])
+        self.assertEqual(index.log_size,
+                         engine.get_table_log_path("users").stat().st_size)
+
+    def test_log_is_compacted_when_mostly_dead(self) -> None:
+        core.create_table("users", {"name": "str"})
+        core.insert_row("users", {"name": "Alice"})
+        with mock.patch.object(engine, "LOG_COMPACT_MIN_DEAD_RECORDS", 3):
+            for number in range(5):
+                core.update_row_by_id("users", 1, {"name": f"Alice{number}"})
+
+        index = engine.get_pk_index("users")
+        self.assertLess(index.records, 6)
+        self.assertEqual(engine.get_table_row("users", 1),
+                         {"id": 1, "name": "Alice4"})
+
+
+class TestBinaryStorage(TempDataDirTestCase):
+    def _fill_users(self) -> None:
+        core.create_table("users", {"name": "str", "age": "int"},
+                          storage="binary")
+        core.insert_row("users", {"name": "Alice", "age": "30"})
+        core.insert_many("users", [{"name": "Bob"},
+                                   {"name": "Кэрол", "age": "-5"}])
+
+    def test_round_trip_and_point_lookup(self) -> None:
+        self._fill_users()
+        self.assertEqual(engine.get_table_storage("users"), "binary")
+        self.assertEqual(
+            engine.load_table_data("users"),
+            [
+                {"id": 1, "name": "Alice", "age": 30},
+                {"id": 2, "name": "Bob", "age": None},
+                {"id": 3, "name": "Кэрол", "age": -5},
+            ],
+        )
+        row = engine.get_table_row("users", 3)
+        assert row is not None
+        self.assertEqual(row["name"], "Кэрол")
+        self.assertIsNone(engine.get_table_row("users", 4))
+
+    def test_update_in_place_keeps_file_size(self) -> None:
+        self._fill_users()
+        table_path, heap_path = engine.get_table_binary_paths("users")
+        table_size = table_path.stat().st_size
+        heap_size = heap_path.stat().st_size
+
+        core.update_row_by_id("users", 2, {"age": "41"})
+        self.assertEqual(table_path.stat().st_size, table_size)
+        self.assertEqual(heap_path.stat().st_size, heap_size)
+
+        core.update_row_by_id("users", 1, {"name": "Alicia"})
+        self.assertEqual(table_path.stat().st_size, table_size)
+        self.assertEqual(engine.get_table_row("users", 1),
+                         {"id": 1, "name": "Alicia", "age": 30})
+        row = engine.get_table_row("users", 2)
+        assert row is not None
+        self.assertEqual(row["age"], 41)
+
+    def test_delete_and_compaction(self) -> None:
+        self._fill_users()
+        core.delete_row_by_id("users", 2)
+        self.assertIsNone(engine.get_table_row("users", 2))
+        self.assertEqual([row["id"] for row in engine.load_table_data("users")],
+                         [1, 3])
+
+        engine.save_table_data("users", engine.load_table_data("users"))
+        self.assertEqual([row["id"] for row in engine.load_table_data("users")],
+                         [1, 3])
+        row = engine.get_table_row("users", 3)
+        assert row is not None
+        self.assertEqual(row["age"], -5)
+
+    def test_dead_rows_and_heap_bytes_are_reclaimed(self) -> None:
+        self._fill_users()
+        table_path, heap_path = engine.get_table_binary_paths("users")
+        core.update_row_by_id("users", 1, {"name": "Alicia"})
+        core.delete_row_by_id("users", 2)
+        core.delete_row_by_id("users", 3)
+        garbage = binary_storage.read_binary_garbage(table_path, heap_path)
+        # "Alice", "Bob" и "Кэрол" (5 + 3 + 10 байт) больше не нужны
+        self.assertEqual((garbage.live_rows, garbage.dead_rows), (1, 2))
+        self.assertEqual(garbage.dead_heap_bytes, 18)
+
+        with mock.patch.object(engine, "BINARY_COMPACT_MIN_DEAD_ROWS", 3), \
+                mock.patch.object(engine,
+                                  "BINARY_COMPACT_MIN_DEAD_HEAP_BYTES", 40):
+            for number in range(4):
+                core.insert_row("users", {"name": "tmp"})
+                core.delete_row_by_id("users", 4 + number)
+            garbage = binary_storage.read_binary_garbage(table_path, heap_path)
+            self.assertLessEqual(garbage.dead_rows, 3)
+            for number in range(10):
+                core.update_row_by_id("users", 1, {"name": f"Alicia{number}"})
+
+        garbage = binary_storage.read_binary_garbage(table_path, heap_path)
+        self.assertLessEqual(garbage.dead_heap_bytes, 40)
+        self.assertLess(heap_path.stat().st_size, 60)
+        self.assertEqual(engine.load_table_data("users"),
+                         [{"id": 1, "name": "Alicia9", "age": 30}])
+
+    def test_int_out_of_range_is_rejected(self) -> None:
+        core.create_table("nums", {"value": "int"}, storage="binary")
+        with self.assertRaises(ValueError):
+            core.insert_row("nums", {"value": str(2**70)})
+        self.assertEqual(engine.load_table_data("nums"), [])
+
+
+
+class _CompactJsonStorage(engine.StorageEngine):
+    """Формат для теста: только paths, load_rows и write_rows."""
+
+    name = "compact"
+
+    def paths(self, table_name: str) -> list[Path]:
+        return [engine.DATA_DIR / f"{table_name}.compact"]
+
+    def load_rows(self, table_name: str) -> list[dict[str, Any]]:
+        path = self.paths(table_name)[0]
+        if not path.exists():
+            return []
+        return json.loads(path.read_text(encoding="utf-8"))
+
+    def write_rows(self, table_name: str, rows: list[dict[str, Any]],
+                   columns: dict[str, str] | None,
+                   compression: str | None) -> None:
+        engine.ensure_data_dir_exists()
+        self.paths(table_name)[0].write_text(json.dumps(rows),
+                                             encoding="utf-8")
+
+
+class TestStorageEngines(TempDataDirTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        engine.register_storage_engine(_CompactJsonStorage())
+        self.addCleanup(engine._STORAGE_ENGINES.pop, "compact")
+
+    def test_registered_engine_is_used_by_core(self) -> None:
+        self.assertIn("compact", engine.list_storage_engines())
+        core.create_table("users", {"name": "str", "age": "int"},
+                          storage="compact")
+        core.insert_many("users", [{"name": "Alice", "age": "30"},
+                                   {"name": "Bob", "age": "40"}])
+        core.insert_row("users", {"name": "Carol", "age": "50"})
+        core.update_rows_where("users", parse_where("age>=40"), {"age": "1"})
+        core.delete_row_by_id("users", 1)
+
+        self.assertEqual(engine.get_table_storage("users"), "compact")
+        self.assertEqual(engine.load_db_meta()["users"]["storage"], "compact")
+        self.assertEqual(engine.get_table_row("users", 3),
+                         {"id": 3, "name": "Carol", "age": 1})
+        table, _ = core.select_rows_matching("users", parse_where("age=1"))
+        self.assertEqual(len(table), 2)
+
+        core.convert_table("users", "jsonl")
+        self.assertFalse(Path("data/users.compact").exists())
+        self.assertEqual(len(engine.load_table_data("users")), 2)
+
+    def test_storage_comes_from_schema(self) -> None:
+        core.create_table("users", {"name": "str"}, storage="compact")
+        core.insert_row("users", {"name": "Alice"})
+        # Посторонний файл другого формата не меняет формат таблицы
+        engine.get_table_file_path("users").write_text("[]", encoding="utf-8")
+
+        self.assertEqual(engine.get_table_storage("users"), "compact")
+        self.assertEqual(engine.load_table_data("users"),
+                         [{"id": 1, "name": "Alice"}])
+
+    def test_legacy_schema_without_storage_uses_files(self) -> None:
+        engine.save_db_meta({"users": {"columns": {"id": "int"},
+                                       "next_id": 2}})
+        engine.save_table_data("users", [{"id": 1}], storage="compact")
+        self.assertEqual(engine.get_table_storage("users"), "compact")
+
+    def test_engine_must_define_storage_methods(self) -> None:
+        self.assertEqual(engine.StorageEngine.__abstractmethods__,
+                         frozenset({"paths", "load_rows", "write_rows"}))
+
+    def test_unknown_storage_and_compression(self) -> None:
+        with self.assertRaises(ValueError):
+            engine.get_storage_engine("csv")
+        with self.assertRaises(ValueError):
+            core.create_table("logs", {"msg": "str"}, storage="csv")
+        with self.assertRaises(ValueError):
+            core.create_table("logs", {"msg": "str"}, storage="compact",
+                              compression="zlib")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+
+from primitive_db.expressions import (
+    And,
+    Comparison,
+    InList,
+    Not,
+    Or,
+    compile_predicate,
+    parse_where,
+)
+
+COLUMNS = {"id": "int", "name": "str", "age": "int"}
+
+
+def _matching(text: str, rows: list[dict[str, object]]) -> list[object]:
+    predicate = compile_predicate(parse_where(text), COLUMNS)
+    return [row["id"] for row in rows if predicate(row)]
+
+
+class TestParseWhere(unittest.TestCase):
+    def test_precedence_and_parentheses(self) -> None:
+        self.assertEqual(
+            parse_where("age>30 or name=Bob and not age<=5"),
+            Or(Comparison("age", ">", "30"),
+               And(Comparison("name", "=", "Bob"),
+                   Not(Comparison("age", "<=", "5")))),
+        )
+        self.assertEqual(
+            parse_where("(age != 1 OR age=2) AND name in ('Ann Lee', Bob)"),
+            And(Or(Comparison("age", "!=", "1"), Comparison("age", "=", "2")),
+                InList("name", ("Ann Lee", "Bob"))),
+        )
+
+    def test_syntax_errors(self) -> None:
+        for text in ("", "age>", "age 30", "(age=1", "age=1 age=2",
+                     "name in (a b)", "and=1"):
+            with self.subTest(text=text), self.assertRaises(ValueError):
+                parse_where(text)
+
+
+class TestCompilePredicate(unittest.TestCase):
+    def setUp(self) -> None:
+        self.rows: list[dict[str, object]] = [
+            {"id": 1, "name": "Alice", "age": 9},
+            {"id": 2, "name": "Bob", "age": 30},
+            {"id": 3, "name": "Carol", "age": None},
+        ]
+
+    def test_int_columns_compare_as_numbers(self) -> None:
+        # Как строки "9" > "30", а как числа — нет
+        self.assertEqual(_matching("age>10", self.rows), [2])
+        self.assertEqual(_matching("age in (9, 30)", self.rows), [1, 2])
+        self.assertEqual(_matching("age!=9", self.rows), [2, 3])
+        self.assertEqual(_matching("name>=Bob and not id=3", self.rows), [2])
+
+    def test_bad_literals_and_columns(self) -> None:
+        self.assertEqual(_matching("age=old", self.rows), [])
+        with self.assertRaises(ValueError):
+            _matching("age>old", self.rows)
+        with self.assertRaises(ValueError):
+            _matching("email=x", self.rows)
+
+
+if __name__ == "__main__":
+    unittest.main()
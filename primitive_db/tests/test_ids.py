@@ -0,0 +1,83 @@
+from unittest import mock
+
+from primitive_db import core, engine, ids
+from primitive_db.constants import ID_BLOCK_SIZE
+from tests.test_engine import TempDataDirTestCase
+
+
+class TestIdAllocator(TempDataDirTestCase):
+    def test_block_is_reserved_once(self) -> None:
+        allocator = ids.IdAllocator(block_size=3)
+        schema = {"next_id": 1, "uid": "a"}
+
+        issued = [allocator.allocate("t", schema) for _ in range(4)]
+        self.assertEqual(issued, [(1, True), (2, False), (3, False), (4, True)])
+        self.assertEqual(schema["next_id"], 7)
+
+    def test_block_of_recreated_table_is_dropped(self) -> None:
+        allocator = ids.IdAllocator(block_size=3)
+        allocator.allocate("t", {"next_id": 1, "uid": "a"})
+
+        # Таблицу пересоздали и загрузили в неё строки дальше конца блока
+        schema = {"next_id": 10, "uid": "b"}
+        self.assertIsNone(allocator.take("t", schema))
+        self.assertEqual(allocator.allocate("t", schema), (10, True))
+
+    def test_release_returns_rest_of_last_block(self) -> None:
+        allocator = ids.IdAllocator(block_size=10)
+        schema = {"next_id": 1, "uid": "a"}
+        allocator.allocate("t", schema)
+        allocator.allocate("t", schema)
+        self.assertEqual(allocator.unused("t", schema), 8)
+
+        self.assertTrue(allocator.release("t", schema))
+        self.assertEqual(schema["next_id"], 3)
+        self.assertEqual(allocator.tables(), [])
+
+    def test_release_keeps_blocks_of_other_processes(self) -> None:
+        allocator = ids.IdAllocator(block_size=10)
+        allocator.allocate("t", {"next_id": 1, "uid": "a"})
+
+        # После нашего блока свой зарезервировал другой процесс
+        schema = {"next_id": 21, "uid": "a"}
+        self.assertFalse(allocator.release("t", schema))
+        self.assertEqual(schema["next_id"], 21)
+
+
+class TestBlockIds(TempDataDirTestCase):
+    def test_insert_saves_schema_once_per_block(self) -> None:
+        core.create_table("users", {"name": "str"})
+        with mock.patch.object(ids._ALLOCATOR, "block_size", 3), \
+                mock.patch.object(core, "save_db_meta",
+                                  wraps=engine.save_db_meta) as save_meta:
+            for number in range(7):
+                core.insert_row("users", {"name": f"user{number}"})
+
+        self.assertEqual(save_meta.call_count, 3)
+        self.assertEqual([row["id"] for row in engine.load_table_data("users")],
+                         list(range(1, 8)))
+        self.assertEqual(engine.load_db_meta()["users"]["next_id"], 10)
+
+    def test_release_on_exit_keeps_numbering_dense(self) -> None:
+        core.create_table("users", {"name": "str"})
+        core.insert_row("users", {"name": "Alice"})
+        self.assertEqual(engine.load_db_meta()["users"]["next_id"],
+                         1 + ID_BLOCK_SIZE)
+
+        core.release_id_blocks()
+        self.assertEqual(engine.load_db_meta()["users"]["next_id"], 2)
+        # Следующий запуск продолжает нумерацию без пропуска
+        core.insert_row("users", {"name": "Bob"})
+        self.assertEqual([row["id"] for row in engine.load_table_data("users")],
+                         [1, 2])
+
+    def test_insert_many_continues_block(self) -> None:
+        core.create_table("users", {"name": "str"})
+        core.insert_row("users", {"name": "Alice"})
+        core.insert_many("users", [{"name": "Bob"}, {"name": "Eve"}])
+        core.insert_row("users", {"name": "Carol"})
+
+        self.assertEqual([row["id"] for row in engine.load_table_data("users")],
+                         [1, 2, 3, 4])
+        self.assertEqual(core.aggregate_rows("users", [("count", "*")]),
+                         (["count(*)"], [(4,)], "storage"))
@@ -0,0 +1,76 @@
+import unittest
+from unittest import mock
+
+from primitive_db import core, indexes
+from tests.test_engine import TempDataDirTestCase
+
+
+class TestColumnIndexes(TempDataDirTestCase):
+    def _fill_users(self, storage: str = "jsonl") -> None:
+        core.create_table("users", {"name": "str", "age": "int"}, storage=storage)
+        for name, age in (("Alice", "30"), ("Bob", "25"), ("Carol", "30")):
+            core.insert_row("users", {"name": name, "age": age})
+
+    def test_select_where_uses_index(self) -> None:
+        self._fill_users()
+        core.create_index("users", "age")
+
+        rows, source = core.select_rows_where("users", "age", "30")
+        self.assertEqual(source, "index")
+        self.assertEqual([row["name"] for row in rows], ["Alice", "Carol"])
+
+    def test_index_is_maintained_by_writes(self) -> None:
+        self._fill_users()
+        core.create_index("users", "age")
+        core.insert_row("users", {"name": "Dave", "age": "30"})
+        core.update_row_by_id("users", 1, {"age": "31"})
+        core.delete_row_by_id("users", 3)
+
+        rows, _ = core.select_rows_where("users", "age", "30")
+        self.assertEqual([row["name"] for row in rows], ["Dave"])
+
+        # Индекс, перечитанный с диска, должен совпадать
+        indexes._COLUMN_INDEXES.clear()
+        self.assertEqual(indexes.get_column_index("users", "age").lookup(31), {1})
+
+    def test_index_on_json_table(self) -> None:
+        self._fill_users(storage="json")
+        core.create_index("users", "name")
+        core.update_row_by_id("users", 2, {"name": "Bobby"})
+
+        rows, source = core.select_rows_where("users", "name", "Bobby")
+        self.assertEqual(source, "index")
+        self.assertEqual([row["id"] for row in rows], [2])
+
+    def test_writes_update_binary_index_without_reading_table(self) -> None:
+        self._fill_users(storage="binary")
+        core.create_index("users", "age")
+        with mock.patch.object(indexes, "load_table_data",
+                               side_effect=AssertionError("полный просмотр")):
+            core.insert_row("users", {"name": "Dave", "age": "30"})
+            core.update_row_by_id("users", 1, {"age": "31"})
+            core.delete_row_by_id("users", 3)
+            index = indexes.get_column_index("users", "age")
+            self.assertEqual(index.lookup(30), {4})
+            self.assertEqual(index.lookup(31), {1})
+
+        # Индекс другого процесса (с диска) перестраивается и совпадает
+        indexes._COLUMN_INDEXES.clear()
+        self.assertEqual(indexes.get_column_index("users", "age").lookup(30),
+                         {4})
+
+    def test_select_without_index_scans(self) -> None:
+        self._fill_users()
+        rows, source = core.select_rows_where("users", "name", "Bob")
+        self.assertEqual(source, "disk")
+        self.assertEqual([row["id"] for row in rows], [2])
+
+    def test_duplicate_index_is_rejected(self) -> None:
+        self._fill_users()
+        core.create_index("users", "age")
+        with self.assertRaises(ValueError):
+            core.create_index("users", "age")
+
+
+if __name__ == "__main__":
+    unittest.main()
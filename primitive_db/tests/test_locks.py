@@ -0,0 +1,150 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+import unittest
+from pathlib import Path
+
+from primitive_db import core, engine
+from primitive_db.locks import RWLock, table_lock
+from tests.test_engine import TempDataDirTestCase
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+# Пытается взять блокировку файла без ожидания и печатает результат
+_TRY_FLOCK = """
+import fcntl, sys
+with open(sys.argv[1], "ab") as lock_file:
+    try:
+        fcntl.flock(lock_file.fileno(), getattr(fcntl, sys.argv[2]) | fcntl.LOCK_NB)
+    except BlockingIOError:
+        print("busy")
+    else:
+        print("free")
+"""
+
+_INSERT_ROWS = """
+from primitive_db import core
+for number in range(40):
+    core.insert_row("users", {"name": "worker", "age": str(number)})
+"""
+
+
+def _run_python(code: str, *args: str) -> subprocess.CompletedProcess[str]:
+    env = dict(os.environ, PYTHONPATH=str(PROJECT_ROOT))
+    return subprocess.run([sys.executable, "-c", code, *args], env=env,
+                          capture_output=True, text=True, check=True)
+
+
+class TestRWLock(unittest.TestCase):
+    def test_readers_share_writer_waits(self) -> None:
+        lock = RWLock()
+        lock.acquire_read()
+        events: list[str] = []
+
+        def reader() -> None:
+            lock.acquire_read()
+            events.append("read")
+            lock.release_read()
+
+        def writer() -> None:
+            lock.acquire_write()
+            events.append("write")
+            lock.release_write()
+
+        reader_thread = threading.Thread(target=reader)
+        reader_thread.start()
+        reader_thread.join(timeout=1)
+        self.assertEqual(events, ["read"])
+
+        writer_thread = threading.Thread(target=writer)
+        writer_thread.start()
+        time.sleep(0.05)
+        self.assertEqual(events, ["read"])
+        lock.release_read()
+        writer_thread.join(timeout=1)
+        self.assertEqual(events, ["read", "write"])
+
+    def test_reentrant_for_same_thread(self) -> None:
+        lock = RWLock()
+        lock.acquire_read()
+        lock.acquire_write()  # единственный читатель может начать запись
+        lock.acquire_read()
+        lock.release_read()
+        lock.release_write()
+        lock.release_read()
+        lock.acquire_write()
+        lock.release_write()
+
+
+class TestTableLocks(TempDataDirTestCase):
+    def test_file_lock_is_seen_by_other_processes(self) -> None:
+        core.create_table("users", {"name": "str"})
+        lock_path = str(table_lock("users").path)
+
+        with table_lock("users").shared():
+            self.assertEqual(_run_python(_TRY_FLOCK, lock_path, "LOCK_SH").stdout,
+                             "free\n")
+            self.assertEqual(_run_python(_TRY_FLOCK, lock_path, "LOCK_EX").stdout,
+                             "busy\n")
+        with table_lock("users").exclusive():
+            self.assertEqual(_run_python(_TRY_FLOCK, lock_path, "LOCK_SH").stdout,
+                             "busy\n")
+        self.assertEqual(_run_python(_TRY_FLOCK, lock_path, "LOCK_EX").stdout,
+                         "free\n")
+
+    def test_parallel_writers_do_not_lose_rows(self) -> None:
+        core.create_table("users", {"name": "str", "age": "int"})
+        env = dict(os.environ, PYTHONPATH=str(PROJECT_ROOT))
+        workers = [
+            subprocess.Popen([sys.executable, "-c", _INSERT_ROWS], env=env)
+            for _ in range(3)
+        ]
+        for worker in workers:
+            self.assertEqual(worker.wait(timeout=60), 0)
+
+        # Каждый процесс берёт id из своего блока: id не повторяются
+        row_ids = {row["id"] for row in engine.load_table_data("users")}
+        self.assertEqual(len(row_ids), 120)
+        self.assertLess(max(row_ids), engine.load_db_meta()["users"]["next_id"])
+
+    def test_transaction_conflict_with_other_writer(self) -> None:
+        core.create_table("users", {"name": "str"})
+        core.insert_row("users", {"name": "Alice"})
+
+        core.begin_transaction()
+        core.update_row_by_id("users", 1, {"name": "Bob"})
+        # Запись мимо транзакции — как будто её сделал другой процесс
+        engine.replace_table_row("users", {"id": 1, "name": "Eve"})
+
+        with self.assertRaises(ValueError):
+            core.commit_transaction()
+        self.assertFalse(core.in_transaction())
+        self.assertEqual(engine.get_table_row("users", 1),
+                         {"id": 1, "name": "Eve"})
+
+    def test_transaction_does_not_lose_insert_of_other_process(self) -> None:
+        core.create_table("t", {"name": "str"})
+
+        core.begin_transaction()
+        _run_python("from primitive_db import core\n"
+                    "core.insert_row('t', {'name': 'other'})")
+        core.insert_row("t", {"name": "mine"})
+
+        with self.assertRaises(ValueError):
+            core.commit_transaction()
+        self.assertEqual([row["name"] for row in engine.load_table_data("t")],
+                         ["other"])
+
+        # Новая транзакция видит чужую строку и не перезаписывает её id
+        core.begin_transaction()
+        core.insert_row("t", {"name": "mine"})
+        self.assertEqual(core.commit_transaction(), ["t"])
+        rows = engine.load_table_data("t")
+        self.assertEqual([row["name"] for row in rows], ["other", "mine"])
+        self.assertEqual(len({row["id"] for row in rows}), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
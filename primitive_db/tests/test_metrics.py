@@ -0,0 +1,110 @@
+import io
+import json
+import unittest
+from contextlib import redirect_stdout
+from pathlib import Path
+
+from primitive_db import decorators, metrics
+from primitive_db.main import execute_line
+from tests.test_engine import TempDataDirTestCase
+
+
+class TestHistogram(unittest.TestCase):
+    def test_buckets_and_quantiles(self) -> None:
+        histogram = metrics.Histogram()
+        for duration_ms in (0.2, 0.3, 0.4, 3, 700):
+            histogram.observe(int(duration_ms * 1_000_000))
+
+        result = histogram.to_dict()
+        self.assertEqual(result["count"], 5)
+        self.assertAlmostEqual(result["sum_seconds"], 0.7039)
+        self.assertEqual(result["buckets"]["0.0005"], 3)
+        self.assertEqual(result["buckets"]["0.005"], 4)
+        self.assertEqual(result["buckets"]["+Inf"], 5)
+        self.assertEqual(result["p50_seconds"], 0.0005)
+        # Квантиль не больше максимума, даже если корзина шире
+        self.assertAlmostEqual(result["p99_seconds"], 0.7)
+
+
+class TestRegistry(unittest.TestCase):
+    def setUp(self) -> None:
+        metrics.reset_metrics()
+
+    def tearDown(self) -> None:
+        metrics.reset_metrics()
+        decorators.set_quiet(False)
+
+    def test_nested_phase_is_counted_once(self) -> None:
+        @metrics.timed("save")
+        def save(depth: int) -> None:
+            if depth:
+                save(depth - 1)
+
+        save(3)
+        with metrics.measure("filter"):
+            metrics.increment("rows", 10)
+
+        snapshot = metrics.get_metrics()
+        self.assertEqual(snapshot["histograms"]["save"]["count"], 1)
+        self.assertEqual(snapshot["histograms"]["filter"]["count"], 1)
+        self.assertEqual(snapshot["counters"], {"rows": 10})
+
+    def test_log_time_records_without_printing(self) -> None:
+        decorators.set_quiet(True)
+
+        @decorators.log_time
+        def handle_demo() -> int:
+            return 42
+
+        output = io.StringIO()
+        with redirect_stdout(output):
+            self.assertEqual(handle_demo(), 42)
+        self.assertEqual(output.getvalue(), "")
+        histogram = metrics.get_metrics()["histograms"]["handler.handle_demo"]
+        self.assertEqual(histogram["count"], 1)
+
+    def test_prometheus_format(self) -> None:
+        metrics.increment("commands", 2)
+        metrics.observe_ns("meta_load", 2_000_000)
+
+        text = metrics.format_prometheus()
+        self.assertIn("# TYPE primitive_db_commands_total counter\n"
+                      "primitive_db_commands_total 2\n", text)
+        self.assertIn('primitive_db_meta_load_seconds_bucket{le="0.001"} 0\n'
+                      'primitive_db_meta_load_seconds_bucket{le="0.005"} 1\n',
+                      text)
+        self.assertIn("primitive_db_meta_load_seconds_count 1\n", text)
+
+
+class TestStatsCommand(TempDataDirTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        metrics.reset_metrics()
+        decorators.set_quiet(True)
+
+    def tearDown(self) -> None:
+        super().tearDown()
+        metrics.reset_metrics()
+        decorators.set_quiet(False)
+
+    def test_phases_are_recorded_and_saved(self) -> None:
+        output = io.StringIO()
+        with redirect_stdout(output):
+            for line in ("create users name:str age:int",
+                         "insert users name=Alice age=30",
+                         "insert users name=Bob age=40",
+                         "select users where age>35",
+                         "stats", "stats save metrics.json"):
+                execute_line(line)
+
+        self.assertIn("Счётчики: commands 5", output.getvalue())
+        saved = json.loads(Path("metrics.json").read_text(encoding="utf-8"))
+        self.assertEqual(saved["counters"]["commands"], 6)
+        for phase in ("parse", "meta_load", "meta_save", "table_load",
+                      "filter", "render", "save", "command.insert",
+                      "handler.handle_select_rows"):
+            self.assertIn(phase, saved["histograms"])
+
+        with redirect_stdout(io.StringIO()):
+            execute_line("stats reset")
+        self.assertEqual(metrics.get_metrics()["counters"], {})
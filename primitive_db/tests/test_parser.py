@@ -1,4 +1,5 @@
 import unittest
+from primitive_db.expressions import And, Comparison
 from primitive_db.parser import parse_command
 
 
@@ -23,6 +24,97 @@ class TestParseCommand(unittest.TestCase):
         with self.assertRaises(ValueError):
             parse_command("update users set where id=1")
 
+    def test_create_with_storage_option(self) -> None:
+        cmd = parse_command("create users name:str storage=json")
+        self.assertEqual(cmd.columns, {"name": "str"})
+        self.assertEqual(cmd.options, {"storage": "json"})
+
+    def test_create_index(self) -> None:
+        cmd = parse_command("create index users age")
+        self.assertEqual(cmd.cmd_type, "create_index")
+        self.assertEqual(cmd.table, "users")
+        self.assertEqual(cmd.column, "age")
+
+    def test_load(self) -> None:
+        cmd = parse_command("load users users.csv")
+        self.assertEqual(cmd.cmd_type, "load")
+        self.assertEqual(cmd.table, "users")
+        self.assertEqual(cmd.file_path, "users.csv")
+
+    def test_cache_stats(self) -> None:
+        self.assertEqual(parse_command("cache stats").cmd_type, "cache_stats")
+
+    def test_select_with_limit_and_offset(self) -> None:
+        cmd = parse_command("select users where age=30 limit 10 offset 5")
+        self.assertEqual(cmd.where, {"age": "30"})
+        self.assertEqual((cmd.limit, cmd.offset), (10, 5))
+
+    def test_bad_limit_raises(self) -> None:
+        with self.assertRaises(ValueError):
+            parse_command("select users limit -1")
+
+    def test_where_expression(self) -> None:
+        cmd = parse_command("select users where age>30 and name=Bob limit 5")
+        self.assertIsNone(cmd.where)
+        self.assertEqual(cmd.condition,
+                         And(Comparison("age", ">", "30"),
+                             Comparison("name", "=", "Bob")))
+        self.assertEqual(cmd.limit, 5)
+
+        cmd = parse_command("delete users where age<18")
+        self.assertEqual(cmd.condition, Comparison("age", "<", "18"))
+        cmd = parse_command("update users set age=1 where name=Bob")
+        self.assertEqual(cmd.where, {"name": "Bob"})
+        self.assertEqual(cmd.condition, Comparison("name", "=", "Bob"))
+
+    def test_explain_and_analyze(self) -> None:
+        cmd = parse_command("explain select users where id>5 limit 2")
+        self.assertEqual(cmd.cmd_type, "explain")
+        self.assertEqual((cmd.table, cmd.limit), ("users", 2))
+        self.assertEqual(cmd.condition, Comparison("id", ">", "5"))
+        self.assertEqual(parse_command("analyze users").table, "users")
+        with self.assertRaises(ValueError):
+            parse_command("explain delete users where id=1")
+
+    def test_aggregate_select(self) -> None:
+        cmd = parse_command("select city, count(*), avg(age) from users "
+                            "where age>18 group by city")
+        self.assertEqual((cmd.cmd_type, cmd.table), ("select", "users"))
+        self.assertEqual(cmd.aggregates, [("count", "*"), ("avg", "age")])
+        self.assertEqual(cmd.group_by, "city")
+        self.assertEqual(cmd.condition, Comparison("age", ">", "18"))
+        for text in ("select sum(*) from users", "select count(*) from",
+                     "select count(*) from users group city"):
+            with self.assertRaises(ValueError):
+                parse_command(text)
+
+    def test_stats_commands(self) -> None:
+        self.assertEqual(parse_command("stats").cmd_type, "stats")
+        self.assertEqual(parse_command("stats reset").cmd_type, "stats_reset")
+        cmd = parse_command("stats save metrics.prom")
+        self.assertEqual((cmd.cmd_type, cmd.file_path),
+                         ("stats", "metrics.prom"))
+        for text in ("stats save", "stats dump x"):
+            with self.assertRaises(ValueError):
+                parse_command(text)
+
+    def test_convert_and_compression_options(self) -> None:
+        cmd = parse_command("convert logs storage=segmented compression=zlib")
+        self.assertEqual((cmd.cmd_type, cmd.table), ("convert", "logs"))
+        self.assertEqual(cmd.options, {"storage": "segmented",
+                                       "compression": "zlib"})
+        cmd = parse_command("create logs msg:str compression=lzma")
+        self.assertEqual(cmd.options, {"compression": "lzma"})
+        for text in ("convert logs", "convert logs fast=yes"):
+            with self.assertRaises(ValueError):
+                parse_command(text)
+
+    def test_transaction_commands(self) -> None:
+        for word in ("begin", "COMMIT", "rollback"):
+            self.assertEqual(parse_command(word).cmd_type, word.lower())
+        with self.assertRaises(ValueError):
+            parse_command("commit now")
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,112 @@
+import unittest
+from typing import Any
+from unittest import mock
+
+from primitive_db import core, engine
+from primitive_db.expressions import parse_where
+from primitive_db.planner import (
+    ACCESS_FULL_SCAN,
+    ACCESS_INDEX_LOOKUP,
+    ACCESS_PK_LOOKUP,
+    ACCESS_RANGE_SCAN,
+    plan_query,
+)
+from tests.test_engine import TempDataDirTestCase
+
+
+def _schema(**extra: Any) -> dict[str, Any]:
+    schema: dict[str, Any] = {
+        "columns": {"id": "int", "city": "str", "age": "int"},
+        "next_id": 1001,
+        "indexes": ["city"],
+    }
+    schema.update(extra)
+    return schema
+
+
+def _plan(text: str, storage: str = "jsonl", **extra: Any):
+    return plan_query("users", _schema(**extra), storage, parse_where(text))
+
+
+class TestPlanQuery(unittest.TestCase):
+    def test_chooses_access_path(self) -> None:
+        self.assertEqual(_plan("id in (3, 5) or age=1").access, ACCESS_FULL_SCAN)
+        self.assertEqual(_plan("id in (3, 5) and age=1").access, ACCESS_PK_LOOKUP)
+        self.assertEqual(_plan("city=Kazan and age>3").access, ACCESS_INDEX_LOOKUP)
+
+        plan = _plan("id>990 and id<=995 and age!=2")
+        self.assertEqual((plan.access, plan.low, plan.high),
+                         (ACCESS_RANGE_SCAN, 991, 995))
+        self.assertEqual(plan.fetched_rows, 5)
+        # Широкий диапазон дешевле просмотреть целиком
+        self.assertEqual(_plan("id>10").access, ACCESS_FULL_SCAN)
+        # json-таблица разбирается целиком и при чтении по id, поэтому
+        # чтение по индексу выигрывает только у избирательных условий
+        self.assertEqual(_plan("id=3", storage="json").access, ACCESS_PK_LOOKUP)
+        self.assertEqual(_plan("id>300", storage="json").access,
+                         ACCESS_FULL_SCAN)
+
+    def test_uses_statistics(self) -> None:
+        stats: dict[str, Any] = {"rows": 500, "next_id": 901, "columns": {
+            "city": {"distinct": 2},
+            "age": {"distinct": 100, "min": 0, "max": 99},
+        }}
+        # Индекс по колонке с двумя значениями хуже полного просмотра
+        plan = _plan("city=Kazan", stats=stats)
+        self.assertEqual(plan.access, ACCESS_FULL_SCAN)
+        self.assertTrue(plan.has_stats)
+        self.assertEqual(plan.table_rows, 600)  # 500 + вставки после analyze
+        self.assertEqual(plan.estimated_rows, 300)
+
+        self.assertAlmostEqual(_plan("age<25", stats=stats).estimated_rows, 150)
+        self.assertEqual(_plan("city=Kazan", storage="json",
+                               stats=stats).access, ACCESS_FULL_SCAN)
+        stats["columns"]["city"]["distinct"] = 50
+        plan = _plan("city=Kazan", storage="json", stats=stats)
+        self.assertEqual(plan.access, ACCESS_INDEX_LOOKUP)
+        self.assertLess(plan.cost, plan.scan_cost)
+        self.assertAlmostEqual(_plan("age>=90 or age<10",
+                                     stats=stats).estimated_rows, 114)
+
+
+class TestAnalyzeAndPlannedSelect(TempDataDirTestCase):
+    def test_analyze_stores_stats_and_selects_use_plan(self) -> None:
+        core.create_table("users", {"city": "str", "age": "int"}, storage="binary")
+        core.insert_many("users", ({"city": f"c{number % 4}", "age": str(number)}
+                                   for number in range(40)))
+        core.delete_row_by_id("users", 38)
+
+        stats = core.analyze_table("users")
+        self.assertEqual(stats["rows"], 39)
+        self.assertEqual(stats["columns"]["city"], {"distinct": 4})
+        self.assertEqual(stats["columns"]["age"],
+                         {"distinct": 39, "min": 0, "max": 39})
+        self.assertEqual(engine.load_db_meta()["users"]["stats"], stats)
+
+        condition = parse_where("id>=37 and city!=c0")
+        self.assertEqual(core.plan_select("users", condition).access,
+                         ACCESS_RANGE_SCAN)
+        rows, source = core.select_rows_matching("users", condition)
+        self.assertEqual(([row["id"] for row in rows], source),
+                         ([39, 40], "index"))
+        self.assertEqual(core.delete_rows_where("users", condition), 2)
+        self.assertEqual(len(engine.load_table_data("users")), 37)
+
+    def test_index_probe_on_json_table_parses_file_once(self) -> None:
+        core.create_table("users", {"city": "str", "age": "int"}, storage="json")
+        core.insert_many("users", ({"city": f"c{number % 10}", "age": str(number)}
+                                   for number in range(40)))
+        core.create_index("users", "city")
+
+        load_rows = engine.JsonStorage.load_rows
+        with mock.patch.object(engine.JsonStorage, "load_rows", autospec=True,
+                               side_effect=load_rows) as loads:
+            rows, source = core.select_rows_matching(
+                "users", parse_where("city=c3 and age>10"))
+        self.assertEqual(([row["age"] for row in rows], source),
+                         ([13, 23, 33], "index"))
+        self.assertEqual(loads.call_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
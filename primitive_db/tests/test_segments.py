@@ -0,0 +1,139 @@
+import unittest
+from unittest import mock
+
+from primitive_db import core, engine, segments
+from primitive_db.expressions import parse_where
+from primitive_db.zonemaps import compute_zone, zone_may_match
+from tests.test_engine import TempDataDirTestCase
+
+
+class TestSegmentedStorage(TempDataDirTestCase):
+    @classmethod
+    def tearDownClass(cls) -> None:
+        segments.shutdown_scan_pool()
+        super().tearDownClass()
+
+    def setUp(self) -> None:
+        super().setUp()
+        patcher = mock.patch.object(segments, "SEGMENT_ROWS", 10)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        core.create_table("users", {"city": "str", "age": "int"},
+                          storage="segmented")
+        core.insert_many("users", ({"city": f"c{number % 3}",
+                                    "age": str(number)} for number in range(35)))
+
+    def test_rows_are_split_into_segments(self) -> None:
+        directory = engine.get_table_segments_dir("users")
+        self.assertEqual(engine.get_table_storage("users"), "segmented")
+        self.assertEqual([path.name for path in
+                          segments.list_segment_paths(directory)],
+                         ["000000.json", "000001.json", "000002.json",
+                          "000003.json"])
+        row = engine.get_table_row("users", 12)
+        assert row is not None
+        self.assertEqual(row["age"], 11)
+
+        core.update_row_by_id("users", 12, {"age": "100"})
+        core.delete_row_by_id("users", 13)
+        rows = engine.load_table_data("users")
+        self.assertEqual(len(rows), 34)
+        self.assertEqual(rows[11], {"id": 12, "city": "c2", "age": 100})
+        self.assertIsNone(engine.get_table_row("users", 13))
+
+        core.drop_table("users")
+        self.assertFalse(directory.exists())
+
+    def test_parallel_scan_and_aggregates(self) -> None:
+        condition = parse_where("age>=30 or city=c1 and age<5")
+        rows, source = core.select_rows_matching("users", condition)
+        self.assertEqual(source, "parallel")
+        self.assertEqual([row["age"] for row in rows.iter_rows()],
+                         [1, 4, 30, 31, 32, 33, 34])
+
+        _columns, result, source = core.aggregate_rows(
+            "users", [("count", "*"), ("sum", "age"), ("max", "age")],
+            parse_where("age>=20"), group_by="city")
+        self.assertEqual(source, "parallel")
+        self.assertEqual(result, [("c0", 5, 135, 33), ("c1", 5, 140, 34),
+                                  ("c2", 5, 130, 32)])
+
+        self.assertEqual(core.delete_rows_where("users", parse_where("age<10")),
+                         10)
+        self.assertEqual(core.aggregate_rows("users", [("min", "age")],
+                                             parse_where("city!=x"))[1],
+                         [(10,)])
+
+    def test_zone_maps_skip_segments(self) -> None:
+        columns = {"id": "int", "city": "str", "age": "int"}
+        self.assertEqual(engine.count_scanned_segments(
+            "users", columns, parse_where("id>30")), (1, 4))
+        self.assertEqual(engine.count_scanned_segments(
+            "users", columns, parse_where("age<5 or age>=33")), (2, 4))
+        self.assertEqual(core.plan_select("users",
+                                          parse_where("id>=25")).segments,
+                         (2, 4))
+
+        # Зоны обновляются при записи
+        core.update_row_by_id("users", 1, {"age": "99"})
+        self.assertEqual(engine.count_scanned_segments(
+            "users", columns, parse_where("age>50")), (1, 4))
+        rows, _ = core.select_rows_matching("users", parse_where("age>50"))
+        self.assertEqual([row["id"] for row in rows.iter_rows()], [1])
+        core.delete_rows_where("users", parse_where("id>30"))
+        self.assertEqual(engine.count_scanned_segments(
+            "users", columns, parse_where("id>30")), (0, 3))
+
+
+class TestCompressedSegments(TempDataDirTestCase):
+    def test_convert_between_formats(self) -> None:
+        core.create_table("logs", {"msg": "str"}, storage="json")
+        core.insert_many("logs", ({"msg": f"message {number}"}
+                                  for number in range(50)))
+        rows = engine.load_table_data("logs")
+
+        self.assertEqual(core.convert_table("logs", "segmented", "lzma"), 50)
+        directory = engine.get_table_segments_dir("logs")
+        self.assertEqual(segments.read_compression(directory), "lzma")
+        self.assertTrue(all(path.name.endswith(".json.xz") for path in
+                            segments.list_segment_paths(directory)))
+        self.assertFalse(engine.get_table_file_path("logs").exists())
+        self.assertEqual(engine.load_db_meta()["logs"]["compression"], "lzma")
+        self.assertEqual(engine.load_table_data("logs"), rows)
+        self.assertEqual(engine.get_table_row("logs", 7), rows[6])
+
+        core.insert_row("logs", {"msg": "tail"})
+        self.assertEqual(core.aggregate_rows("logs", [("count", "*")],
+                                             parse_where("msg=tail"))[1],
+                         [(1,)])
+
+        core.convert_table("logs", "jsonl")
+        self.assertFalse(directory.exists())
+        self.assertEqual(engine.get_table_storage("logs"), "jsonl")
+        self.assertNotIn("compression", engine.load_db_meta()["logs"])
+        self.assertEqual(len(engine.load_table_data("logs")), 51)
+
+        with self.assertRaises(ValueError):
+            core.convert_table("logs", "binary", "zlib")
+        with self.assertRaises(ValueError):
+            core.create_table("other", {"msg": "str"}, "segmented", "gzip")
+
+
+class TestZoneMaps(unittest.TestCase):
+    def test_zone_may_match(self) -> None:
+        columns = {"id": "int", "name": "str", "age": "int"}
+        zone = compute_zone([{"id": 1, "name": "Bob", "age": None},
+                             {"id": 2, "name": "Eve", "age": None}])
+        self.assertEqual(zone["columns"]["name"],
+                         {"min": "Bob", "max": "Eve", "nulls": 0})
+        self.assertNotIn("age", zone["columns"])
+
+        def may_match(text: str) -> bool:
+            return zone_may_match(zone, parse_where(text), columns)
+
+        self.assertTrue(may_match("id>=2 and name in (Ann, Dan)"))
+        self.assertFalse(may_match("id>2 or name<Bob"))
+        self.assertFalse(may_match("name in (Ann, Zed) or id=abc"))
+        self.assertFalse(may_match("age=3"))
+        self.assertTrue(may_match("age!=3"))
+        self.assertTrue(may_match("not id>2"))
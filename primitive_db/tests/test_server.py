@@ -0,0 +1,97 @@
+import asyncio
+import unittest
+
+from primitive_db import engine
+from primitive_db.server import DatabaseServer, encode_response
+from tests.test_engine import TempDataDirTestCase
+
+
+async def _read_response(reader: asyncio.StreamReader) -> list[str]:
+    lines: list[str] = []
+    while True:
+        line = (await reader.readline()).decode("utf-8").rstrip("\n")
+        if line == ".":
+            return lines
+        lines.append(line[1:] if line.startswith("..") else line)
+
+
+class TestEncodeResponse(unittest.TestCase):
+    def test_dot_lines_are_escaped(self) -> None:
+        self.assertEqual(encode_response("a\n.b\n"), b"a\n..b\n.\n")
+        self.assertEqual(encode_response(""), b".\n")
+
+
+class TestDatabaseServer(TempDataDirTestCase):
+    def _run(self, scenario) -> None:
+        async def run() -> None:
+            database_server = DatabaseServer(workers=4)
+            server = await database_server.start("127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            try:
+                await scenario(port)
+            finally:
+                server.close()
+                await server.wait_closed()
+                database_server.close()
+
+        asyncio.run(run())
+
+    def test_pipelined_commands_answered_in_order(self) -> None:
+        async def scenario(port: int) -> None:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(b"create users name:str\n"
+                         b"insert users name=Alice\n"
+                         b"insert users name=Bob\n"
+                         b"select users where name=Bob\n"
+                         b"drop users\n"
+                         b"exit\n")
+            await writer.drain()
+            responses = [await _read_response(reader) for _ in range(6)]
+            writer.close()
+
+            self.assertEqual(responses[0], ["Таблица 'users' создана."])
+            self.assertEqual(responses[2], ["Строка добавлена в таблицу 'users'."])
+            self.assertTrue(any("Bob" in line for line in responses[3]))
+            self.assertFalse(any("Alice" in line for line in responses[3]))
+            self.assertEqual(responses[4][-1],
+                             "Таблица 'users' удалена (метаданные и данные).")
+            self.assertEqual(responses[5], ["Выход."])
+            self.assertEqual(await reader.read(), b"")
+
+        self._run(scenario)
+        self.assertNotIn("users", engine.load_db_meta())
+
+    def test_transactions_are_per_connection(self) -> None:
+        async def scenario(port: int) -> None:
+            first = await asyncio.open_connection("127.0.0.1", port)
+            second = await asyncio.open_connection("127.0.0.1", port)
+
+            async def ask(connection, line: str) -> list[str]:
+                reader, writer = connection
+                writer.write(line.encode("utf-8") + b"\n")
+                await writer.drain()
+                return await _read_response(reader)
+
+            await ask(first, "create users name:str")
+            await ask(first, "begin")
+            await ask(first, "insert users name=Alice")
+            self.assertEqual(await ask(second, "commit"),
+                             ["Ошибка: Нет открытой транзакции"])
+            self.assertEqual(len(engine.load_table_data("users")), 0)
+            await ask(first, "commit")
+            self.assertEqual(len(engine.load_table_data("users")), 1)
+
+            # Разрыв соединения с открытой транзакцией отменяет её
+            await ask(second, "begin")
+            await ask(second, "insert users name=Bob")
+            second[1].close()
+            await ask(first, "list")
+            first[1].close()
+
+        self._run(scenario)
+        self.assertEqual([row["name"] for row in engine.load_table_data("users")],
+                         ["Alice"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+import time
+import unittest
+from unittest import mock
+
+from primitive_db import core, engine, wal
+from primitive_db.constants import DB_META_FILE, WAL_FILE
+from tests.test_engine import TempDataDirTestCase
+
+
+def _wal_ops() -> list[str]:
+    contents = wal._read_wal()
+    return [record["op"] for group in contents.groups for record in group]
+
+
+class TestWriteAheadLog(TempDataDirTestCase):
+    def test_writes_are_logged_before_checkpoint(self) -> None:
+        core.create_table("users", {"name": "str"})
+        core.insert_row("users", {"name": "Alice"})
+        core.update_row_by_id("users", 1, {"name": "Bob"})
+        core.delete_row_by_id("users", 1)
+
+        # Схема пишется в журнал только при резервировании блока id
+        self.assertEqual(_wal_ops(), ["create", "put", "meta", "put", "del"])
+
+        wal.checkpoint()
+        contents = wal._read_wal()
+        self.assertEqual(contents.groups, [])
+        self.assertEqual(contents.snapshot, engine.load_db_meta())
+
+    def test_checkpoint_syncs_segments_directory(self) -> None:
+        core.create_table("events", {"kind": "str"}, "segmented")
+        core.insert_row("events", {"kind": "start"})
+        with mock.patch.object(wal, "sync_path") as sync_path:
+            wal.checkpoint()
+        synced = [call.args[0] for call in sync_path.call_args_list]
+        self.assertIn(engine.get_table_segments_dir("events"), synced)
+
+    def test_failed_write_leaves_no_record(self) -> None:
+        core.create_table("users", {"age": "int"})
+        with self.assertRaises(ValueError):
+            core.insert_many("users", [{"age": "1"}, {"age": "old"}])
+        self.assertEqual(_wal_ops(), ["create"])
+
+    def test_recover_replays_unapplied_groups(self) -> None:
+        for storage in ("json", "jsonl", "binary"):
+            with self.subTest(storage=storage):
+                table = f"users_{storage}"
+                core.create_table(table, {"name": "str"}, storage)
+                core.insert_row(table, {"name": "Alice"})
+                wal.checkpoint()
+
+                # Сбой сразу после fsync журнала: таблицы не изменены
+                schema = engine.load_db_meta()[table]
+                schema["next_id"] = 3
+                with wal.wal_group() as group:
+                    group.add(wal.put_record(table, {"id": 1, "name": "Eve"}))
+                    group.add(wal.put_record(table, {"id": 2, "name": "Bob"}))
+                    group.add(wal.meta_record(table, schema))
+                    group.commit()
+
+                self.assertEqual(wal.recover(), 1)
+                self.assertEqual(
+                    engine.load_table_data(table),
+                    [{"id": 1, "name": "Eve"}, {"id": 2, "name": "Bob"}],
+                )
+                self.assertEqual(engine.load_db_meta()[table]["next_id"], 3)
+                self.assertEqual(wal.recover(), 0)
+
+    def test_recover_drops_rows_of_unfinished_load(self) -> None:
+        core.create_table("users", {"name": "str"})
+        core.insert_row("users", {"name": "Alice"})
+        # load начинается с возврата остатка блока id: next_id снова 2
+        core.release_id_blocks()
+        self.assertEqual(engine.load_db_meta()["users"]["next_id"], 2)
+
+        # Сбой посреди load: строки уже в таблице, а commit группы нет
+        engine.append_table_rows("users", [{"id": 2, "name": "Bob"}])
+        with WAL_FILE.open("ab") as wal_file:
+            wal_file.write(b'{"op":"put","table":"users",'
+                           b'"row":{"id":2,"name":"Bob"}}\n{"op":"pu')
+
+        self.assertEqual(wal.recover(), 3)
+        self.assertEqual(engine.load_table_data("users"),
+                         [{"id": 1, "name": "Alice"}])
+        core.insert_row("users", {"name": "Carol"})
+        self.assertEqual(_wal_ops(), ["put", "meta"])
+
+    def test_recover_repairs_log_and_meta(self) -> None:
+        # Запуск на пустой базе начинает журнал со снимка метаданных
+        self.assertEqual(wal.recover(), 0)
+        core.create_table("users", {"name": "str"})
+        core.create_index("users", "name")
+        core.insert_row("users", {"name": "Alice"})
+
+        with engine.get_table_log_path("users").open("ab") as log_file:
+            log_file.write(b"\x00\x00garbage")
+        DB_META_FILE.write_text("", encoding="utf-8")
+        engine._META_CACHE = None
+
+        self.assertEqual(wal.recover(), 3)
+        self.assertEqual(engine.load_table_data("users"),
+                         [{"id": 1, "name": "Alice"}])
+        self.assertEqual(engine.load_db_meta()["users"]["indexes"], ["name"])
+        rows, source = core.select_rows_where("users", "name", "Alice")
+        self.assertEqual((len(rows), source), (1, "index"))
+
+    def test_background_checkpoint(self) -> None:
+        core.create_table("users", {"name": "str"})
+        with mock.patch.object(wal, "WAL_CHECKPOINT_INTERVAL", 0.01):
+            wal.start_checkpointer()
+            try:
+                core.insert_row("users", {"name": "Alice"})
+                for _ in range(200):
+                    if not _wal_ops():
+                        break
+                    time.sleep(0.01)
+                self.assertEqual(_wal_ops(), [])
+                core.insert_row("users", {"name": "Bob"})
+            finally:
+                wal.stop_checkpointer()
+        self.assertEqual(_wal_ops(), [])
+        self.assertEqual(len(engine.load_table_data("users")), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()